@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# 10/17/26; Batch (directory / glob) loading of plate datasets
+#
+# Files are parsed across a process pool; Per-file errors are collected and
+# reported, not dropped. Throughput (files/s, MB/s) kept with the results.
+#
+
+import os
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import azipa_cache as azcache
+
+
+class BatchLoad:
+    """ Results of batch load; Datasets and errors, keyed by file name
+    """
+    def __init__(self):
+        self.dsets = {}
+        self.errors = {}
+        self.nbytes = 0
+        self.seconds = 0.0
+
+
+    def num_files(self):
+        return len(self.dsets) + len(self.errors)
+
+
+    def files_per_s(self):
+        return self.num_files() / self.seconds if self.seconds > 0 else 0.0
+
+
+    def mb_per_s(self):
+        return self.nbytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+
+    def summary(self):
+        """ List of strings; Counts, throughput, then one line per error
+        """
+        slis = ["Loaded {} of {} files; {:.1f} MB in {:.2f}s ({:.1f} files/s, {:.1f} MB/s)".format(
+                len(self.dsets), self.num_files(), self.nbytes / 1e6, self.seconds,
+                self.files_per_s(), self.mb_per_s())]
+        for fname, err in self.errors.items():
+            slis.append("Failed {}: {}".format(os.path.basename(fname), err))
+        return slis
+
+
+def batch_file_list(path, wildcard='*.csv'):
+    """ Sorted file list for directory (files matching wildcard) or glob pattern
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, wildcard)
+    return sorted(f for f in glob.glob(path) if os.path.isfile(f))
+
+
+def batch_load_one(fname, cachedir=None, max_mb=500):
+    """ Load one file; Returns (fname, dset, error, nbytes); error is None if ok
+    """
+    dset = None
+    error = None
+    nbytes = 0
+    try:
+        nbytes = os.path.getsize(fname)
+        dset = azcache.platedataset_load(fname, cachedir=cachedir, max_mb=max_mb)
+        if dset is None:
+            error = "File does not exist"
+        elif dset.num_channels() < 1:
+            error = "No StepNChannelM data sections"
+            dset = None
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+        dset = None
+    return fname, dset, error, nbytes
+
+
+def batch_load(path, wildcard='*.csv', nproc=None, cachedir=None, max_mb=500):
+    """ Load all files in directory / glob path across process pool
+
+    nproc = number of worker processes; None = all cores, 1 = in-process
+
+    Returns BatchLoad
+    """
+    flis = batch_file_list(path, wildcard=wildcard)
+    res = BatchLoad()
+    if not flis:
+        return res
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = min(nproc, len(flis))
+    t0 = time.perf_counter()
+    if nproc < 2:
+        outs = [batch_load_one(f, cachedir, max_mb) for f in flis]
+    else:
+        # Few chunks per worker; Balances load while keeping pickling overhead down
+        chunk = max(1, len(flis) // (nproc * 4))
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            outs = list(pool.map(batch_load_one, flis, [cachedir] * len(flis),
+                                 [max_mb] * len(flis), chunksize=chunk))
+    for fname, dset, error, nbytes in outs:
+        res.nbytes += nbytes
+        if error is None:
+            res.dsets[fname] = dset
+        else:
+            res.errors[fname] = error
+    res.seconds = time.perf_counter() - t0
+    return res
+
+
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    import sys
+    for bpath in sys.argv[1:] or ['.']:
+        for bline in batch_load(bpath).summary():
+            print(bline)
@@ -0,0 +1,834 @@
+#!/usr/bin/env python
+# 10/17/26; Timing checks for Azure In-house PCR Analysis tool
+#
+# Run as script; Times load (and later analysis) steps on the bundled
+# azexam*.csv files and on synthetic large-plate files
+#
+#   azipa_bench.py [outdir]
+#
+
+import os
+import sys
+import glob
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import azipa_df as azdf
+import azipa_calc as azcalc
+import azipa_fit as azfit
+import azipa_quant as azquant
+import azipa_comp as azcomp
+import azipa_util as azu
+import azipa_cache as azcache
+
+
+# Synthetic plate sizes; (wells, channels, cycles)
+SYNTH_SIZES = [(96, 6, 60), (384, 6, 60), (1536, 6, 60)]
+
+
+def synth_well_list(nwell):
+    """ Well labels for standard plate size; 96, 384, 1536
+    """
+    return azu.plate_geom(nwell).well_list()
+
+
+def synth_curves(ncyc, nwell, seed=0):
+    """ Sigmoid amplification curves with noise; Array (ncyc, nwell)
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(1, ncyc+1)[:, None]
+    base = rng.uniform(0.02, 0.1, nwell)
+    amp = rng.uniform(0.5, 5.0, nwell)
+    mid = rng.uniform(ncyc * 0.3, ncyc * 0.8, nwell)
+    slope = rng.uniform(1.2, 2.5, nwell)
+    curves = base + amp / (1.0 + np.exp(-(x - mid) / slope))
+    return curves + rng.normal(0, 0.005, (ncyc, nwell))
+
+
+def write_synth_azcsv(fname, nwell=96, nchan=1, ncyc=40, seed=0):
+    """ Write synthetic Azure-style multi-channel csv file
+    """
+    wells = synth_well_list(nwell)
+    with open(fname, 'w') as ofile:
+        print("# Synthetic {} well, {} channel, {} cycle dataset".format(nwell, nchan, ncyc), file=ofile)
+        for i in range(nchan):
+            print("Step1Channel{}".format(i+1), file=ofile)
+            print(','.join(['Cycle'] + wells), file=ofile)
+            curves = synth_curves(ncyc, nwell, seed=seed+i)
+            for c in range(ncyc):
+                print(str(c+1) + ',' + ','.join('{:.7g}'.format(v) for v in curves[c]), file=ofile)
+    return fname
+
+
+def synth_file_list(outdir):
+    """ Write (if needed) synthetic files for SYNTH_SIZES; Return list of names
+    """
+    flis = []
+    for nwell, nchan, ncyc in SYNTH_SIZES:
+        fname = os.path.join(outdir, "synth_{}w_{}c_{}x.csv".format(nwell, nchan, ncyc))
+        if not os.path.isfile(fname):
+            write_synth_azcsv(fname, nwell=nwell, nchan=nchan, ncyc=ncyc)
+        flis.append(fname)
+    return flis
+
+
+def time_call(func, *args, reps=3, **kwargs):
+    """ Best-of-reps wall time (seconds) for func call
+    """
+    best = None
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        func(*args, **kwargs)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def bench_load(flis):
+    """ Line-by-line vs bulk csv parsing
+    """
+    print("Load: line-by-line vs bulk parser")
+    print("\t".join(["File", "MB", "Lines(s)", "Bulk(s)", "Speedup"]))
+    for fname in flis:
+        mb = os.path.getsize(fname) / 1e6
+        t_line = time_call(azdf.platedataset_from_azcsv, fname, bulk=False, reps=1)
+        t_bulk = time_call(azdf.platedataset_from_azcsv, fname, bulk=True)
+        words = [os.path.basename(fname), "{:.2f}".format(mb), "{:.4f}".format(t_line),
+                 "{:.4f}".format(t_bulk), "{:.1f}x".format(t_line / t_bulk)]
+        print("\t".join(words))
+
+
+def first_chan_cols(fname, lazy=False):
+    dset = azdf.platedataset_from_azcsv(fname, lazy=lazy)
+    return dset.get_chan_1index_cols(1)
+
+
+def bench_lazy(flis):
+    """ Time to first channel; Eager (all channels) vs lazy (section index)
+    """
+    print("First channel: eager vs lazy load")
+    print("\t".join(["File", "Chans", "Eager(s)", "Lazy(s)", "Speedup"]))
+    for fname in flis:
+        nchan = len(azdf.azcsv_section_index(fname))
+        t_eager = time_call(first_chan_cols, fname, lazy=False)
+        t_lazy = time_call(first_chan_cols, fname, lazy=True)
+        words = [os.path.basename(fname), str(nchan), "{:.4f}".format(t_eager),
+                 "{:.4f}".format(t_lazy), "{:.1f}x".format(t_eager / t_lazy)]
+        print("\t".join(words))
+
+
+def bench_cache(flis, cachedir):
+    """ Bulk parse vs (valid) sidecar cache load
+    """
+    print("Load: bulk parse vs sidecar cache")
+    print("\t".join(["File", "Parse(s)", "Cache(s)", "Speedup"]))
+    for fname in flis:
+        azcache.platedataset_load(fname, cachedir=cachedir)
+        t_parse = time_call(azdf.platedataset_from_azcsv, fname)
+        t_cache = time_call(azcache.platedataset_load, fname, cachedir=cachedir)
+        words = [os.path.basename(fname), "{:.4f}".format(t_parse),
+                 "{:.4f}".format(t_cache), "{:.1f}x".format(t_parse / t_cache)]
+        print("\t".join(words))
+
+
+def select_cols_by_label(dset, chans, cells):
+    """ Active columns the old way; Parse each column label
+    """
+    cols = []
+    for col in dset.get_chan_1index_cols(0):
+        cidx = azu.col_to_chan_index(col)
+        cell = azu.well_to_rowcol(azu.col_to_well(col))
+        if (cidx in chans) and (cell in cells):
+            cols.append(col)
+    return cols
+
+
+def select_cols_by_mask(dset, chans, cells):
+    """ Active columns from precomputed column metadata arrays
+    """
+    return dset.get_col_meta()['label'][dset.get_col_pos(chans=chans, cells=cells)].tolist()
+
+
+def bench_select(flis):
+    """ Active column selection (half the cells, first half of channels); Label parsing vs masks
+    """
+    print("Select: per-label parsing vs column metadata masks")
+    print("\t".join(["File", "Cols", "Labels(ms)", "Masks(ms)", "Speedup"]))
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        meta = dset.get_col_meta()
+        cells = set(zip(meta['row'][::2].tolist(), meta['col'][::2].tolist()))
+        chans = set(range(max(1, dset.num_channels() // 2)))
+        assert select_cols_by_label(dset, chans, cells) == select_cols_by_mask(dset, chans, cells)
+        t_label = time_call(select_cols_by_label, dset, chans, cells)
+        t_mask = time_call(select_cols_by_mask, dset, chans, cells)
+        words = [os.path.basename(fname), str(len(meta['label'])), "{:.3f}".format(t_label * 1e3),
+                 "{:.3f}".format(t_mask * 1e3), "{:.1f}x".format(t_label / t_mask)]
+        print("\t".join(words))
+
+
+def blcor_cols_thresh(dset, frac=0.1):
+    """ Baseline-corrected (shift to first row) array, per-col thresholds as app defaults
+    """
+    vals = dset.df.to_numpy()
+    vals = vals - vals[0]
+    col_chan = dset.get_col_meta()['chan']
+    thresh = np.zeros(dset.num_channels())
+    for i in range(dset.num_channels()):
+        cvals = vals[:, col_chan == i]
+        thresh[i] = cvals.min() + frac * (cvals.max() - cvals.min())
+    return vals, thresh[col_chan]
+
+
+def cq_loop(vals, col_th, default=100):
+    return [azcalc.get_thresh_cross_pos(vals[:, j], col_th[j], default=default)
+            for j in range(vals.shape[1])]
+
+
+def bench_cqt(flis):
+    """ Threshold Cq for all cols; Per-column loop vs batched arrays
+    """
+    print("Threshold Cq: per-column loop vs batched")
+    print("\t".join(["File", "Cols", "Loop(ms)", "Batched(ms)", "Speedup"]))
+    for fname in flis:
+        vals, col_th = blcor_cols_thresh(azdf.platedataset_from_azcsv(fname))
+        assert np.allclose(cq_loop(vals, col_th), azcalc.thresh_cross_pos(vals, col_th))
+        t_loop = time_call(cq_loop, vals, col_th)
+        t_arr = time_call(azcalc.thresh_cross_pos, vals, col_th)
+        words = [os.path.basename(fname), str(vals.shape[1]), "{:.3f}".format(t_loop * 1e3),
+                 "{:.3f}".format(t_arr * 1e3), "{:.1f}x".format(t_loop / t_arr)]
+        print("\t".join(words))
+
+
+def bench_cross_index(flis, nthresh=50):
+    """ Per threshold move (one channel); Batched scan vs crossing index query
+    """
+    print("Threshold scrub ({} moves, 1 channel): batched scan vs crossing index".format(nthresh))
+    print("\t".join(["File", "Wells", "Build(ms)", "Scan(ms)", "Query(ms)", "Speedup"]))
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        vals, col_th = blcor_cols_thresh(dset)
+        vals = vals[:, dset.get_col_pos(chans=[0])]
+        ths = np.linspace(vals.min(), vals.max(), nthresh)
+        t_build = time_call(azcalc.ThreshCrossIndex, vals)
+        index = azcalc.ThreshCrossIndex(vals)
+        for th in ths:
+            assert np.array_equal(azcalc.thresh_cross_pos(vals, th), index.query(th))
+        t_scan = time_call(lambda: [azcalc.thresh_cross_pos(vals, th) for th in ths]) / nthresh
+        t_query = time_call(lambda: [index.query(th) for th in ths]) / nthresh
+        words = [os.path.basename(fname), str(vals.shape[1]), "{:.3f}".format(t_build * 1e3),
+                 "{:.3f}".format(t_scan * 1e3), "{:.3f}".format(t_query * 1e3),
+                 "{:.1f}x".format(t_scan / t_query)]
+        print("\t".join(words))
+
+
+def sweep_all_chans(dset, vals, nthresh):
+    col_chan = dset.get_col_meta()['chan']
+    out = {}
+    for i in range(dset.num_channels()):
+        cvals = vals[:, col_chan == i]
+        out[i] = azcalc.thresh_sweep_cq(cvals, np.linspace(cvals.min(), cvals.max(), nthresh))
+    return out
+
+
+def bench_sweep(flis, nthresh=200):
+    """ Threshold sweep (nthresh thresholds, all channels); Cq matrix in one go
+    """
+    print("Threshold sweep: {} thresholds x all wells, all channels".format(nthresh))
+    print("\t".join(["File", "Cols", "Sweep(ms)", "Per-channel(ms)"]))
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        vals, _ = blcor_cols_thresh(dset)
+        t_sweep = time_call(sweep_all_chans, dset, vals, nthresh)
+        words = [os.path.basename(fname), str(vals.shape[1]), "{:.2f}".format(t_sweep * 1e3),
+                 "{:.2f}".format(t_sweep * 1e3 / dset.num_channels())]
+        print("\t".join(words))
+
+
+def deriv_shift_dropna(df):
+    """ First derivative as previously done; Copy, shift, subtract, dropna
+    """
+    ddf = df.copy(deep=True)
+    ddf = ddf.shift(-1) - ddf
+    ddf.dropna(inplace=True)
+    return ddf
+
+
+def derived_eager(df):
+    # Old load: baseline plus both derivative frames, all kept
+    bcdf = df - df.iloc[0].values.squeeze()
+    dfd1 = deriv_shift_dropna(df)
+    dfd2 = deriv_shift_dropna(dfd1)
+    return [bcdf, dfd1, dfd2]
+
+
+def derived_lazy(df):
+    # Load now: baseline frame only; Derivatives made if viewed
+    return [azdf.df_baseline_first(df)]
+
+
+def bench_derived(flis):
+    """ Derived frames made at load; Eager (baseline + derivatives) vs lazy (baseline)
+    """
+    print("Derived frames at load: eager vs lazy")
+    print("\t".join(["File", "Eager(ms)", "Lazy(ms)", "Eager(MB)", "Lazy(MB)", "1st deriv old/new(ms)"]))
+    for fname in flis:
+        df = azdf.platedataset_from_azcsv(fname).df
+        t_eager = time_call(derived_eager, df)
+        t_lazy = time_call(derived_lazy, df)
+        mb_eager = sum(d.memory_usage().sum() for d in derived_eager(df)) / 1e6
+        mb_lazy = sum(d.memory_usage().sum() for d in derived_lazy(df)) / 1e6
+        t_old = time_call(deriv_shift_dropna, df)
+        t_new = time_call(azdf.df_1st_deriv, df)
+        words = [os.path.basename(fname), "{:.2f}".format(t_eager * 1e3), "{:.2f}".format(t_lazy * 1e3),
+                 "{:.2f}".format(mb_eager), "{:.2f}".format(mb_lazy),
+                 "{:.2f}/{:.2f}".format(t_old * 1e3, t_new * 1e3)]
+        print("\t".join(words))
+
+
+def cq2d_loop(df):
+    """ Cq2d as previously done; Shifted 2nd derivative frame, idxmax per column
+    """
+    d2f = deriv_shift_dropna(deriv_shift_dropna(df))
+    return {col: d2f[col].idxmax() for col in d2f.columns}
+
+
+def cq2d_sdm(df, window=9, order=4):
+    # Batched smoothed 2nd derivative max, interpolated
+    pos = azcalc.sdm_cq(df.to_numpy(dtype=np.float64), window, order)
+    return dict(zip(df.columns, azcalc.index_at_pos(df.index, pos).tolist()))
+
+
+def sdm_truth_curves(ncyc, ncol, noise, seed=0):
+    """ Noisy sigmoids with known second derivative max; (curves, cycles, true Cq2d)
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(1, ncyc+1)[:, None]
+    mid = rng.uniform(ncyc * 0.4, ncyc * 0.7, ncol)
+    slope = rng.uniform(1.2, 2.5, ncol)
+    curves = 0.05 + 2.0 / (1.0 + np.exp(-(x - mid) / slope)) + rng.normal(0, noise, (ncyc, ncol))
+    # Logistic f'' max is at mid - slope * ln(2 + sqrt(3))
+    return curves, x.ravel(), mid - slope * np.log(2.0 + np.sqrt(3.0))
+
+
+def bench_sdm(flis, ncol=2000):
+    """ Cq2d for all cols; Per-column idxmax loop vs batched smoothed SDM, plus error vs truth
+    """
+    print("Second derivative max Cq: per-column loop vs batched Savitzky-Golay")
+    print("\t".join(["File", "Cols", "Loop(ms)", "Batched(ms)", "Speedup"]))
+    for fname in flis:
+        df = azdf.platedataset_from_azcsv(fname).df
+        t_loop = time_call(cq2d_loop, df)
+        t_arr = time_call(cq2d_sdm, df)
+        words = [os.path.basename(fname), str(df.shape[1]), "{:.2f}".format(t_loop * 1e3),
+                 "{:.2f}".format(t_arr * 1e3), "{:.1f}x".format(t_loop / t_arr)]
+        print("\t".join(words))
+    print("Cq2d mean abs error vs true maximum, {} synthetic curves".format(ncol))
+    print("\t".join(["Noise", "Loop", "Batched"]))
+    for noise in (0.0, 0.005, 0.02):
+        curves, cycles, truth = sdm_truth_curves(45, ncol, noise)
+        df = pd.DataFrame(curves, index=pd.Index(cycles, name='Cycle'))
+        err_loop = np.abs(np.array(list(cq2d_loop(df).values()), dtype=float) - truth).mean()
+        err_sdm = np.abs(np.array(list(cq2d_sdm(df).values())) - truth).mean()
+        print("\t".join(["{:.3f}".format(noise), "{:.3f}".format(err_loop), "{:.3f}".format(err_sdm)]))
+
+
+def bench_baseline(flis):
+    """ Baseline correction for all cols; First-row shift vs fitted line (fixed and auto window)
+    """
+    print("Baseline correction: first row vs least squares fit")
+    print("\t".join(["File", "Cols", "First(ms)", "Fit(ms)", "FitAuto(ms)"]))
+    for fname in flis:
+        df = azdf.platedataset_from_azcsv(fname).df
+        t_first = time_call(azdf.df_baseline_first, df)
+        t_fit = time_call(azdf.df_baseline_fit, df, start=2, stop=15)
+        t_auto = time_call(azdf.df_baseline_fit, df, start=2, auto=True)
+        words = [os.path.basename(fname), str(df.shape[1]), "{:.2f}".format(t_first * 1e3),
+                 "{:.2f}".format(t_fit * 1e3), "{:.2f}".format(t_auto * 1e3)]
+        print("\t".join(words))
+
+
+def bench_fit(flis, model='4PL'):
+    """ Sigmoid fits of all cols; One process vs process pool
+    """
+    print("Curve fits ({}): in-process vs process pool ({} cores)".format(model, os.cpu_count()))
+    print("\t".join(["File", "Cols", "Fit", "Flat", "Fail", "One(s)", "Pool(s)"]))
+    for fname in flis:
+        df = azdf.platedataset_from_azcsv(fname).df
+        vals = df.to_numpy(dtype=np.float64)
+        x = df.index.to_numpy(dtype=np.float64)
+        res = azfit.fit_curves(vals, x, model=model, nproc=1)
+        t_pool = time_call(azfit.fit_curves, vals, x, model=model, nproc=None, reps=1)
+        counts = np.bincount(res.status, minlength=3)
+        words = [os.path.basename(fname), str(vals.shape[1])] + [str(n) for n in counts]
+        words += ["{:.3f}".format(res.seconds), "{:.3f}".format(t_pool)]
+        print("\t".join(words))
+
+
+def melt_peaks_loop(dvals, temps):
+    # Same peak calling, one column at a time
+    return [azcalc.melt_peaks(dvals[:, [j]], temps) for j in range(dvals.shape[1])]
+
+
+def bench_melt(flis, tiles=(1, 10, 100)):
+    """ Melt -dF/dT and Tm peaks for all cols; Per-column loop vs batched, melt files tiled wider
+    """
+    print("Melt peaks: per-column loop vs batched")
+    print("\t".join(["File", "Cols", "Deriv(ms)", "Loop(ms)", "Batched(ms)", "Speedup"]))
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        if not dset.is_melt():
+            continue
+        temps = dset.index.to_numpy(dtype=np.float64)
+        for ntile in tiles:
+            vals = np.tile(dset.df.to_numpy(), (1, ntile))
+            t_deriv = time_call(azcalc.melt_neg_deriv, vals, temps, 7, 4)
+            dvals = azcalc.melt_neg_deriv(vals, temps, 7, 4)
+            t_loop = time_call(melt_peaks_loop, dvals, temps, reps=1)
+            t_arr = time_call(azcalc.melt_peaks, dvals, temps)
+            words = [os.path.basename(fname), str(vals.shape[1]), "{:.2f}".format(t_deriv * 1e3),
+                     "{:.2f}".format(t_loop * 1e3), "{:.2f}".format(t_arr * 1e3),
+                     "{:.1f}x".format(t_loop / t_arr)]
+            print("\t".join(words))
+
+
+def loglin_eff_loop(vals, stop, floor, nrows=5, min_r2=0.98):
+    """ Per column; Last window of nrows before stop above floor with R^2 >= min_r2, polyfit of log10
+    """
+    x = np.arange(nrows)
+    effs = np.full(vals.shape[1], np.nan)
+    for j in range(vals.shape[1]):
+        for end in range(min(int(stop[j]), len(vals)) - 1, nrows - 2, -1):
+            win = vals[end-nrows+1:end+1, j]
+            if np.any(win <= floor[j]):
+                continue
+            logs = np.log10(win)
+            if np.corrcoef(x, logs)[0, 1] ** 2 >= min_r2:
+                effs[j] = 10 ** np.polyfit(x, logs, 1)[0]
+                break
+    return effs
+
+
+def bench_eff(flis, ncol=2000):
+    """ Log-linear window efficiency for all cols; Per-column loop vs batched, plus error vs truth
+    """
+    print("Amplification efficiency: per-column loop vs batched sliding windows")
+    print("\t".join(["File", "Cols", "Loop(ms)", "Batched(ms)", "Speedup"]))
+    for fname in flis:
+        df = azdf.platedataset_from_azcsv(fname).df
+        raw = df.to_numpy(dtype=np.float64)
+        vals = azcalc.baseline_correct(raw, 2, 15, 1, True, 6, 5)
+        stop = np.floor(azcalc.sdm_cq(raw)) + 1
+        floor = 3.0 * azcalc.noise_sd(raw)
+        t_loop = time_call(loglin_eff_loop, vals, stop, floor, reps=1)
+        t_arr = time_call(azcalc.loglin_efficiency, vals, 5, stop, floor)
+        words = [os.path.basename(fname), str(df.shape[1]), "{:.2f}".format(t_loop * 1e3),
+                 "{:.2f}".format(t_arr * 1e3), "{:.1f}x".format(t_loop / t_arr)]
+        print("\t".join(words))
+    print("Efficiency error vs truth, {} synthetic curves".format(ncol))
+    print("\t".join(["Noise", "Found", "MeanErr", "MeanAbsErr"]))
+    rng = np.random.default_rng(0)
+    x = np.arange(45)[:, None]
+    for noise in (0.0005, 0.002, 0.005):
+        true_eff = rng.uniform(1.75, 2.0, ncol)
+        start = rng.uniform(1e-8, 1e-6, ncol)
+        expo = start * true_eff ** x
+        curves = 0.05 + 2.0 * expo / (1.0 + expo) + rng.normal(0, noise, (len(x), ncol))
+        vals = azcalc.baseline_correct(curves, 2, 15, 1, True, 6, 5)
+        stop = np.floor(azcalc.sdm_cq(curves)) + 1
+        eff = azcalc.loglin_efficiency(vals, 5, stop, 3.0 * azcalc.noise_sd(curves))[0]
+        err = (eff - true_eff)[~np.isnan(eff)]
+        print("\t".join(["{:.4f}".format(noise), str(len(err)), "{:+.3f}".format(err.mean()),
+                         "{:.3f}".format(np.abs(err).mean())]))
+
+
+def synth_quant_plates(nplate, nwell=384, nchan=4, nsample=24, seed=0):
+    """ Layout and per-plate (name, col labels, Cqs) for synthetic quant runs
+
+    Sample by well (replicates spread over plate), target by channel; Target 1 is reference
+    """
+    rng = np.random.default_rng(seed)
+    wells = synth_well_list(nwell)
+    layout = azquant.layout_from_df(pd.DataFrame({
+        'Well': np.tile(wells, nchan), 'Channel': np.repeat(np.arange(1, nchan+1), nwell),
+        'Sample': ['S{}'.format(i % nsample) for i in range(nwell)] * nchan,
+        'Target': np.repeat(['T{}'.format(i+1) for i in range(nchan)], nwell)}))
+    labels = [w + azu.chan_index_col_suf(i) for i in range(nchan) for w in wells]
+    plates = []
+    for k in range(nplate):
+        cqs = rng.normal(25.0, 2.0, len(labels))
+        # Some undetermined
+        cqs[rng.random(len(labels)) < 0.02] = 100.0
+        plates.append(("plate{}".format(k), labels, cqs))
+    return layout, plates
+
+
+def quant_groupby(entries, cqs, excluded, refs, calibrator):
+    """ Delta delta Cq redone from scratch with pandas groupby, as in a spreadsheet export
+    """
+    df = entries.assign(Cq=cqs[entries['src'].to_numpy()])
+    df = df[~excluded & (df['Cq'] < 100)]
+    grp = df.groupby(['Sample', 'Target'], sort=False)['Cq'].agg(['mean', 'std', 'count'])
+    means = grp['mean'].unstack()
+    dcq = means.sub(means[refs].mean(axis=1), axis=0)
+    return dcq - dcq.loc[calibrator]
+
+
+def bench_quant(nplates=(1, 10, 50)):
+    """ Delta delta Cq over many plates; Build, full groupby redo vs incremental well exclusion
+    """
+    print("Relative quantification: groupby redo vs incremental exclusion")
+    print("\t".join(["Plates", "Entries", "Build(ms)", "Groupby(ms)", "Exclude(ms)", "Speedup"]))
+    for nplate in nplates:
+        layout, plates = synth_quant_plates(nplate)
+        t_build = time_call(azquant.quant_engine, layout, plates, refs=['T1'], reps=1)
+        eng = azquant.quant_engine(layout, plates, refs=['T1'])
+        cqs = np.concatenate([c for _, _, c in plates])
+        t_group = time_call(quant_groupby, eng.entries, cqs, eng.excluded, ['T1'], eng.calibrator)
+        # Toggle one well (all its channels, every plate) out and back
+        mask = eng.cell_mask([(2, 3)])
+        def exclude_toggle():
+            eng.set_excluded(mask)
+            eng.get_result()
+            eng.set_excluded(mask, exclude=False)
+            return eng.get_result()
+        t_excl = time_call(exclude_toggle) / 2
+        words = [str(nplate), str(eng.num_entries()), "{:.2f}".format(t_build * 1e3),
+                 "{:.2f}".format(t_group * 1e3), "{:.3f}".format(t_excl * 1e3),
+                 "{:.1f}x".format(t_group / t_excl)]
+        print("\t".join(words))
+
+
+def synth_std_plates(nplate, nwell=384, nchan=4, seed=0):
+    """ Layout and plates for standard curves; Columns 1-3 are a 7 level dilution series
+    """
+    rng = np.random.default_rng(seed)
+    wells = synth_well_list(nwell)
+    rows, cols = azu.well_rowcol_arrays(wells)
+    std = (cols < 3) & (rows < 7)
+    qty = np.where(std, 10.0 ** (6 - rows), np.nan)
+    layout = azquant.layout_from_df(pd.DataFrame({
+        'Well': np.tile(wells, nchan), 'Channel': np.repeat(np.arange(1, nchan+1), nwell),
+        'Sample': np.tile(np.where(std, 'Std', 'U'), nchan), 'Quantity': np.tile(qty, nchan),
+        'Target': np.repeat(['T{}'.format(i+1) for i in range(nchan)], nwell)}))
+    labels = [w + azu.chan_index_col_suf(i) for i in range(nchan) for w in wells]
+    plates = []
+    for k in range(nplate):
+        lq = np.where(np.tile(std, nchan), np.log10(np.tile(qty, nchan)), rng.uniform(1, 5, len(labels)))
+        slope = np.repeat(rng.uniform(-3.6, -3.2, nchan), nwell)
+        plates.append(("plate{}".format(k), labels, 38.0 + slope * lq + rng.normal(0, 0.1, len(labels))))
+    return layout, plates
+
+
+def std_curve_loop(eng):
+    """ Per plate + target polyfit of standards, then back-calculation, one curve at a time
+    """
+    qty = np.full(eng.num_entries(), np.nan)
+    for plate in np.unique(eng.plates):
+        for t, targ in enumerate(eng.targets):
+            cur = (eng.plates == plate) & (eng.tcode == t)
+            fit = cur & eng.std & eng.determined()
+            slope, icpt = np.polyfit(np.log10(eng.quantity[fit]), eng.cqs[fit], 1)
+            unk = cur & ~eng.std
+            qty[unk] = 10.0 ** ((eng.cqs[unk] - icpt) / slope)
+    return qty
+
+
+def bench_std_curve(nplates=(1, 10, 50)):
+    """ Standard curves per plate + target and back-calculation; Per-curve loop vs batched
+    """
+    print("Standard curves: per-curve loop vs batched")
+    print("\t".join(["Plates", "Curves", "Entries", "Loop(ms)", "Batched(ms)", "Speedup", "MaxRelDiff"]))
+    for nplate in nplates:
+        layout, plates = synth_std_plates(nplate)
+        eng = azquant.quant_engine(layout, plates)
+        t_loop = time_call(std_curve_loop, eng)
+        t_arr = time_call(azquant.StdCurveResult, eng, per_plate=True)
+        curves = azquant.StdCurveResult(eng, per_plate=True)
+        unk = ~eng.std
+        diff = np.abs(curves.qty[unk] / std_curve_loop(eng)[unk] - 1.0).max()
+        words = [str(nplate), str(curves.num_curves()), str(eng.num_entries()),
+                 "{:.2f}".format(t_loop * 1e3), "{:.2f}".format(t_arr * 1e3),
+                 "{:.1f}x".format(t_loop / t_arr), "{:.1e}".format(diff)]
+        print("\t".join(words))
+
+
+def auto_thresh_loop(vals, chans, nchan, sdm, start=2, stop=15, mult=10.0, top_pct=10.0):
+    """ Auto thresholds one channel at a time, with np.percentile / median per channel
+    """
+    threshs = np.zeros(nchan)
+    for i in range(nchan):
+        cv = vals[:, chans == i]
+        noise = azcalc.noise_sd(cv[start:stop], stop - start)
+        floor = mult * np.median(noise[noise > 0])
+        top = azcalc.values_at_pos(cv, sdm[chans == i])
+        before = azcalc.values_at_pos(cv, sdm[chans == i] - 3)
+        top = top[(top > floor) & (top > 4.0 * before)]
+        ceil = np.percentile(top, top_pct) if len(top) else np.nan
+        threshs[i] = np.sqrt(floor * ceil) if ceil > floor else floor
+    return threshs
+
+
+def bench_auto_thresh(flis):
+    """ Auto (noise based) thresholds for all channels; Per-channel loop vs one pass,
+    and threshold shift from one outlier well (x20) for range fraction vs auto
+    """
+    print("Auto thresholds: per-channel loop vs one pass; Outlier shift = thresh ratio with one well x20")
+    print("\t".join(["File", "Cols", "Loop(ms)", "OnePass(ms)", "Speedup", "FracShift", "AutoShift"]))
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        if dset.is_melt():
+            continue
+        raw = dset.df.to_numpy(dtype=np.float64)
+        vals = azcalc.baseline_correct(raw, 2, 15, 1, True, 6, 5)
+        chans = dset.get_col_meta()['chan']
+        nchan = dset.num_channels()
+        sdm = azcalc.sdm_cq(raw)
+        t_loop = time_call(auto_thresh_loop, vals, chans, nchan, sdm)
+        t_arr = time_call(azcalc.auto_thresholds, vals, chans, nchan, sdm, 2, 15)
+        th = azcalc.auto_thresholds(vals, chans, nchan, sdm, 2, 15)[0]
+        # Outlier in first col (channel 0)
+        vout = vals.copy()
+        vout[:, 0] *= 20.0
+        th_out = azcalc.auto_thresholds(vout, chans, nchan, azcalc.sdm_cq(vout), 2, 15)[0]
+        cv = vals[:, chans == 0]
+        frac = 0.1 * (cv.max() - cv.min()) + cv.min()
+        frac_out = 0.1 * (max(cv.max(), vout[:, 0].max()) - cv.min()) + cv.min()
+        words = [os.path.basename(fname), str(vals.shape[1]), "{:.2f}".format(t_loop * 1e3),
+                 "{:.2f}".format(t_arr * 1e3), "{:.1f}x".format(t_loop / t_arr),
+                 "{:.2f}".format(frac_out / frac), "{:.2f}".format(th_out[0] / th[0])]
+        print("\t".join(words))
+
+
+def thresh_opt_loop(vals, entries, threshs):
+    """ Pooled replicate Cq sd per threshold; One Cq pass and pandas groupby per threshold
+    """
+    obj = np.full(len(threshs), np.nan)
+    for k, th in enumerate(threshs):
+        cqs = azcalc.thresh_cross_pos(vals, th)
+        df = entries.assign(Cq=cqs[entries['src'].to_numpy()])
+        grp = df[df['Cq'] < 100].groupby('Sample')['Cq'].agg(['var', 'count'])
+        grp = grp[grp['count'] > 1]
+        if len(grp):
+            obj[k] = np.sqrt((grp['var'] * (grp['count'] - 1)).sum() / (grp['count'] - 1).sum())
+    return obj
+
+
+def bench_thresh_opt(nwells=(96, 384, 1536), nthresh=100, ncyc=60, nrep=4):
+    """ Replicate-consistency threshold search over synthetic replicate curves;
+    Per-threshold loop vs batched Cq matrix + bincount objective
+    """
+    print("Threshold optimizer: per-threshold loop vs batched")
+    print("\t".join(["Wells", "Thresh", "Loop(ms)", "Batched(ms)", "Speedup", "MaxDiff"]))
+    for nwell in nwells:
+        # Replicates = copies of one curve with own noise
+        rng = np.random.default_rng(0)
+        nsample = nwell // nrep
+        curves = synth_curves(ncyc, nsample)
+        vals = np.repeat(curves, nrep, axis=1) + rng.normal(0, 0.005, (ncyc, nwell))
+        vals -= vals[2:15].mean(axis=0)
+        wells = synth_well_list(nwell)
+        layout = azquant.layout_from_df(pd.DataFrame({
+            'Well': wells, 'Target': 'T1', 'Sample': ['S{}'.format(i // nrep) for i in range(nwell)]}))
+        eng = azquant.quant_engine(layout, [("plate", [w + azu.chan_index_col_suf(0) for w in wells],
+                                             np.full(nwell, 100.0))])
+        threshs = np.geomspace(0.02, 2.0, nthresh)
+        src = np.arange(nwell)
+
+        def batched():
+            cqm = azcalc.thresh_sweep_cq(vals, threshs)
+            return azquant.replicate_sd_objective(eng, src, cqm)
+
+        t_loop = time_call(thresh_opt_loop, vals, eng.entries, threshs)
+        t_arr = time_call(batched)
+        diff = np.nanmax(np.abs(batched()[0] - thresh_opt_loop(vals, eng.entries, threshs)))
+        words = [str(nwell), str(nthresh), "{:.2f}".format(t_loop * 1e3), "{:.2f}".format(t_arr * 1e3),
+                 "{:.1f}x".format(t_loop / t_arr), "{:.1e}".format(diff)]
+        print("\t".join(words))
+
+
+def comp_well_loop(vals, chan, well, groups):
+    """ Crosstalk compensation one well (channel vector per cycle) at a time
+    """
+    out = vals.copy()
+    for gchans, minv in groups:
+        for w in np.unique(well):
+            cols = [np.flatnonzero((chan == c) & (well == w)) for c in gchans]
+            # Channels missing for well count as no signal
+            have = [k for k, c in enumerate(cols) if len(c)]
+            cols = [cols[k][0] for k in have]
+            out[:, cols] = vals[:, cols] @ minv[np.ix_(have, have)].T
+    return out
+
+
+def bench_comp(flis, seed=0):
+    """ Crosstalk compensation (random near-identity matrix); Per-well loop vs one batched multiply
+    """
+    print("Crosstalk compensation: per-well loop vs batched")
+    print("\t".join(["File", "Cols", "Groups", "Loop(ms)", "Batched(ms)", "Speedup", "MaxDiff"]))
+    rng = np.random.default_rng(seed)
+    for fname in flis:
+        dset = azdf.platedataset_from_azcsv(fname)
+        nums = sorted({azcomp.chan_step_number(c)[1] for c in dset.channel_list()} - {None})
+        mat = np.eye(len(nums)) + rng.uniform(0, 0.1, (len(nums), len(nums))) * (1 - np.eye(len(nums)))
+        groups = azcomp.comp_groups(dset.channel_list(), azcomp.CrosstalkMatrix(nums, mat))
+        if not groups:
+            continue
+        vals = dset.df.to_numpy(dtype=np.float64)
+        meta = dset.get_col_meta()
+        nwell = len(dset.wells)
+        t_loop = time_call(comp_well_loop, vals, meta['chan'], meta['well'], groups)
+        t_arr = time_call(azcomp.compensate_cols, vals, meta['chan'], meta['well'], nwell, groups)
+        diff = np.abs(azcomp.compensate_cols(vals, meta['chan'], meta['well'], nwell, groups)
+                      - comp_well_loop(vals, meta['chan'], meta['well'], groups)).max()
+        words = [os.path.basename(fname), str(vals.shape[1]), str(len(groups)), "{:.2f}".format(t_loop * 1e3),
+                 "{:.2f}".format(t_arr * 1e3), "{:.1f}x".format(t_loop / t_arr), "{:.1e}".format(diff)]
+        print("\t".join(words))
+
+
+def norm_col_loop(vals, refpos, chan):
+    """ Passive reference normalization one col at a time
+    """
+    out = vals.copy()
+    good = (vals > 0).all(axis=0)
+    means = vals.mean(axis=0)
+    for k in range(vals.shape[1]):
+        r = refpos[k]
+        if (r >= 0) and good[r]:
+            level = np.median(means[good & (chan == chan[r])])
+            out[:, k] = vals[:, k] / vals[:, r] * level
+    return out
+
+
+def bench_norm(nwells=(96, 384, 1536), ncyc=40, nrep=4, nfollow=30, seed=0):
+    """ Passive reference (ROX) normalization of target channel; Per-col loop vs vectorized,
+    and replicate Cq sd without / with it, for wells with +-30% optical gain on both channels
+    Follow case: shift of first nfollow rows once the rest are appended; Non-zero, so
+    followed runs with a reference channel redo everything (baseline_fixed_at is False)
+    """
+    print("Reference normalization: per-col loop vs vectorized; Replicate Cq sd raw vs normalized")
+    print("\t".join(["Wells", "Loop(ms)", "Vector(ms)", "Speedup", "MaxDiff", "SdRaw", "SdNorm", "FollowShift"]))
+    rng = np.random.default_rng(seed)
+    for nwell in nwells:
+        # Cols are channel-major; Target (channel 0) replicates share a curve
+        target = np.repeat(synth_curves(ncyc, nwell // nrep, seed=seed), nrep, axis=1)
+        gain = rng.uniform(0.7, 1.3, nwell)
+        ref = 1.0 + rng.normal(0, 0.002, (ncyc, nwell))
+        vals = np.hstack([target * gain * (1 + rng.normal(0, 0.002, (ncyc, nwell))), ref * gain])
+        chan = np.repeat([0, 1], nwell)
+        refpos = np.concatenate([np.arange(nwell, 2 * nwell), np.full(nwell, -1)])
+        t_loop = time_call(norm_col_loop, vals, refpos, chan)
+        t_arr = time_call(azcomp.normalize_cols, vals, refpos, chan)
+        normed = azcomp.normalize_cols(vals, refpos, chan)[0]
+        diff = np.abs(normed - norm_col_loop(vals, refpos, chan)).max()
+        # Reference level drifts down over cycles, as on real runs
+        drift = vals * np.append(np.ones((ncyc, nwell)), np.linspace(1.0, 0.8, ncyc)[:, None] * np.ones(nwell), axis=1)
+        shift = np.abs(azcomp.normalize_cols(drift[:nfollow], refpos, chan)[0]
+                       - azcomp.normalize_cols(drift, refpos, chan)[0][:nfollow]).max()
+        sds = []
+        for data in (vals, normed):
+            cv = data[:, :nwell] - data[2:8, :nwell].mean(axis=0)
+            cqs = azcalc.thresh_cross_pos(cv, 0.1 * np.median(cv.max(axis=0)))
+            sds.append(np.nanmean(np.where(cqs < 100, cqs, np.nan).reshape(-1, nrep).std(axis=1, ddof=1)))
+        words = [str(nwell), "{:.2f}".format(t_loop * 1e3), "{:.2f}".format(t_arr * 1e3),
+                 "{:.1f}x".format(t_loop / t_arr), "{:.1e}".format(diff),
+                 "{:.3f}".format(sds[0]), "{:.3f}".format(sds[1]), "{:.3f}".format(shift)]
+        print("\t".join(words))
+
+
+def azcsv_partial(data, nrows, cut=0):
+    """ Azure csv (bytes) data as if still being written; Section i has its first
+    nrows[i] rows, last section then cut bytes of its next row
+    """
+    secs = azdf.azcsv_section_list(data)
+    parts = []
+    for i, (_, _, start, end, _) in enumerate(secs):
+        spos = data.rfind(b'\n', 0, start - 1) + 1
+        if i == 0:
+            parts.append(data[:spos])
+        _, pos = azdf.azcsv_section_header(data[start:end])
+        rest = azdf.azcsv_rows_after(data[start+pos:end], nrows[i], complete=False)
+        parts.append(data[spos:end-len(rest)])
+    return b''.join(parts) + rest[:cut]
+
+
+def bench_follow(flis, nstart=10, reps=3):
+    """ Follow mode; Poll for one new cycle vs full reload, and check that a
+    file cut mid-row with uneven sections, then completed and polled, gives
+    exactly the fresh load
+    """
+    print("Follow: poll for one new cycle vs full reload; Cut file completed matches fresh load")
+    print("\t".join(["File", "Poll(ms)", "Reload(ms)", "Speedup", "Match"]))
+    for fname in flis:
+        with open(fname, 'rb') as infile:
+            data = infile.read()
+        fresh = azdf.platedataset_from_azcsv(fname)
+        nrow = fresh.num_rows()
+        nsec = fresh.num_channels()
+        tname = os.path.join(tempfile.gettempdir(), 'azipa_follow_' + os.path.basename(fname))
+        # Cut mid-row, sections one row apart; Then part way; Then done
+        with open(tname, 'wb') as ofile:
+            ofile.write(azcsv_partial(data, [nstart + (i % 2) for i in range(nsec)], cut=7))
+        follower = azdf.azcsv_follow(tname)
+        nfirst = follower.dset.num_rows()
+        with open(tname, 'wb') as ofile:
+            ofile.write(azcsv_partial(data, [(nstart + nrow) // 2 + (i % 3) for i in range(nsec)], cut=3))
+        follower.poll()
+        with open(tname, 'wb') as ofile:
+            ofile.write(data)
+        follower.poll()
+        match = (nfirst == nstart) and follower.dset.df.equals(fresh.df) and \
+                follower.dset.df.index.equals(fresh.df.index)
+        # One more cycle in all sections
+        t_poll = None
+        for _ in range(reps):
+            with open(tname, 'wb') as ofile:
+                ofile.write(azcsv_partial(data, [nrow - 1] * nsec))
+            follower = azdf.azcsv_follow(tname)
+            with open(tname, 'wb') as ofile:
+                ofile.write(data)
+            t0 = time.perf_counter()
+            follower.poll()
+            t = time.perf_counter() - t0
+            t_poll = t if (t_poll is None) else min(t_poll, t)
+        t_load = time_call(azdf.platedataset_from_azcsv, tname, reps=reps)
+        os.remove(tname)
+        words = [os.path.basename(fname), "{:.3f}".format(t_poll * 1e3), "{:.3f}".format(t_load * 1e3),
+                 "{:.1f}x".format(t_load / t_poll), str(match)]
+        print("\t".join(words))
+
+
+# ---------------------------------------------------------------------------
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) > 1:
+        outdir = sys.argv[1]
+    else:
+        outdir = os.path.join(tempfile.gettempdir(), 'azipa_bench')
+    os.makedirs(outdir, exist_ok=True)
+    examples = sorted(glob.glob(os.path.join(here, 'azexam*.csv')))
+    synths = synth_file_list(outdir)
+    bench_load(examples + synths)
+    bench_lazy(examples + synths)
+    bench_cache(examples + synths, os.path.join(outdir, 'cache'))
+    bench_select(examples + synths)
+    bench_cqt(examples + synths)
+    bench_cross_index(examples + synths)
+    bench_sweep(examples + synths)
+    bench_derived(examples + synths)
+    bench_sdm(examples + synths)
+    bench_baseline(examples + synths)
+    bench_fit(examples + synths)
+    bench_fit(examples + synths, model='5PL')
+    bench_melt(examples)
+    bench_eff(examples + synths)
+    bench_quant()
+    bench_std_curve()
+    bench_auto_thresh(examples + synths)
+    bench_thresh_opt()
+    bench_comp(examples + synths)
+    bench_norm()
+    bench_follow(examples + synths)
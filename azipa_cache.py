@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# 10/17/26; Sidecar cache of parsed plate datasets
+#
+# Parsed PlateDataSet is saved as raw .npy (rows, channels, wells data array)
+# plus small .json header (channels, wells, index, source key). Entries are named from
+# the source path and valid only while source size, mtime and content hash
+# match. Cache dir has a size cap; least recently used entries are evicted.
+#
+
+import os
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+import azipa_df as azdf
+
+
+# Header format version; Bump if layout changes
+CACHE_VERSION = 2
+
+# Content hash reads this much from head and tail of source file
+CACHE_HASH_BLOCK = 1 << 20
+
+
+def platedataset_load(fname, cachedir=None, max_mb=500):
+    """ Load PlateDataSet from csv, via sidecar cache in cachedir
+
+    If cached copy is valid, data is memory-mapped from it, else csv is
+    parsed and (re)cached. If cachedir is None / empty, no caching
+
+    Return PlateDataSet (None if file doesn't exist)
+    """
+    if not cachedir:
+        return azdf.platedataset_from_azcsv(fname)
+    cachedir = os.path.expanduser(cachedir)
+    dset = platedataset_from_cache(fname, cachedir)
+    if dset is None:
+        dset = azdf.platedataset_from_azcsv(fname)
+        if dset is not None:
+            platedataset_to_cache(dset, cachedir, max_mb=max_mb)
+    return dset
+
+
+def source_key(fname):
+    """ Source file key dict; Path, size, mtime and (head + tail) content hash
+    """
+    fname = os.path.abspath(fname)
+    stat = os.stat(fname)
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(fname, 'rb') as infile:
+        hasher.update(infile.read(CACHE_HASH_BLOCK))
+        if stat.st_size > CACHE_HASH_BLOCK:
+            infile.seek(max(CACHE_HASH_BLOCK, stat.st_size - CACHE_HASH_BLOCK))
+            hasher.update(infile.read())
+    return {'path': fname, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'hash': hasher.hexdigest()}
+
+
+def cache_fnames(fname, cachedir):
+    """ Header (.json) and data (.npy) file names for source fname
+    """
+    stem = hashlib.blake2b(os.path.abspath(fname).encode('utf-8'), digest_size=12).hexdigest()
+    base = os.path.join(cachedir, 'azipa_' + stem)
+    return base + '.json', base + '.npy'
+
+
+def platedataset_from_cache(fname, cachedir):
+    """ Get PlateDataSet for source fname from cache, if still valid
+
+    Return PlateDataSet with data memory-mapped from cache, or None
+    """
+    hname, aname = cache_fnames(fname, cachedir)
+    if not (os.path.isfile(fname) and os.path.isfile(hname) and os.path.isfile(aname)):
+        return None
+    try:
+        with open(hname, 'r') as infile:
+            head = json.load(infile)
+        if head.get('version') != CACHE_VERSION:
+            return None
+        # Cheap checks (stat) first, then hash
+        key = head['source']
+        stat = os.stat(fname)
+        if (key['size'] != stat.st_size) or (key['mtime_ns'] != stat.st_mtime_ns):
+            return None
+        if key != source_key(fname):
+            return None
+        buf = np.load(aname, mmap_mode='r')
+        index = pd.Index(np.asarray(head['index'], dtype=head['index_dtype']), name=head['index_name'])
+        dset = azdf.platedataset_from_buffer(fname, head['channels'], head['ch_names'],
+                                             index, head['wells'], buf, head['has_data'])
+    except (OSError, ValueError, KeyError) as e:
+        print("Cache read failed for {}: {}".format(fname, e))
+        return None
+    # Mark as recently used
+    os.utime(hname)
+    return dset
+
+
+def platedataset_to_cache(dset, cachedir, max_mb=500):
+    """ Save PlateDataSet as sidecar cache entry, then evict to size cap
+
+    Returns True if saved
+    """
+    if (dset is None) or (dset.num_channels() < 1):
+        return False
+    hname, aname = cache_fnames(dset.fname, cachedir)
+    buf = dset.arr.transpose(0, 2, 1)
+    head = {
+        'version': CACHE_VERSION,
+        'source': source_key(dset.fname),
+        'channels': dset.channel_list(),
+        'ch_names': dset.ch_name_list(),
+        'wells': dset.wells,
+        'has_data': dset.has_data.tolist(),
+        'index_name': dset.index.name,
+        'index_dtype': str(dset.index.dtype),
+        'index': dset.index.tolist(),
+    }
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        # Write to temp names then swap in, so readers never see partial entry
+        with open(aname + '.tmp', 'wb') as ofile:
+            np.save(ofile, np.ascontiguousarray(buf))
+        with open(hname + '.tmp', 'w') as ofile:
+            json.dump(head, ofile)
+        os.replace(aname + '.tmp', aname)
+        os.replace(hname + '.tmp', hname)
+    except OSError as e:
+        print("Cache write failed for {}: {}".format(dset.fname, e))
+        return False
+    cache_evict(cachedir, max_mb=max_mb)
+    return True
+
+
+def cache_entry_list(cachedir):
+    """ List of (last_used, nbytes, header, data) for cache entries
+    """
+    elis = []
+    if not os.path.isdir(cachedir):
+        return elis
+    for fname in os.listdir(cachedir):
+        if not (fname.startswith('azipa_') and fname.endswith('.json')):
+            continue
+        hname = os.path.join(cachedir, fname)
+        aname = hname[:-len('.json')] + '.npy'
+        try:
+            used = os.path.getmtime(hname)
+            nbytes = os.path.getsize(hname)
+            if os.path.isfile(aname):
+                nbytes += os.path.getsize(aname)
+        except OSError:
+            continue
+        elis.append((used, nbytes, hname, aname))
+    return elis
+
+
+def cache_evict(cachedir, max_mb=500):
+    """ Remove least recently used entries until cache is under max_mb
+
+    Returns number of entries removed
+    """
+    elis = sorted(cache_entry_list(cachedir))
+    total = sum(e[1] for e in elis)
+    maxbytes = max_mb * 1e6
+    n = 0
+    for _, nbytes, hname, aname in elis:
+        if total <= maxbytes:
+            break
+        for name in (hname, aname):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        total -= nbytes
+        n += 1
+    return n
@@ -0,0 +1,574 @@
+#!/usr/bin/env python
+# 10/17/26; Batched (numpy array) curve calculations
+#
+# Functions work on whole (rows, cols) arrays at once; Cols are dataset
+# columns (well + channel), rows are cycles.
+#
+
+import numpy as np
+
+
+def thresh_cross_pos(vals, thresh, default=100):
+    """ Positions where (rows, cols) vals curves first go above threshold
+
+    thresh is scalar or per-col array. Position is the 0-based row,
+    interpolated between bracketing rows. Curves that never cross, or
+    start above threshold, get default
+
+    Returns float array, one value per col
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    thresh = np.broadcast_to(np.asarray(thresh, dtype=np.float64), (ncol,))
+    above = vals > thresh
+    # First row above (argmax gives first True); 0 if none
+    first = above.argmax(axis=0)
+    ok = above[first, np.arange(ncol)] & (first > 0)
+    cols = np.arange(ncol)
+    v1 = vals[np.maximum(first - 1, 0), cols]
+    v2 = vals[first, cols]
+    # v1 <= thresh < v2 where ok, so no zero divide there
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pos = first + (thresh - v1) / (v2 - v1)
+    return np.where(ok, pos, default)
+
+
+def get_thresh_cross_pos(dvals, th, default=None):
+    """ Get (X) position where dvals "curve" crosses (Y) threshold
+    Returns X, interpolated via bracketing values, or default if no cross
+
+    Single curve, Python loop version; See thresh_cross_pos() for arrays
+    """
+    val = default
+    for i, _ in enumerate(dvals):
+        if dvals[i] > th:
+            if i > 0:
+                v1 = dvals[i-1]
+                v2 = dvals[i]
+                val = i + (th - v1) / (v2 - v1)
+            break
+    return val
+
+
+class ThreshCrossIndex:
+    """ Threshold crossing index for (rows, cols) curves, e.g. one channel
+
+    A curve first goes above a threshold where its running maximum does,
+    which happens only at its "record" rows (new maximum). Records of all
+    cols are kept sorted by value; Moving the threshold just moves past
+    the records in between (binary search), each updating its col's first
+    row above. Cq then is one interpolation per col, no scan over rows
+
+    query() gives the same values as thresh_cross_pos()
+    """
+    def __init__(self, vals):
+        self.vals = np.asarray(vals, dtype=np.float64)
+        self.nrow, self.ncol = self.vals.shape
+        self.cols = np.arange(self.ncol)
+        # NaN never counts as above threshold; As -inf it keeps envelope sorted
+        env = np.maximum.accumulate(np.where(np.isnan(self.vals), -np.inf, self.vals), axis=0)
+        prev = np.vstack([np.full((1, self.ncol), -np.inf), env[:-1]])
+        # Records by col then row; Row of next record in same col (nrow if last)
+        rcol, rrow = np.nonzero((env > prev).T)
+        rnext = np.full(len(rrow), self.nrow, dtype=np.int64)
+        same = rcol[1:] == rcol[:-1]
+        rnext[:-1][same] = rrow[1:][same]
+        # Sorted by value
+        rval = env[rrow, rcol]
+        order = np.argsort(rval, kind='stable')
+        self.rec_val = rval[order]
+        self.rec_col = rcol[order]
+        self.rec_row = rrow[order]
+        self.rec_next = rnext[order]
+        # Current threshold state; At -inf, first row above is first record (nrow if none)
+        self.thresh = -np.inf
+        self.first = np.full(self.ncol, self.nrow, dtype=np.int64)
+        np.minimum.at(self.first, rcol, rrow)
+
+
+    def first_above(self, thresh):
+        """ First row above (scalar) thresh for each col (nrow if never)
+        Returned array is internal state; Don't modify
+        """
+        thresh = float(thresh)
+        old = self.thresh
+        if thresh > old:
+            # Records now at or below thresh; First above moves on to next record
+            lo = np.searchsorted(self.rec_val, old, side='right')
+            hi = np.searchsorted(self.rec_val, thresh, side='right')
+            np.maximum.at(self.first, self.rec_col[lo:hi], self.rec_next[lo:hi])
+        elif thresh < old:
+            # Records now above thresh again; Lowest (earliest) per col wins
+            lo = np.searchsorted(self.rec_val, thresh, side='right')
+            hi = np.searchsorted(self.rec_val, old, side='right')
+            np.minimum.at(self.first, self.rec_col[lo:hi], self.rec_row[lo:hi])
+        self.thresh = thresh
+        return self.first
+
+
+    def query(self, thresh, default=100):
+        """ Crossing positions (see thresh_cross_pos) for scalar thresh
+        """
+        first = self.first_above(thresh)
+        ok = (first > 0) & (first < self.nrow)
+        i2 = np.minimum(first, self.nrow - 1)
+        v1 = self.vals[np.maximum(i2 - 1, 0), self.cols]
+        v2 = self.vals[i2, self.cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pos = first + (thresh - v1) / (v2 - v1)
+        return np.where(ok, pos, default)
+
+
+def thresh_sweep_cq(vals, threshs, default=100):
+    """ Cq matrix for (rows, cols) vals curves over vector of thresholds
+
+    Same positions as thresh_cross_pos(), for every threshold at once;
+    Returns float array (thresholds, cols)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    threshs = np.asarray(threshs, dtype=np.float64).reshape(-1, 1)
+    nrow, ncol = vals.shape
+    # Running max (NaN never above); First row above = number of envelope rows not above
+    env = np.maximum.accumulate(np.where(np.isnan(vals), -np.inf, vals), axis=0)
+    first = np.zeros((len(threshs), ncol), dtype=np.int64)
+    for i in range(nrow):
+        first += env[i] <= threshs
+    ok = (first > 0) & (first < nrow)
+    i2 = np.minimum(first, nrow - 1)
+    cols = np.arange(ncol)
+    v1 = vals[np.maximum(i2 - 1, 0), cols]
+    v2 = vals[i2, cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pos = first + (threshs - v1) / (v2 - v1)
+    return np.where(ok, pos, default)
+
+
+def savgol_matrix(window, order, deriv=0):
+    """ Savitzky-Golay (window, window) matrix; Row k gives deriv'th derivative
+    at window position k from the window's values (local polynomial fit)
+
+    Center row is the usual filter; Other rows handle curve ends
+    """
+    x = np.arange(window, dtype=np.float64)
+    # Least squares polynomial coefficients from values; (order+1, window)
+    fit = np.linalg.pinv(np.vander(x, order + 1, increasing=True))
+    # d^deriv/dx^deriv of x^p at each position
+    dvan = np.zeros((window, order + 1))
+    for p in range(deriv, order + 1):
+        dvan[:, p] = np.prod(np.arange(p - deriv + 1, p + 1)) * x ** (p - deriv)
+    return dvan @ fit
+
+
+def savgol_deriv(vals, window=9, order=4, deriv=0):
+    """ Savitzky-Golay smoothed (deriv=0) or derivative values for (rows, cols) curves
+
+    All cols at once; Interior rows use the centered filter, the first and last
+    window/2 rows the end fits. Window is shrunk (kept odd) for short curves;
+    Curves with fewer rows than deriv+1 give all NaN
+
+    Returns float array same shape as vals
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow = vals.shape[0]
+    window = min(window, nrow if nrow % 2 else nrow - 1)
+    order = min(order, window - 1)
+    if order < deriv:
+        return np.full(vals.shape, np.nan)
+    mat = savgol_matrix(window, order, deriv)
+    half = window // 2
+    out = np.empty_like(vals)
+    # Windows (nrow-window+1, cols, window) times center row
+    wins = np.lib.stride_tricks.sliding_window_view(vals, window, axis=0)
+    out[half:nrow-half] = wins @ mat[half]
+    out[:half] = mat[:half] @ vals[:window]
+    out[nrow-half:] = mat[half+1:] @ vals[nrow-window:]
+    return out
+
+
+def peak_pos(vals, default=np.nan):
+    """ Sub-row position of maximum for each col of (rows, cols) vals
+
+    Parabola through max row and its neighbors; Offset kept within half a row.
+    Max at first / last row isn't interpolated. NaN never max; All-NaN cols
+    get default
+
+    Returns float array, one value per col
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    if nrow < 1:
+        return np.full(ncol, default)
+    clean = np.where(np.isnan(vals), -np.inf, vals)
+    imax = clean.argmax(axis=0)
+    cols = np.arange(ncol)
+    y0 = clean[imax, cols]
+    ym = clean[np.maximum(imax - 1, 0), cols]
+    yp = clean[np.minimum(imax + 1, nrow - 1), cols]
+    inner = (imax > 0) & (imax < nrow - 1) & np.isfinite(ym) & np.isfinite(yp)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curv = ym - 2.0 * y0 + yp
+        off = np.where(inner & (curv < 0), 0.5 * (ym - yp) / curv, 0.0)
+    pos = imax + np.clip(off, -0.5, 0.5)
+    return np.where(np.isfinite(y0), pos, default)
+
+
+def sdm_cq(vals, window=9, order=4, default=np.nan):
+    """ Second derivative maximum positions (0-based, sub-row) for (rows, cols) curves
+
+    Savitzky-Golay second derivative, then parabolic peak interpolation. Only
+    rows with the full centered window are searched; End fits are too noisy
+    """
+    dd2 = savgol_deriv(vals, window, order, deriv=2)
+    nrow = len(dd2)
+    # Half of (maybe shrunk) window, as in savgol_deriv()
+    half = min(window, nrow if nrow % 2 else nrow - 1) // 2
+    dd2[:half] = np.nan
+    dd2[nrow-half:] = np.nan
+    return peak_pos(dd2, default=default)
+
+
+def index_at_pos(index, pos):
+    """ Interpolated (numeric) index values at (fractional) row positions
+    """
+    ivals = np.asarray(index, dtype=np.float64)
+    return np.interp(pos, np.arange(len(ivals)), ivals)
+
+
+def baseline_fit(vals, start=0, stop=None, order=1):
+    """ Least squares polynomial baselines for (rows, cols) curves, all cols at once
+
+    Fit rows are start <= row < stop; stop is scalar or per-col array (None =
+    all rows). NaN values are left out of the fit. Cols with fewer fit points
+    than coefficients get their mean (constant), or 0 with none
+
+    Returns coefficient array (cols, order+1), lowest power first, in powers
+    of baseline_x() (rows scaled to 0-1)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    stop = nrow if stop is None else stop
+    if np.ndim(stop) == 0:
+        # Same rows for all cols; One shared pseudo-inverse if no NaN in them
+        fvals = vals[start:stop]
+        if (len(fvals) >= order + 1) and not np.isnan(fvals).any():
+            xpow = baseline_x(nrow)[start:stop, None] ** np.arange(order + 1)
+            return (np.linalg.pinv(xpow) @ fvals).T
+    stop = np.broadcast_to(np.asarray(stop), (ncol,))
+    rows = np.arange(nrow)[:, None]
+    wts = (rows >= start) & (rows < stop) & ~np.isnan(vals)
+    # Normal equations from weighted power sums; (order+1) system per col
+    xpow = baseline_x(nrow)[:, None] ** np.arange(2 * order + 1)
+    sums = xpow.T @ wts
+    ata = sums[np.add.outer(np.arange(order + 1), np.arange(order + 1))].transpose(2, 0, 1)
+    wvals = np.where(wts, vals, 0.0)
+    atb = (xpow[:, :order+1].T @ wvals).T
+    # Too few points; Identity system, then constant
+    npts = sums[0]
+    few = npts < order + 1
+    ata[few] = np.eye(order + 1)
+    atb[few] = 0.0
+    coefs = np.linalg.solve(ata, atb[:, :, None])[:, :, 0]
+    coefs[few, 0] = wvals[:, few].sum(axis=0) / np.maximum(npts[few], 1)
+    return coefs
+
+
+def baseline_x(nrow):
+    """ Row positions scaled to 0-1; Keeps baseline fit well conditioned
+    """
+    return np.arange(nrow, dtype=np.float64) / max(nrow - 1, 1)
+
+
+def baseline_values(coefs, nrow):
+    """ Baseline (rows, cols) array for baseline_fit() coefficients
+    """
+    return (baseline_x(nrow)[:, None] ** np.arange(coefs.shape[1])) @ coefs.T
+
+
+def baseline_auto_stop(vals, start=0, min_rows=5, gap=6, window=9, order=4):
+    """ Per-col end (exclusive row) of baseline window, from where curves take off
+
+    Window ends gap rows before the second derivative maximum (see sdm_cq()),
+    but keeps at least min_rows rows; Cols with no maximum use all rows
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow = vals.shape[0]
+    pos = sdm_cq(vals, window, order)
+    stop = np.where(np.isnan(pos), nrow, np.floor(np.nan_to_num(pos)) - gap)
+    return np.clip(stop, min(start + min_rows, nrow), nrow).astype(np.int64)
+
+
+def baseline_correct(vals, start=0, stop=None, order=1, auto=False, gap=6, min_rows=5):
+    """ (rows, cols) vals minus fitted polynomial baselines; See baseline_fit()
+
+    auto = per-col window end found by baseline_auto_stop() (limited to stop)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow = vals.shape[0]
+    # Short (e.g. still running) curves; Fit rows start earlier
+    start = min(start, max(nrow - min_rows, 0))
+    stop = nrow if stop is None else min(stop, nrow)
+    if auto:
+        stop = np.minimum(baseline_auto_stop(vals, start, min_rows, gap), max(stop, min(start + min_rows, nrow)))
+    coefs = baseline_fit(vals, start, stop, order)
+    return vals - baseline_values(coefs, nrow)
+
+
+def melt_neg_deriv(vals, temps, window=9, order=4):
+    """ Smoothed -dF/dT for (rows, cols) melt curves; temps = row temperatures
+
+    Savitzky-Golay derivative (see savgol_deriv()) over rows, scaled by the
+    (median) temperature step
+    """
+    temps = np.asarray(temps, dtype=np.float64)
+    step = np.median(np.diff(temps)) if len(temps) > 1 else 1.0
+    return -savgol_deriv(vals, window, order, deriv=1) / step
+
+
+def peak_rows(vals, npeak=2, min_sep=0, min_frac=0.0, min_height=-np.inf):
+    """ Rows of highest local maxima for each col of (rows, cols) vals
+
+    Local maximum = above previous row and not below next (ends excluded),
+    and above min_height (scalar or per col). Later peaks must be at least
+    min_sep rows from the ones before and at least min_frac of the highest.
+    NaN never a peak
+
+    Returns int array (npeak, cols); -1 where no (more) peak
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    out = np.full((npeak, ncol), -1, dtype=np.int64)
+    if nrow < 3:
+        return out
+    clean = np.where(np.isnan(vals), -np.inf, vals)
+    local = np.zeros((nrow, ncol), dtype=bool)
+    local[1:-1] = (clean[1:-1] > clean[:-2]) & (clean[1:-1] >= clean[2:]) & np.isfinite(clean[1:-1])
+    local &= clean > min_height
+    cand = np.where(local, clean, -np.inf)
+    rows = np.arange(nrow)[:, None]
+    top = None
+    for k in range(npeak):
+        imax = cand.argmax(axis=0)
+        hmax = cand[imax, np.arange(ncol)]
+        if top is None:
+            top = hmax
+        found = np.isfinite(hmax) & (hmax >= min_frac * top)
+        out[k] = np.where(found, imax, -1)
+        # Drop this peak and its neighborhood for the next round
+        cand[np.abs(rows - imax) < max(min_sep, 1)] = -np.inf
+    return out
+
+
+def peak_props(vals, rows, xvals):
+    """ Interpolated position (x units), height and half-height width of peaks
+
+    vals = (rows, cols) curves; rows = peak row per col (-1 = none), e.g.
+    from peak_rows(); xvals = row x values (evenly spaced)
+
+    Position and height from parabola through peak row and neighbors. Width
+    is between the half-height crossings either side (linear interpolation);
+    A valley (next peak) or curve end before that bounds it. NaN where no peak
+
+    Returns (pos, height, width) float arrays, one value per col
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    xvals = np.asarray(xvals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    cols = np.arange(ncol)
+    has = rows >= 0
+    r0 = np.clip(rows, 1, max(nrow - 2, 1))
+    ym = vals[r0 - 1, cols]
+    y0 = vals[r0, cols]
+    yp = vals[np.minimum(r0 + 1, nrow - 1), cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curv = ym - 2.0 * y0 + yp
+        off = np.clip(np.where(curv < 0, 0.5 * (ym - yp) / curv, 0.0), -0.5, 0.5)
+    height = y0 - 0.25 * (ym - yp) * off
+    step = xvals[1] - xvals[0] if nrow > 1 else 1.0
+    pos = np.interp(r0 + off, np.arange(nrow), xvals)
+    # Half height crossings; Last row below half (or valley) at or before peak, first after
+    half = 0.5 * height
+    below = vals < half
+    valley = np.zeros((nrow, ncol), dtype=bool)
+    valley[1:-1] = (vals[1:-1] < vals[:-2]) & (vals[1:-1] <= vals[2:])
+    stop = below | valley
+    ridx = np.arange(nrow)[:, None]
+    left_all = np.maximum.accumulate(np.where(stop, ridx, -1), axis=0)
+    right_all = np.minimum.accumulate(np.where(stop, ridx, nrow)[::-1], axis=0)[::-1]
+    left = left_all[r0, cols]
+    right = right_all[r0, cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Fraction of a row from below-half row toward peak where curve hits half; Valleys as is
+        lv = vals[np.maximum(left, 0), cols]
+        lv1 = vals[np.clip(left + 1, 0, nrow - 1), cols]
+        lfrac = np.where(lv < half, (half - lv) / (lv1 - lv), 0.0)
+        lpos = np.where(left >= 0, left + lfrac, 0.0)
+        rv = vals[np.minimum(right, nrow - 1), cols]
+        rv1 = vals[np.clip(right - 1, 0, nrow - 1), cols]
+        rfrac = np.where(rv < half, (half - rv) / (rv1 - rv), 0.0)
+        rpos = np.where(right < nrow, right - rfrac, nrow - 1.0)
+    width = (rpos - lpos) * step
+    nan = np.full(ncol, np.nan)
+    return np.where(has, pos, nan), np.where(has, height, nan), np.where(has, width, nan)
+
+
+def melt_peaks(dvals, temps, npeak=2, min_sep=2.0, min_frac=0.1, min_height_frac=0.05):
+    """ Melt (Tm) peaks of (rows, cols) -dF/dT curves (see melt_neg_deriv())
+
+    min_sep = least temperature between peaks; min_frac = least height of
+    later peaks as fraction of primary; min_height_frac = least height of
+    any peak as fraction of the highest over all cols (so flat, no product
+    curves get none)
+
+    Returns list (primary first) of (tm, height, width) array tuples
+    """
+    dvals = np.asarray(dvals, dtype=np.float64)
+    temps = np.asarray(temps, dtype=np.float64)
+    step = abs(temps[1] - temps[0]) if len(temps) > 1 else 1.0
+    top = np.nanmax(dvals) if np.any(np.isfinite(dvals)) else 0.0
+    rows = peak_rows(dvals, npeak=npeak, min_sep=int(np.ceil(min_sep / step)), min_frac=min_frac,
+                     min_height=max(min_height_frac * top, 0.0))
+    return [peak_props(dvals, rows[k], temps) for k in range(npeak)]
+
+
+def loglin_efficiency(vals, nrows=5, stop=None, floor=0.0, min_r2=0.98):
+    """ Amplification efficiency from log-linear (exponential phase) window, per col
+
+    vals = (rows, cols) baseline corrected curves. Every window of nrows
+    consecutive rows is fit (least squares line of log10 values) for all cols
+    at once, from running sums. Windows qualify if all values are above floor
+    (scalar or per col), they end before stop (row, scalar or per col; e.g.
+    second derivative max) and R^2 >= min_r2. The last one (nearest stop,
+    most signal; Earlier ones are most hurt by baseline error) is picked
+
+    Returns (eff, r2, start, end) arrays; eff = 10 ** slope (2 = doubling per
+    row), start / end = first / last row of window. NaN (-1 rows) if none
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    nan = np.full(ncol, np.nan)
+    none = np.full(ncol, -1, dtype=np.int64)
+    if nrow < max(nrows, 2):
+        return nan, nan, none, none
+    floor = np.broadcast_to(np.asarray(floor, dtype=np.float64), (ncol,))
+    ok = vals > floor
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logv = np.where(ok, np.log10(np.where(ok, vals, 1.0)), 0.0)
+    # Window sums from running sums; Row x is window-relative, so sums of x are fixed
+    def win_sums(arr):
+        csum = np.concatenate([np.zeros((1, ncol)), np.cumsum(arr, axis=0)])
+        return csum[nrows:] - csum[:-nrows]
+    x = np.arange(nrow, dtype=np.float64)[:, None]
+    nwin = nrow - nrows + 1
+    xrel = x[:nwin]
+    cnt = win_sums(ok.astype(np.float64))
+    sy = win_sums(logv)
+    syy = win_sums(logv * logv)
+    # Sum x*y with window-relative x: sum((x - start) * y)
+    sxy = win_sums(x * logv) - xrel * sy
+    rel = np.arange(nrows, dtype=np.float64)
+    sx = rel.sum()
+    sxx = (rel * rel).sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = nrows * sxy - sx * sy
+        varx = nrows * sxx - sx * sx
+        vary = nrows * syy - sy * sy
+        slope = cov / varx
+        r2 = np.where(vary > 0, cov * cov / (varx * vary), 0.0)
+    stop = nrow if stop is None else stop
+    stop = np.broadcast_to(np.asarray(stop, dtype=np.float64), (ncol,))
+    good = (cnt == nrows) & (xrel + nrows <= stop) & (r2 >= min_r2) & (slope > 0)
+    # Last qualifying window; argmax of reversed rows
+    pick = nwin - 1 - good[::-1].argmax(axis=0)
+    cols = np.arange(ncol)
+    found = good[pick, cols]
+    eff = np.where(found, 10.0 ** slope[pick, cols], np.nan)
+    return (eff, np.where(found, r2[pick, cols], np.nan), np.where(found, pick, -1),
+            np.where(found, pick + nrows - 1, -1))
+
+
+def noise_sd(vals, nrows=10):
+    """ Robust noise sd of (rows, cols) curves from first differences of first nrows rows
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    dif = np.diff(vals[:max(nrows, 2)], axis=0)
+    if len(dif) < 1:
+        return np.zeros(vals.shape[1])
+    return 1.4826 * np.nanmedian(np.abs(dif - np.nanmedian(dif, axis=0)), axis=0) / np.sqrt(2.0)
+
+
+def values_at_pos(vals, pos):
+    """ (rows, cols) vals at fractional row pos per col, linearly interpolated; NaN where pos is
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    pos = np.asarray(pos, dtype=np.float64)
+    ok = ~np.isnan(pos)
+    p = np.clip(np.where(ok, pos, 0.0), 0, vals.shape[0] - 1)
+    lo = np.floor(p).astype(np.int64)
+    hi = np.minimum(lo + 1, vals.shape[0] - 1)
+    cols = np.arange(vals.shape[1])
+    out = vals[lo, cols] + (p - lo) * (vals[hi, cols] - vals[lo, cols])
+    return np.where(ok, out, np.nan)
+
+
+def group_percentile(vals, groups, ngroup, q):
+    """ Percentile q (0-100) of vals within each group (0 .. ngroup-1); NaNs ignored
+
+    All groups at once from one sort; Linear interpolation as np.percentile
+    Returns array of ngroup (NaN for groups without values)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.int64)
+    ok = ~np.isnan(vals)
+    if not ok.any():
+        return np.full(ngroup, np.nan)
+    vals = vals[ok]
+    groups = groups[ok]
+    svals = vals[np.lexsort((vals, groups))]
+    count = np.bincount(groups, minlength=ngroup)
+    have = count > 0
+    # Each group's values are a run of svals; Ranks within run, then offset
+    start = np.cumsum(count) - count
+    rank = np.maximum(count - 1, 0) * (q / 100.0)
+    lo = np.floor(rank).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(count - 1, 0))
+    vlo = np.where(have, svals[np.where(have, start + lo, 0)], np.nan)
+    vhi = np.where(have, svals[np.where(have, start + hi, 0)], np.nan)
+    return vlo + (rank - lo) * (vhi - vlo)
+
+
+def auto_thresholds(vals, chans, nchan, sdm_pos, start=0, stop=15, mult=10.0, top_pct=10.0,
+                    grow_rows=3, grow_min=4.0):
+    """ Per-channel thresholds from baseline noise and the common log-linear region
+
+    vals = (rows, cols) baseline corrected curves, chans = 0-based channel per
+    col, sdm_pos = second derivative max row per col (NaN if none).
+    Noise per col is the robust sd over baseline rows start .. stop; Channel
+    floor is mult x median noise. Curves above the floor at their second
+    derivative max, and grown grow_min fold over the grow_rows rows before
+    it, are amplifying; Their values there mark the top of the
+    log-linear region, and the channel ceiling is the top_pct percentile of
+    them (so most curves are still exponential at threshold). Threshold is the
+    geometric mean of floor and ceiling (middle on log scale), or the floor if
+    nothing amplifies. All channels in one pass
+
+    Returns (thresholds, floors, ceilings) arrays, one value per channel
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    chans = np.asarray(chans, dtype=np.int64)
+    start = min(max(start, 0), max(vals.shape[0] - 2, 0))
+    stop = min(max(stop, start + 2), vals.shape[0])
+    noise = noise_sd(vals[start:stop], stop - start)
+    # Constant (e.g. empty, zero filled) cols have no noise to go by
+    noise = np.where(noise > 0, noise, np.nan)
+    floors = mult * group_percentile(noise, chans, nchan, 50.0)
+    top = values_at_pos(vals, sdm_pos)
+    # Amplifying = above floor, and grew at least grow_min fold over the last grow_rows
+    # rows (exponential); Slow drift with a second derivative max doesn't count
+    before = values_at_pos(vals, np.asarray(sdm_pos, dtype=np.float64) - grow_rows)
+    with np.errstate(invalid='ignore'):
+        amp = (top > floors[chans]) & (top > grow_min * before)
+    top = np.where(amp, top, np.nan)
+    ceils = group_percentile(top, chans, nchan, top_pct)
+    with np.errstate(invalid='ignore'):
+        threshs = np.where(ceils > floors, np.sqrt(floors * ceils), floors)
+    return threshs, floors, ceils
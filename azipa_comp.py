@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# 10/17/26; Multi-channel crosstalk (color) compensation, passive reference normalization
+#
+# Dye signal bleeds into neighbouring channels; Measured = M @ true, with M the
+# instrument's (channels x channels) crosstalk matrix. Column j of M is what dye
+# j alone gives in every channel (1 in its own channel). Compensation is one
+# matrix multiply of all (cycle, well) channel vectors by inv(M).T.
+#
+# Dataset channels are matched to matrix channels by instrument channel number
+# (label like 'Step2Channel5' is channel 5); Channels read in different steps
+# are compensated as separate groups.
+#
+# Passive reference (e.g. ROX) normalization divides each target channel by the
+# reference channel of the same well and step, all wells and rows at once.
+#
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Largest acceptable crosstalk matrix condition number
+XTALK_MAX_COND = 1e6
+
+RE_CHANNEL = re.compile(r'channel\s*_?\s*(\d+)\s*$', re.IGNORECASE)
+
+
+class CrosstalkMatrix:
+    """ Instrument crosstalk matrix; mat[i, j] = signal in channel chans[i]
+    from dye of channel chans[j]. chans are instrument channel numbers
+    """
+    def __init__(self, chans, mat):
+        self.chans = [int(c) for c in chans]
+        self.mat = np.asarray(mat, dtype=np.float64)
+
+
+    def num_channels(self):
+        return len(self.chans)
+
+
+    def is_identity(self):
+        return np.array_equal(self.mat, np.eye(len(self.chans)))
+
+
+    def sub_inverse(self, chans):
+        """ Inverse of sub-matrix for channel numbers chans (all in matrix)
+        """
+        idx = [self.chans.index(c) for c in chans]
+        return np.linalg.inv(self.mat[np.ix_(idx, idx)])
+
+
+    def to_df(self):
+        # Rows measured channel, cols dye channel
+        return pd.DataFrame(self.mat, index=pd.Index(self.chans, name='Channel'),
+                            columns=[str(c) for c in self.chans])
+
+
+def crosstalk_from_df(df):
+    """ CrosstalkMatrix from data frame; First column channel numbers (measured),
+    other columns headed by (dye) channel numbers, same set in any order
+    Raises ValueError if not square, channels don't match or matrix is near singular
+    """
+    try:
+        rows = [int(c) for c in df.iloc[:, 0]]
+        cols = [int(c) for c in df.columns[1:]]
+    except (TypeError, ValueError):
+        raise ValueError("Crosstalk channels must be channel numbers") from None
+    if (len(set(rows)) != len(rows)) or (sorted(rows) != sorted(cols)):
+        raise ValueError("Crosstalk rows {} and cols {} must be the same channels".format(rows, cols))
+    vals = df.iloc[:, 1:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    if np.isnan(vals).any():
+        raise ValueError("Crosstalk matrix has blank or non-numeric entries")
+    chans = sorted(rows)
+    rpos = [rows.index(c) for c in chans]
+    cpos = [cols.index(c) for c in chans]
+    mat = vals[np.ix_(rpos, cpos)]
+    if np.linalg.cond(mat) > XTALK_MAX_COND:
+        raise ValueError("Crosstalk matrix is (near) singular")
+    return CrosstalkMatrix(chans, mat)
+
+
+def crosstalk_from_csv(fname):
+    """ CrosstalkMatrix from csv file; See crosstalk_from_df
+    """
+    return crosstalk_from_df(pd.read_csv(fname, comment='#', skipinitialspace=True))
+
+
+def chan_step_number(name):
+    """ (step prefix, instrument channel number) for dataset channel label
+    e.g. 'Step2Channel5' gives ('Step2', 5); Number None if label has none
+    """
+    match = RE_CHANNEL.search(str(name))
+    if match is None:
+        return (str(name), None)
+    return (str(name)[:match.start()], int(match.group(1)))
+
+
+def comp_groups(channels, xtalk):
+    """ Compensation groups for dataset channel labels
+
+    Returns list of (dataset channel indices, inverse sub-matrix) per step;
+    Channels not in xtalk are left alone, groups of one channel or with
+    identity sub-matrix are skipped. Empty list = nothing to do
+    """
+    if xtalk is None:
+        return []
+    steps = {}
+    for idx, name in enumerate(channels):
+        step, num = chan_step_number(name)
+        # One channel per number per step; Repeats left alone
+        if (num in xtalk.chans) and (num not in steps.setdefault(step, {})):
+            steps[step][num] = idx
+    groups = []
+    for nums in steps.values():
+        if len(nums) < 2:
+            continue
+        minv = xtalk.sub_inverse(list(nums))
+        if not np.allclose(minv, np.eye(len(nums)), rtol=0, atol=1e-12):
+            groups.append((np.array(list(nums.values()), dtype=np.int64), minv))
+    return groups
+
+
+def compensate_cols(vals, chan, well, nwell, groups):
+    """ Crosstalk compensated copy of (rows, cols) vals
+
+    chan, well = per-col 0-based dataset channel and well indices (see
+    PlateDataSet.get_col_meta); groups from comp_groups. Each group is one
+    (rows x wells, channels) @ inv(M).T multiply; Wells missing some of a
+    group's channels count those as no signal
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    out = vals.copy()
+    nrow = vals.shape[0]
+    for gchans, minv in groups:
+        # Position in group of each col's channel; -1 = not in group
+        gpos = np.full(max(int(chan.max(initial=-1)), int(gchans.max())) + 1, -1, dtype=np.int64)
+        gpos[gchans] = np.arange(len(gchans))
+        cols = np.flatnonzero(gpos[chan] >= 0)
+        gi = gpos[chan[cols]]
+        wi = well[cols]
+        full = np.zeros((nrow, nwell, len(gchans)))
+        full[:, wi, gi] = vals[:, cols]
+        comp = (full.reshape(-1, len(gchans)) @ minv.T).reshape(full.shape)
+        out[:, cols] = comp[:, wi, gi]
+    return out
+
+
+def df_compensate(df, col_meta, nwell, groups):
+    """ Crosstalk compensated wide data frame (same index, cols); df itself if no groups
+    """
+    if not groups:
+        return df
+    vals = compensate_cols(df.to_numpy(dtype=np.float64), col_meta['chan'], col_meta['well'], nwell, groups)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns, copy=False)
+
+
+def estimate_crosstalk(plates, start=2, stop=15):
+    """ Crosstalk matrix from single-dye calibration plates
+
+    plates = list of (dataset channel labels, (rows, wells, channels) array,
+        dye channel number or None = channel with most signal)
+    Per plate, signal is data minus per (well, channel) mean of rows start:stop.
+    Column of dye channel j is the least squares (through origin) slope of each
+    channel's signal on channel j's, pooled over all (cycle, well) points of
+    all plates for that dye. Channels with no plate get identity columns
+
+    Returns CrosstalkMatrix over all channel numbers seen
+    """
+    chans = sorted({num for labels, _, _ in plates for _, num in map(chan_step_number, labels)
+                    if num is not None})
+    cpos = {c: i for i, c in enumerate(chans)}
+    nchan = len(chans)
+    sxy = np.zeros((nchan, nchan))
+    syy = np.zeros(nchan)
+    for labels, arr, dye in plates:
+        # First channel of each number only (e.g. one read step)
+        nums = {}
+        for idx, label in enumerate(labels):
+            num = chan_step_number(label)[1]
+            if (num is not None) and (num not in nums):
+                nums[num] = idx
+        arr = np.asarray(arr, dtype=np.float64)[:, :, list(nums.values())]
+        sig = (arr - np.nanmean(arr[start:stop], axis=0)).reshape(-1, len(nums))
+        sig = sig[~np.isnan(sig).any(axis=1)]
+        pnums = list(nums)
+        if dye is None:
+            dye = pnums[int(np.argmax((sig * sig).sum(axis=0)))]
+        if dye not in nums:
+            raise ValueError("Dye channel {} not in calibration plate channels {}".format(dye, pnums))
+        ysig = sig[:, pnums.index(dye)]
+        j = cpos[dye]
+        sxy[[cpos[n] for n in pnums], j] += ysig @ sig
+        syy[j] += ysig @ ysig
+    mat = np.eye(nchan)
+    have = syy > 0
+    mat[:, have] = sxy[:, have] / syy[have]
+    return CrosstalkMatrix(chans, mat)
+
+
+def norm_ref_list(channels, ref_num):
+    """ Per-channel passive reference (0-based index, -1 = none) for dataset channel labels
+    Reference is the channel with instrument number ref_num in the same step; 0 = none
+    """
+    refs = [-1] * len(channels)
+    if not ref_num:
+        return refs
+    steps = [chan_step_number(c) for c in channels]
+    ref_idx = {}
+    for idx, (step, num) in enumerate(steps):
+        if num == ref_num:
+            ref_idx.setdefault(step, idx)
+    for idx, (step, num) in enumerate(steps):
+        ref = ref_idx.get(step, -1)
+        if (ref >= 0) and (idx != ref):
+            refs[idx] = ref
+    return refs
+
+
+def normalize_cols(vals, refpos, chan):
+    """ Copy of (rows, cols) vals with cols divided by their reference col
+
+    refpos = per-col reference col position, -1 = leave col alone (see
+    PlateDataSet.get_norm_ref_pos); chan = per-col channel index
+    Results are scaled by the reference channel's typical level (median
+    over wells of mean reference signal), so they stay in signal units and
+    cols whose reference has any value <= 0 or NaN (left alone) still fit in
+
+    Returns (normalized array, bool mask of cols normalized)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    out = vals.copy()
+    refpos = np.asarray(refpos, dtype=np.int64)
+    # Usable reference cols; NaN compares False. Extra False for refpos -1
+    good = (vals > 0).all(axis=0)
+    norm = np.append(good, False)[refpos] & (refpos >= 0)
+    cols = np.flatnonzero(norm)
+    rcols = refpos[cols]
+    level = np.ones(int(chan.max(initial=-1)) + 1)
+    means = vals.mean(axis=0)
+    for ref in np.unique(chan[rcols]):
+        level[ref] = np.median(means[good & (chan == ref)])
+    out[:, cols] = vals[:, cols] / vals[:, rcols] * level[chan[rcols]]
+    return out, norm
+
+
+def df_normalize(df, refpos, chan):
+    """ Passive reference normalized wide data frame (same index, cols); df itself if nothing to do
+    """
+    refpos = np.asarray(refpos, dtype=np.int64)
+    if not (refpos >= 0).any():
+        return df
+    vals, _ = normalize_cols(df.to_numpy(dtype=np.float64), refpos, chan)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns, copy=False)
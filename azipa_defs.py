@@ -36,6 +36,47 @@ settings = {
     'COLOR_CHANNEL_5' : '#5588ff',
     'COLOR_CHANNEL_6' : '#55ffff',
     'DEF_THRESH_FRAC' : 0.1,
+    'THRESH_METHOD'   : 'auto',
+    'AUTO_THRESH_NOISE_MULT' : 10.0,
+    'AUTO_THRESH_TOP_PCT'    : 10.0,
+    'COMP_MATRIX_FILE' : '',
+    'NORM_REF_CHANNEL' : 0,
+    'CACHE_DIR'       : '~/.azipa_cache',
+    'CACHE_MAX_MB'    : 500,
+    'FOLLOW_POLL_MS'  : 2000,
+    'SWEEP_NUM_THRESH' : 200,
+    'THRESH_OPT_OBJECTIVE' : 'auto',
+    'THRESH_OPT_NUM'       : 100,
+    'THRESH_OPT_MIN_FRAC'  : 0.9,
+    'DERIVED_MAX_MB'  : 200,
+    'SDM_SG_WINDOW'   : 9,
+    'SDM_SG_ORDER'    : 4,
+    'BASELINE_METHOD' : 'fit',
+    'BASELINE_ORDER'  : 1,
+    'BASELINE_START'  : 2,
+    'BASELINE_STOP'   : 15,
+    'BASELINE_AUTO'   : True,
+    'BASELINE_AUTO_GAP' : 6,
+    'BASELINE_MIN_ROWS' : 5,
+    'FIT_MODEL'       : '4PL',
+    'FIT_NPROC'       : 0,
+    'FIT_MAX_ITER'    : 100,
+    'FIT_FLAT_SNR'    : 10.0,
+    'FIT_MIN_FRAC'    : 0.05,
+    'MELT_SG_WINDOW'  : 7,
+    'MELT_SG_ORDER'   : 4,
+    'MELT_NUM_PEAKS'  : 2,
+    'MELT_PEAK_MIN_SEP'  : 2.0,
+    'MELT_PEAK_MIN_FRAC' : 0.1,
+    'EFF_WINDOW_ROWS' : 5,
+    'EFF_MIN_R2'      : 0.98,
+    'EFF_NOISE_MULT'  : 3.0,
+    'QUANT_REF_TARGETS' : '',
+    'QUANT_CALIBRATOR'  : '',
+    'QUANT_EFF'         : 2.0,
+    'QUANT_USE_SELECTION' : True,
+    'STDCURVE_PER_PLATE'  : False,
+    'STDCURVE_LOD_FRAC'   : 0.95,
 }
 
 # User-settable filter words; Can't change these
@@ -56,9 +97,13 @@ PLOT_YDELTA_MIN = 0.02
 # Choice menu lists ' ... first (non-real) list item
 CM_PLATE_CHANNEL = ['Channel']
 CM_PLATE_COLORBY = ['ColorBy']
-CM_PLATE_SELECT = ["Idle (Select)", "Select", "All", "None"]
-CM_PLOT_DATA = ["Base Corrected", "Raw", "1st derivative", "2nd derivative"]
-CM_REPORT_DATA = ["Wells", "Channels", "Thresholds"]
+CM_PLATE_SELECT = ["Idle (Select)", "Select", "All", "None", "Invert"]
+CM_PLOT_DATA = ["Base Corrected", "Raw", "Compensated", "Normalized",
+                "1st derivative", "2nd derivative",
+                "Smoothed 1st derivative", "Smoothed 2nd derivative", "Melt -dF/dT"]
+CM_REPORT_DATA = ["Wells", "Channels", "Thresholds", "Sweep (thresholds)", "Optimize (thresholds)", "Fits (sigmoid)",
+                  "Melt (Tm)", "Quant (ddCq)",
+                  "Std curve"]
 
 
 # Misc constants
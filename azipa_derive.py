@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# 10/17/26; Lazy cache of derived data (baseline corrected, derivatives ...)
+#
+# Each derived item is registered with a function and the keys it depends
+# on; It's computed on first access and kept until something it depends on
+# changes (only downstream items are dropped) or the memory budget evicts it.
+# Column-wise items can also be computed and cached for just a column
+# subset, e.g. the wells in the current selection.
+#
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class DerivedCache:
+    """ Lazily computed, cached derived values keyed by name
+
+    Roots are set (set_root), derived items registered (register) with
+    func(*dep_values) and dep keys. Roots are never evicted; Derived
+    (and column-subset) entries are dropped least recently used first
+    when over max_mb
+    """
+    def __init__(self, max_mb=200):
+        self.max_mb = max_mb
+        self.makers = {}
+        self.roots = {}
+        # Computed entries; key or (key, subset) >--> value, in use order
+        self.cache = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+
+
+    def register(self, key, func, deps=(), colwise=False):
+        """ Register derived key; Value is func(*[get(d) for d in deps])
+
+        colwise = func works column by column (cols in = cols out), so
+        column subsets can be computed from dep subsets alone
+        """
+        self.makers[key] = (func, tuple(deps), colwise)
+        self.invalidate(key)
+
+
+    def has_key(self, key):
+        return (key in self.makers) or (key in self.roots)
+
+
+    def set_root(self, key, value):
+        """ Set (or replace) root value; Drops everything derived from it
+        """
+        self.roots[key] = value
+        self.invalidate(key)
+
+
+    def set_value(self, key, value):
+        """ Set value for root or derived key (e.g. updated in place elsewhere)
+        Derived values set this way are cached as if computed
+        """
+        if key in self.makers:
+            self.invalidate(key)
+            self.store(key, value)
+        else:
+            self.set_root(key, value)
+
+
+    def dependents(self, key):
+        """ Set of registered keys depending (directly or not) on key
+        """
+        deps = set()
+        todo = [key]
+        while todo:
+            k = todo.pop()
+            for dkey, (_, kdeps, _) in self.makers.items():
+                if (k in kdeps) and (dkey not in deps):
+                    deps.add(dkey)
+                    todo.append(dkey)
+        return deps
+
+
+    def invalidate(self, key):
+        """ Drop cached key (all subsets too) and everything downstream of it
+        """
+        drop = self.dependents(key) | {key}
+        for ckey in list(self.cache):
+            base = ckey[0] if isinstance(ckey, tuple) else ckey
+            if base in drop:
+                self.discard(ckey)
+
+
+    def clear(self):
+        self.roots = {}
+        self.cache = OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+
+
+    def get(self, key, default=None):
+        """ Value for key; Computed (with deps) if not cached
+        """
+        if key in self.roots:
+            return self.roots[key]
+        if key not in self.makers:
+            return default
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        func, deps, _ = self.makers[key]
+        args = [self.get(d) for d in deps]
+        if any(a is None for a in args):
+            return default
+        value = func(*args)
+        self.store(key, value)
+        return value
+
+
+    def get_cols(self, key, pos):
+        """ Value (dataframe) for key, only columns at int positions pos
+
+        Sliced from full value if that's cached (or a root), else column-wise
+        items are computed from dep subsets and cached per subset
+        """
+        pos = np.asarray(pos, dtype=np.int64)
+        if (key in self.roots) or (key in self.cache) or (key not in self.makers):
+            value = self.get(key)
+            return None if value is None else value.iloc[:, pos]
+        func, deps, colwise = self.makers[key]
+        if not colwise:
+            return self.get(key).iloc[:, pos]
+        skey = (key, pos.tobytes())
+        if skey in self.cache:
+            self.cache.move_to_end(skey)
+            return self.cache[skey]
+        args = [self.get_cols(d, pos) for d in deps]
+        if any(a is None for a in args):
+            return None
+        value = func(*args)
+        self.store(skey, value)
+        return value
+
+
+    def store(self, ckey, value):
+        size = value_nbytes(value)
+        self.discard(ckey)
+        self.cache[ckey] = value
+        self.sizes[ckey] = size
+        self.nbytes += size
+        self.evict(keep=ckey)
+
+
+    def discard(self, ckey):
+        if ckey in self.cache:
+            del self.cache[ckey]
+            self.nbytes -= self.sizes.pop(ckey)
+
+
+    def evict(self, keep=None):
+        """ Drop least recently used entries (not keep) until under budget
+        Returns number dropped
+        """
+        n = 0
+        maxbytes = self.max_mb * 1e6
+        for ckey in list(self.cache):
+            if self.nbytes <= maxbytes:
+                break
+            if ckey == keep:
+                continue
+            self.discard(ckey)
+            n += 1
+        return n
+
+
+def value_nbytes(value):
+    """ Approximate memory (bytes) used by cached value
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 0
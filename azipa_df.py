@@ -4,6 +4,7 @@
 # 3/4/18 RTK; Simplify into one class, multi-channel DataFrame
 # 3/24/18 RTK; Clean up, simple non-df things to util
 # 8/17/19 RTK; V0.22; Clean up code some (pylint; DEBUG)
+# 10/17/26; Bulk (per-section) csv parser; Lazy per-channel loading; Follow mode
 #
 # Dataframes for 96-well plate stuff for Azure In-house PCR Analysis tool
 #   Classes and util functions
@@ -21,6 +22,8 @@ import codecs
 import string
 import getpass
 
+import io
+import mmap
 import os
 import time
 
@@ -28,6 +31,7 @@ import numpy as np
 import pandas as pd
 
 
+import azipa_calc as azcalc
 import azipa_util as azu
 
 
@@ -35,12 +39,64 @@ import azipa_util as azu
 # Main data colleciton class
 class PlateDataSet:
     """ Collection (96-well) plate data...
+
+    Data is one float array buf, shaped (rows, channels, wells); Rows are
+    cycles (or temperatures), wells are the union over channels, with
+    has_data (wells, channels) marking which wells have data per channel.
+    arr gives the (rows, wells, channels) view; Channel, well and subset
+    views come straight off it. DataFrame accessors (df, get_index_df) wrap
+    the array without copying when every well has data.
+
+    Channels may be added lazily (file section offsets only); These are
+    parsed on first use, e.g. get_chan_1index_cols() or df access
     """
     def __init__(self, fname=''):
         self.fname = fname
         self.channels = []
         self.ch_names = []
-        self.df = None
+        # Per-channel passive reference (0-based channel index) it's normalized by; -1 = none
+        self.ch_norm_refs = []
+        # Row index (pandas Index), well labels, data and data-present mask
+        self.index = None
+        self.wells = []
+        self.well_pos = {}
+        self.buf = None
+        self.has_data = np.zeros((0, 0), dtype=bool)
+        # Per-channel lazy (start, end, nrows) file sections; None = loaded
+        self.ch_sections = []
+        # Wide (all channels) dataframe, column labels and metadata, made on demand
+        self._df = None
+        self._cols = None
+        self._col_meta = None
+        self._geom = None
+        # Csv separator and comment for parsing lazy channels
+        self.csv_sep = ','
+        self.csv_com = '#'
+
+
+    @property
+    def arr(self):
+        """ Data as (rows, wells, channels) array view
+        """
+        self.load_all()
+        return None if self.buf is None else self.buf.transpose(0, 2, 1)
+
+
+    @property
+    def df(self):
+        """ Wide dataframe with all channels (cols like 'A3_0'); Parses any lazy channels
+        """
+        if (self._df is None) and self.channels:
+            self.load_all()
+            nrow = self.num_rows()
+            if self.has_data.all():
+                # (rows, channels, wells) to (rows, channel-major cols) is a view
+                data = self.buf.reshape(nrow, -1)
+            else:
+                data = self.buf.reshape(nrow, -1)[:, self.has_data.T.ravel()]
+            self._df = pd.DataFrame(data, index=self.index, columns=self.get_chan_1index_cols(0),
+                                    copy=False)
+        return self._df
 
 
     def add_df_chan(self, df, chan, name=''):
@@ -49,29 +105,171 @@ class PlateDataSet:
         chan is the channel name (e.g. filekey 'Step1Channel2')
         df is dataframe; If already have one, new number of rows must be same
         """
+        self.add_df_chans([(chan, name, df)])
+
+
+    def add_df_chans(self, items):
+        """ Add list of (chan, name, df) channels to collection; One (re)allocation
+
+        df cols are well labels; Missing wells (vs other channels) have no data
+        """
+        if not items:
+            return
+        for chan, _, df in items:
+            if chan in self.channels:
+                raise ValueError('Add channel df name', chan, 'already in collection')
+        if self.buf is None:
+            self.index = items[0][2].index
+        nchan = self.num_channels()
+        for chan, name, _ in items:
+            self.add_chan(chan, name=name)
+        self.add_wells([w for _, _, df in items for w in df.columns])
+        self.alloc_buf()
+        for i, (_, _, df) in enumerate(items):
+            self.set_index_chan_df(nchan + i, df)
+
+
+    def add_lazy_chan(self, chan, section, name='', wells=None):
+        """ Add channel to be parsed (from fname) on first use
+
+        section is (start, end, nrows); Byte offsets of section body and number of data rows
+        wells is list of well labels (section header), if known
+        """
+        self.add_chan(chan, name=name)
+        self.ch_sections[-1] = section
+        if wells:
+            self.add_wells(wells)
+
+
+    def add_chan(self, chan, name=''):
         if chan in self.channels:
             raise ValueError('Add channel df name', chan, 'already in collection')
-        # Suffix (channel index number) for columns
-        #   e.g. First channel cols end with 0, second with 1, etc
-        suf = azu.chan_index_col_suf(len(self.channels))
         # Add channel and name to collection
         self.channels.append(chan)
         self.ch_names.append(name)
-        # Update column labels to include channel number
-        df.columns = [str(col) + suf for col in df.columns]
-        # If none already, just keep this one
-        if self.df is None:
-            self.df = df
-        else:
-            # Check number of rows matches
-            row, _ = self.df.shape
-            nrow, _ = df.shape
-            if row != nrow:
-                raise ValueError('Add channel df nrow missmatch', nrow, row)
-            if self.df.index.name != df.index.name:
-                raise ValueError('Add channel df nrow missmatch', self.df.index.name, df.index.name)
-            # Append column-wise
-            self.df = pd.concat([self.df, df], axis=1)
+        self.ch_norm_refs.append(-1)
+        self.ch_sections.append(None)
+        self.reset_cols()
+
+
+    def add_wells(self, wells):
+        """ Add any new wells (labels) to well axis, keeping first-seen order
+        """
+        for well in wells:
+            if well not in self.well_pos:
+                self.well_pos[well] = len(self.wells)
+                self.wells.append(well)
+                self._geom = None
+        self.reset_cols()
+
+
+    def alloc_buf(self, nrow=None):
+        """ Make sure buf (and has_data) cover all rows, channels, wells
+
+        Keeps existing data; New entries are zero (pages untouched until used)
+        """
+        if nrow is None:
+            nrow = len(self.index)
+        shape = (nrow, self.num_channels(), len(self.wells))
+        if (self.buf is not None) and (self.buf.shape == shape):
+            return
+        buf = np.zeros(shape, dtype=np.float64)
+        has_data = np.zeros((shape[2], shape[1]), dtype=bool)
+        if self.buf is not None:
+            r, c, w = self.buf.shape
+            buf[:r, :c, :w] = self.buf
+            has_data[:w, :c] = self.has_data
+        self.buf = buf
+        self.has_data = has_data
+        self.reset_cols()
+
+
+    def set_index_chan_df(self, idx, df):
+        """ Set data for (0-based) channel index from dataframe (well label cols)
+        """
+        if self.buf is None:
+            self.index = df.index
+        # Check number of rows matches
+        row = len(self.index)
+        nrow, _ = df.shape
+        if row != nrow:
+            raise ValueError('Add channel df nrow missmatch', nrow, row)
+        if self.index.name != df.index.name:
+            raise ValueError('Add channel df nrow missmatch', self.index.name, df.index.name)
+        self.add_wells(df.columns)
+        self.alloc_buf()
+        widx = [self.well_index(w) for w in df.columns]
+        # Wells without data in channel are NaN
+        self.buf[:, idx, :] = np.nan
+        self.buf[:, idx, widx] = df.to_numpy(dtype=np.float64)
+        self.has_data[:, idx] = False
+        self.has_data[widx, idx] = True
+        self.reset_cols()
+
+
+    def load_index_chan(self, idx):
+        """ Make sure (0-based) channel index is parsed
+        """
+        if self.ch_sections[idx] is not None:
+            start, end, nrows = self.ch_sections[idx]
+            with open(self.fname, 'rb') as infile:
+                infile.seek(start)
+                body = infile.read(end - start)
+            df = dataframe_from_azcsv_section(body, sep=self.csv_sep, com=self.csv_com)
+            if df is None:
+                raise ValueError('Lazy channel has no data', self.channels[idx])
+            if self.buf is None:
+                self.index = df.index
+                self.alloc_buf(nrow=nrows if nrows == len(df.index) else None)
+            self.set_index_chan_df(idx, df)
+            self.ch_sections[idx] = None
+
+
+    def load_all(self):
+        for i in range(self.num_channels()):
+            self.load_index_chan(i)
+
+
+    def is_index_chan_loaded(self, idx):
+        return self.ch_sections[idx] is None
+
+
+    def append_rows(self, index, ch_arrs):
+        """ Append rows (e.g. new cycles) to all channels
+
+        index is list-like of new index values
+        ch_arrs is list (per channel) of arrays (new rows x channel data cols)
+        """
+        self.load_all()
+        nold = self.num_rows()
+        nnew = len(index)
+        self.index = self.index.append(pd.Index(index, name=self.index.name))
+        self.alloc_buf(nrow=nold + nnew)
+        self.buf[nold:] = np.nan
+        for i, arr in enumerate(ch_arrs):
+            self.buf[nold:, i, self.has_data[:, i]] = arr
+        self._df = None
+
+
+    def reset_cols(self):
+        # Column labels and wide df depend on channels, wells, has_data
+        self._cols = None
+        self._col_meta = None
+        self._df = None
+
+
+    def num_rows(self):
+        return 0 if self.index is None else len(self.index)
+
+
+    def num_wells(self):
+        return len(self.wells)
+
+
+    def is_melt(self):
+        """ True if rows are temperatures (melt curve data), not cycles
+        """
+        return (self.index is not None) and str(self.index.name).upper().startswith('TEMP')
 
 
     def num_channels(self):
@@ -86,30 +284,376 @@ class PlateDataSet:
         return self.ch_names
 
 
+    def set_norm_refs(self, refs):
+        """ Set per-channel passive reference channel (0-based index, -1 = not normalized)
+        Reference channels themselves can't be normalized
+        """
+        refs = [int(r) for r in refs]
+        if len(refs) != self.num_channels():
+            raise ValueError('Norm refs for', len(refs), 'channels; Have', self.num_channels())
+        for i, ref in enumerate(refs):
+            if (ref >= self.num_channels()) or (ref == i) or ((ref >= 0) and (refs[ref] >= 0)):
+                raise ValueError('Bad norm reference', ref, 'for channel', i)
+        self.ch_norm_refs = refs
+
+
+    def norm_ref_list(self):
+        return self.ch_norm_refs
+
+
+    def ref_chan_list(self):
+        """ Sorted (0-based) channels used as passive reference by some channel
+        """
+        return sorted({r for r in self.ch_norm_refs if r >= 0})
+
+
+    def get_norm_ref_pos(self):
+        """ Per wide df column, position of its well's reference channel column; -1 = none
+        (channel not normalized, or well has no reference data)
+        """
+        meta = self.get_col_meta()
+        # (channel, well) >--> column position; Extra -1 row for no reference
+        cpos = np.full((self.num_channels() + 1, len(self.wells)), -1, dtype=np.int64)
+        cpos[meta['chan'], meta['well']] = np.arange(len(meta['chan']))
+        refs = np.asarray(self.ch_norm_refs, dtype=np.int64)[meta['chan']]
+        return cpos[refs, meta['well']]
+
+
+    def well_index(self, well):
+        """ Index (on well axis) for well label
+        """
+        return self.well_pos[well]
+
+
+    def chan_view(self, idx):
+        """ (rows, wells) view of (0-based) channel index
+        """
+        self.load_index_chan(idx)
+        return self.buf[:, idx, :]
+
+
+    def well_view(self, well):
+        """ (rows, channels) view of well (label)
+        """
+        self.load_all()
+        return self.buf[:, :, self.well_index(well)]
+
+
+    def subset_view(self, wells=None, chans=None):
+        """ (rows, wells, channels) subset; wells, chans as int / slice / bool mask / index list
+
+        Contiguous selections come back as views; Others copy (numpy fancy indexing)
+        """
+        arr = self.arr
+        wsel = selection_slice(wells)
+        csel = selection_slice(chans)
+        if not isinstance(wsel, (slice, int, np.integer)):
+            arr = arr[:, wsel, :]
+            wsel = slice(None)
+        return arr[:, wsel, csel]
+
+
+    def get_index_df(self, idx):
+        """ Get dataframe for (0-based) channel index; Parses if lazy
+        Wraps channel view (no copy) if all wells have data
+        """
+        data = self.chan_view(idx)
+        sel = self.has_data[:, idx]
+        if not sel.all():
+            data = data[:, sel]
+        return pd.DataFrame(data, index=self.index, columns=self.get_chan_1index_cols(idx+1),
+                            copy=False)
+
+
     def get_chan_1index_cols(self, idx):
         """ Get list of (dataframe) columns for (channel) index
         1-based index; zero = all
         """
         cols = []
-        if (self.df is not None) and (idx >= 0):
+        if self.channels and (0 <= idx <= self.num_channels()):
+            if idx == 0:
+                self.load_all()
+            else:
+                self.load_index_chan(idx-1)
+            if self._cols is None:
+                self._cols = self.make_cols()
             if idx == 0:
-                cols = list(self.df.columns)
+                cols = [c for clis in self._cols for c in clis]
             else:
-                suf = azu.chan_1index_col_suf(idx)
-                cols = [c for c in self.df.columns if c.endswith(suf)]
+                cols = list(self._cols[idx-1])
         return cols
 
 
+    def make_cols(self):
+        """ Per-channel lists of column labels for wells with data; 'A3_0'
+        """
+        ch_cols = []
+        for i in range(self.num_channels()):
+            suf = azu.chan_index_col_suf(i)
+            if i < self.has_data.shape[1]:
+                ch_cols.append([w + suf for w, h in zip(self.wells, self.has_data[:, i]) if h])
+            else:
+                ch_cols.append([])
+        return ch_cols
+
+
+    def get_geom(self):
+        """ Plate geometry (azu.PlateGeom), detected from well labels
+        """
+        if self._geom is None:
+            self._geom = azu.plate_geom_for_wells(self.wells)
+        return self._geom
+
+
+    def get_col_meta(self):
+        """ Wide df column metadata; Dict of per-column arrays, built once per layout
+            'label' = column label ('A3_0'), 'chan' = 0-based channel index,
+            'well' = index into wells, 'row', 'col' = plate cell,
+            'plate' = plate (linear) well index; Plate ones are -1 if not a well label
+        """
+        if self._col_meta is None:
+            labels = self.get_chan_1index_cols(0)
+            # Cols are channel-major, then wells in well-axis order, as nonzero gives
+            chans, wells = np.nonzero(self.has_data.T)
+            wrows, wcols = azu.well_rowcol_arrays(self.wells)
+            wplate = self.get_geom().wells_to_index_array(self.wells)
+            self._col_meta = {'label': np.array(labels, dtype=object), 'chan': chans,
+                              'well': wells, 'row': wrows[wells], 'col': wcols[wells],
+                              'plate': wplate[wells]}
+        return self._col_meta
+
+
+    def get_col_mask(self, chans=None, cells=None):
+        """ Bool mask over wide df columns for channel (0-based) and cell collections
+        None = no restriction
+        """
+        meta = self.get_col_meta()
+        mask = np.ones(len(meta['chan']), dtype=bool)
+        if chans is not None:
+            cmask = np.zeros(self.num_channels(), dtype=bool)
+            cmask[list(chans)] = True
+            mask &= cmask[meta['chan']]
+        if cells is not None:
+            # Flat plate mask, then look up each column's plate index
+            geom = self.get_geom()
+            pmask = np.zeros(geom.num_wells() + 1, dtype=bool)
+            if cells:
+                pmask[geom.cells_to_index_array(cells)] = True
+            # Index -1 (not on plate) hits the last, always False, entry
+            pmask[-1] = False
+            mask &= pmask[meta['plate']]
+        return mask
+
+
+    def get_col_pos(self, chans=None, cells=None):
+        """ Int positions of wide df columns for channel and cell collections
+        """
+        return np.flatnonzero(self.get_col_mask(chans=chans, cells=cells))
+
+
+def selection_slice(sel):
+    """ Selection (None, int, slice, bool mask, index list) as slice when contiguous
+
+    Slices index numpy arrays as views, masks / lists as copies
+    """
+    if sel is None:
+        return slice(None)
+    if isinstance(sel, (slice, int, np.integer)):
+        return sel
+    sel = np.asarray(sel)
+    if sel.dtype == bool:
+        sel = np.flatnonzero(sel)
+    if len(sel) == 0:
+        return slice(0, 0)
+    if np.all(np.diff(sel) == 1):
+        return slice(int(sel[0]), int(sel[-1]) + 1)
+    return sel
+
+
 # ----------------------
-def platedataset_from_azcsv(fname, sep=',', com='#'):
+class AzcsvFollower:
+    """ Follow Azure csv file still being written (e.g. run in progress)
+
+    Remembers each section's header and byte offset (from body start) of its
+    first row not yet in the dataset; poll() reads only from there and extends
+    the dataset in place. An empty dataset is filled by the first poll
+    """
+    def __init__(self, dset, sep=',', com='#'):
+        self.dset = dset
+        self.sep = sep
+        self.com = com
+        # Rows already in dataset came from file as is; Empty dataset reads on first poll
+        self.size = os.path.getsize(dset.fname) if dset.num_channels() else -1
+        # Per section (chan, name, Step line, Step line offset, body offset); None until found
+        self.sections = None
+        # Per section header tokens and offset (from body start) of next unread row
+        self.headers = None
+        self.row_offs = None
+        # Column positions (in section header) for each channel's kept cols
+        self.ch_colpos = None
+
+
+    def find_sections(self, data):
+        """ (Re)locate sections in (bytes, mmap) file data; They move as earlier sections grow
+
+        First time, also reads headers and skips rows already in dataset
+        Returns False if some section has no complete header line yet
+        """
+        secs = azcsv_section_list(data, sep=self.sep, com=self.com)
+        if self.dset.num_channels() and ([sec[0] for sec in secs] != self.dset.channel_list()):
+            raise ValueError('Followed file channels changed', self.dset.fname)
+        if self.headers is None:
+            headers = []
+            row_offs = []
+            nrows = self.dset.num_rows()
+            for _, _, start, end, _ in secs:
+                body = data[start:end]
+                header, pos = azcsv_section_header(body, sep=self.sep, com=self.com)
+                if (header is None) or (pos > len(body)):
+                    return False
+                rest = azcsv_rows_after(body[pos:], nrows, com=self.com, complete=False)
+                headers.append(header)
+                row_offs.append(len(body) - len(rest))
+            self.headers = headers
+            self.row_offs = row_offs
+        self.sections = []
+        for chan, name, start, _, _ in secs:
+            spos = data.rfind(b'\n', 0, max(start - 1, 0)) + 1
+            self.sections.append((chan, name, data[spos:start], spos, start))
+        return True
+
+
+    def sections_moved(self, data):
+        """ True if any section's Step line is not where it was
+        """
+        return any(data[spos:spos+len(line)] != line for _, _, line, spos, _ in self.sections)
+
+
+    def set_colpos(self):
+        """ Map each channel's dataset cols to positions in section header
+        """
+        self.ch_colpos = []
+        for i, header in enumerate(self.headers):
+            hpos = {lab: k for k, lab in enumerate(header[1:])}
+            labs = [c.rsplit('_', 1)[0] for c in self.dset.get_chan_1index_cols(i+1)]
+            self.ch_colpos.append([hpos[lab] for lab in labs])
+
+
+    def read_new_rows(self, data):
+        """ Parse complete rows past each section's offset
+
+        Returns list of (row bytes, index tokens, array) per section or None if any has none
+        """
+        parsed = []
+        nsec = len(self.sections)
+        for i, (_, _, _, _, start) in enumerate(self.sections):
+            end = self.sections[i+1][3] if (i + 1 < nsec) else len(data)
+            rows = data[start+self.row_offs[i]:end]
+            rows = rows[:rows.rfind(b'\n') + 1]
+            # New section past last one we know of
+            if (i + 1 == nsec) and (rows.startswith(b'Step') or (b'\nStep' in rows)):
+                raise ValueError('Followed file channels changed', self.dset.fname)
+            arrs = azcsv_rows_to_array(rows, len(self.headers[i]), sep=self.sep, com=self.com)
+            if arrs is None:
+                return None
+            parsed.append((rows,) + arrs)
+        return parsed
+
+
+    def poll(self):
+        """ Check file for new rows; Append any complete rows present in all channels
+
+        Only bytes past each section's last row taken are read (file is memory mapped)
+        Returns number of rows added
+        """
+        size = os.path.getsize(self.dset.fname)
+        if (size == self.size) or (size < 1):
+            return 0
+        self.size = size
+        with open(self.dset.fname, 'rb') as infile:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if (self.sections is None) or self.sections_moved(data):
+                    if not self.find_sections(data):
+                        return 0
+                parsed = self.read_new_rows(data)
+        if not parsed:
+            return 0
+        # Keep only rows all channels have; Rest are read again next time
+        nnew = min(len(toks) for _, toks, _ in parsed)
+        for i, (rows, _, _) in enumerate(parsed):
+            rest = azcsv_rows_after(rows, nnew, com=self.com, complete=False)
+            self.row_offs[i] += len(rows) - len(rest)
+        if not self.dset.num_channels():
+            items = []
+            for (chan, name, _, _, _), header, (_, toks, arr) in zip(self.sections, self.headers, parsed):
+                items.append((chan, name, dataframe_from_azcsv_rows(header, toks[:nnew], arr[:nnew])))
+            self.dset.add_df_chans(items)
+            return nnew
+        if self.ch_colpos is None:
+            self.set_colpos()
+        ch_arrs = [arr[:nnew, colpos] for (_, _, arr), colpos in zip(parsed, self.ch_colpos)]
+        index = pd.to_numeric(pd.Series(parsed[0][1][:nnew]), errors='coerce').values
+        self.dset.append_rows(index, ch_arrs)
+        return nnew
+
+
+def azcsv_follow(fname, sep=',', com='#'):
+    """ Start following Azure csv file still being written
+
+    Dataset is read by the follower itself; Complete rows only, cut to those
+    all channels have, so polls carry on from exactly there
+
+    Returns AzcsvFollower; Its dset is the PlateDataSet
+    Raises ValueError if no complete rows yet
+    """
+    follower = AzcsvFollower(PlateDataSet(fname=fname), sep=sep, com=com)
+    if follower.poll() < 1:
+        raise ValueError('No complete rows in all channels yet', fname)
+    return follower
+
+
+def platedataset_from_buffer(fname, channels, ch_names, index, wells, buf, has_data):
+    """ Build PlateDataSet straight from (rows, channels, wells) array, no copy
+
+    index is pandas Index (rows); has_data is (wells, channels) bool
+
+    Returns PlateDataSet using buf as its data
+    """
+    dset = PlateDataSet(fname=fname)
+    for chan, name in zip(channels, ch_names):
+        dset.add_chan(chan, name=name)
+    dset.index = index
+    dset.add_wells(wells)
+    dset.buf = buf
+    dset.has_data = np.asarray(has_data, dtype=bool)
+    return dset
+
+
+def platedataset_from_azcsv(fname, sep=',', com='#', bulk=True, lazy=False):
     """ Parse Azure multi-channel multi-well csv file
 
+    If lazy, only index sections now; Channels parsed on first use
+    If bulk, find sections up front and parse each numeric block in one go,
+    else parse line by line (original, slow)
+
     Return PlateDataSet
     """
     # Check if file exists up front
     if not os.path.isfile(fname):
         print("File does not exist: {0}".format(fname))
         return None
+    if lazy:
+        return platedataset_from_azcsv_lazy(fname, sep=sep, com=com)
+    if bulk:
+        return platedataset_from_azcsv_bulk(fname, sep=sep, com=com)
+    return platedataset_from_azcsv_lines(fname, sep=sep, com=com)
+
+
+def platedataset_from_azcsv_lines(fname, sep=',', com='#'):
+    """ Parse Azure csv file line by line, filtering each char
+
+    Return PlateDataSet
+    """
     # Collection for dataframes for each channel
     dset = PlateDataSet(fname=fname)
     tab = None
@@ -117,7 +661,7 @@ def platedataset_from_azcsv(fname, sep=',', com='#'):
     with codecs.open(fname, 'r', encoding='utf-8') as infile:
         for line in infile:
             # Strip out any non-print chars from line
-            cline = ''.join(filter(lambda x: x in string.printable, line)).strip()
+            cline = clean_line(line)
             # Ignore if comment line
             if com and cline.startswith(com):
                 continue
@@ -128,14 +672,11 @@ def platedataset_from_azcsv(fname, sep=',', com='#'):
             # Data series rows start like: 'Step1Channel1'
             if parts[0].startswith('Step'):
                 if tab:
-                    df = dataframe_from_tab(tab, chan)
+                    df = dataframe_from_tab(tab)
                     dset.add_df_chan(df, chan, name=tabname)
                 # Init new table and name
                 tab = []
-                # In case start-line has multiple (space-delim) parts, key = first, name = last
-                parts = parts[0].split()
-                chan = parts[0]
-                tabname = parts[-1]
+                chan, tabname = chan_name_from_parts(parts)
             else:
                 if tab is not None:
                     tab.append(parts)
@@ -146,6 +687,204 @@ def platedataset_from_azcsv(fname, sep=',', com='#'):
     return dset
 
 
+def platedataset_from_azcsv_bulk(fname, sep=',', com='#'):
+    """ Parse Azure csv file by sections; Each numeric block read in one call
+
+    Gives the same PlateDataSet as line-by-line parsing
+    """
+    dset = PlateDataSet(fname=fname)
+    with open(fname, 'rb') as infile:
+        data = infile.read()
+    items = []
+    for chan, name, start, end, _ in azcsv_section_list(data, sep=sep, com=com):
+        df = dataframe_from_azcsv_section(data[start:end], sep=sep, com=com)
+        if df is not None:
+            items.append((chan, name, df))
+    # All channels in, one array allocation
+    dset.add_df_chans(items)
+    return dset
+
+
+def platedataset_from_azcsv_lazy(fname, sep=',', com='#'):
+    """ Index Azure csv file sections; Channel data parsed on first use
+    """
+    dset = PlateDataSet(fname=fname)
+    dset.csv_sep = sep
+    dset.csv_com = com
+    with open(fname, 'rb') as infile:
+        for chan, name, start, end, nrows in azcsv_section_index(fname, sep=sep, com=com):
+            # Header line gives wells; Enough to lay out data array
+            infile.seek(start)
+            chunk = infile.read(min(end - start, 1 << 16))
+            header, pos = azcsv_section_header(chunk, sep=sep, com=com)
+            wells = None
+            if header and (pos <= len(chunk)):
+                wells = [w for w in header[1:] if w]
+            dset.add_lazy_chan(chan, (start, end, nrows), name=name, wells=wells)
+    return dset
+
+
+def azcsv_section_index(fname, sep=',', com='#'):
+    """ Scan file once for sections; File is memory mapped, not read in
+
+    Returns list of (chan, name, start, end, nrows) tuples; See azcsv_section_list
+    """
+    if os.path.getsize(fname) < 1:
+        return []
+    with open(fname, 'rb') as infile:
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return azcsv_section_list(data, sep=sep, com=com)
+
+
+def azcsv_section_list(data, sep=',', com='#'):
+    """ Find 'StepNChannelM' sections in raw (bytes) csv data
+
+    Walks line starts only (few, long lines), so cheap for wide plates
+
+    Returns list of (chan, name, start, end, nrows) tuples; start, end are
+    byte offsets of the section body (lines following the Step line), nrows
+    is number of data rows (less header, blank and comment lines)
+    """
+    slis = []
+    bcom = com.encode() if com else None
+    size = len(data)
+    pos = 0
+    while pos < size:
+        eol = data.find(b'\n', pos)
+        eol = size if eol < 0 else eol
+        # Only need line head to check for start of section
+        head = data[pos:min(eol, pos+256)].lstrip(b'\xef\xbb\xbf \t')
+        if head.startswith(b'Step'):
+            # Finish last one
+            if slis:
+                slis[-1][3] = pos
+            line = data[pos:eol].decode('utf-8', errors='ignore')
+            chan, name = chan_name_from_parts(clean_line(line).split(sep))
+            # Body start, end, row count (-1 for header line)
+            slis.append([chan, name, min(eol+1, size), size, -1])
+        elif slis and head.strip() and not (bcom and head.startswith(bcom)):
+            slis[-1][4] += 1
+        pos = eol + 1
+    return [(c, n, s, e, max(0, r)) for c, n, s, e, r in slis]
+
+
+def dataframe_from_azcsv_section(body, sep=',', com='#'):
+    """ Dataframe from section body; Header (label) line, then numeric rows
+
+    Numeric rows are read straight to float array in one call; If that
+    fails (e.g. non-numeric junk, ragged rows), falls back to per-value coercion
+
+    Returns DataFrame or None if no header line
+    """
+    header, pos = azcsv_section_header(body, sep=sep, com=com)
+    if header is None:
+        return None
+    parsed = azcsv_rows_to_array(body[pos:], len(header), sep=sep, com=com)
+    if parsed is None:
+        return dataframe_from_tab(tab_from_lines(body, sep=sep, com=com))
+    itoks, arr = parsed
+    return dataframe_from_azcsv_rows(header, itoks, arr)
+
+
+def dataframe_from_azcsv_rows(header, itoks, arr):
+    """ Dataframe from section header tokens and parsed rows (see azcsv_rows_to_array)
+    """
+    # Index via to_numeric so int / float typing matches dataframe_from_tab
+    index = pd.Index(pd.to_numeric(pd.Series(itoks), errors='coerce'), name=header[0])
+    # Drop columns with missing values, like dataframe_from_tab
+    keep = np.flatnonzero(~np.isnan(arr).any(axis=0))
+    cols = [header[k+1] for k in keep]
+    return pd.DataFrame(arr[:, keep], index=index, columns=cols)
+
+
+def azcsv_section_header(body, sep=',', com='#'):
+    """ Header (column label) tokens of section body = first non-blank, non-comment line
+
+    Returns (token list, offset of next line); (None, len) if no header
+    """
+    pos = 0
+    while pos < len(body):
+        eol = body.find(b'\n', pos)
+        eol = len(body) if eol < 0 else eol
+        line = clean_line(body[pos:eol].decode('utf-8', errors='ignore'))
+        pos = eol + 1
+        if line and not (com and line.startswith(com)):
+            return line.split(sep), pos
+    return None, len(body)
+
+
+def azcsv_rows_to_array(rows, ncol, sep=',', com='#'):
+    """ Parse (bytes) numeric rows of ncol fields; First field = index
+
+    Returns (index token list, float array rows x ncol-1) or None if bulk read fails
+    """
+    # Index (first) column tokens; Few rows (cycles) so cheap to split
+    itoks = []
+    bsep = sep.encode()
+    for line in rows.splitlines():
+        tok = clean_line(line.split(bsep, 1)[0].decode('utf-8', errors='ignore'))
+        if (tok or (bsep in line)) and not (com and tok.startswith(com)):
+            itoks.append(tok)
+    if (not itoks) or (ncol < 2):
+        return None
+    # Numeric block straight to float array in one call
+    try:
+        arr = np.loadtxt(io.BytesIO(rows), delimiter=sep, comments=com or None,
+                         usecols=range(1, ncol), ndmin=2, dtype=np.float64)
+    except ValueError:
+        return None
+    if arr.shape[0] != len(itoks):
+        return None
+    return itoks, arr
+
+
+def azcsv_rows_after(rows, nskip, com='#', complete=True):
+    """ Bytes of data rows following the first nskip; Blank, comment lines not counted
+
+    If complete, drop trailing line without newline (e.g. still being written)
+    """
+    bcom = com.encode() if com else None
+    if complete:
+        rows = rows[:rows.rfind(b'\n') + 1]
+    pos = 0
+    n = 0
+    while (n < nskip) and (pos < len(rows)):
+        eol = rows.find(b'\n', pos)
+        eol = len(rows) if eol < 0 else eol
+        line = rows[pos:eol].strip()
+        if line and not (bcom and line.startswith(bcom)):
+            n += 1
+        pos = eol + 1
+    return rows[pos:]
+
+
+def tab_from_lines(body, sep=',', com='#'):
+    """ Split (bytes) section body into list of token lists; Skips comment lines
+    """
+    tab = []
+    for line in body.decode('utf-8', errors='ignore').splitlines():
+        cline = clean_line(line)
+        if com and cline.startswith(com):
+            continue
+        tab.append(cline.split(sep))
+    return tab
+
+
+def clean_line(line):
+    """ Strip out any non-print chars (and end whitespace) from line
+    """
+    return ''.join(filter(lambda x: x in string.printable, line)).strip()
+
+
+def chan_name_from_parts(parts):
+    """ Channel key and name from (split) Step line
+
+    In case start-line has multiple (space-delim) parts, key = first, name = last
+    """
+    parts = parts[0].split()
+    return parts[0], parts[-1]
+
+
 def dataframe_from_tab(tab, dropna=True):
     # Assume first row = column labels
     # Assume first row, first col = index column name
@@ -197,6 +936,50 @@ def platedataset_to_azcsv(dset, fname, com=True, dropna=True):
     return n
 
 
+def thresh_sweep_df(dset, sweeps):
+    """ Threshold sweep results as one dataframe; Index (Channel, Thresh), well cols
+
+    sweeps is dict of channel index >--> (thresholds, Cq matrix (thresholds x channel cols))
+    Wells without data in a channel are NaN
+    """
+    frames = []
+    for idx in sorted(sweeps):
+        threshs, cqm = sweeps[idx]
+        wells = [dset.wells[w] for w in np.flatnonzero(dset.has_data[:, idx])]
+        index = pd.MultiIndex.from_arrays([np.full(len(threshs), idx + 1), threshs],
+                                          names=['Channel', 'Thresh'])
+        frames.append(pd.DataFrame(cqm, index=index, columns=wells))
+    if not frames:
+        return pd.DataFrame()
+    # Union of wells, in plate order
+    df = pd.concat(frames)
+    order = np.argsort(dset.get_geom().wells_to_index_array(dset.wells), kind='stable')
+    return df[[dset.wells[w] for w in order if dset.wells[w] in df.columns]]
+
+
+def curve_fit_df(dset, fres, cqfit=None):
+    """ Curve fit results (azfit.FitResult for dataset cols) as one dataframe
+
+    Index (Well, Channel) in plate well order; Cols model params, plateau,
+    fit metrics and status, plus CqFit if cqfit dict (col >--> Cq) given
+    """
+    meta = dset.get_col_meta()
+    order = np.lexsort((meta['chan'], meta['plate']))
+    index = pd.MultiIndex.from_arrays([[dset.wells[w] for w in meta['well'][order]], meta['chan'][order] + 1],
+                                      names=['Well', 'Channel'])
+    data = {'Model': [fres.model] * len(order)}
+    if cqfit is not None:
+        data['CqFit'] = [cqfit[c] for c in meta['label'][order]]
+    for j, name in enumerate(fres.param_names()):
+        data[name] = fres.params[order, j]
+    data['Plateau'] = fres.plateau()[order]
+    data['RMSE'] = fres.rmse[order]
+    data['R2'] = fres.r2[order]
+    data['Iter'] = fres.niter[order]
+    data['Status'] = [fres.status_names()[j] for j in order]
+    return pd.DataFrame(data, index=index)
+
+
 def platedataset_details(dset, sindex=True, rowrange=True, colrange=True):
     """ Return list of strings detailing data contents
 
@@ -257,24 +1040,75 @@ def df_col_slice_df(df, cols):
 
 def df_1st_deriv(df):
     """ Get first derivative of columns in dataframe
-    Returns (copy of) DataFrame
+    Row i is row i+1 minus row i; Last row is dropped
+    Returns (new) DataFrame
     """
-    assert (type(df) == pd.DataFrame)
-    ddf = df.copy(deep=True)
-    ddf = ddf.shift(-1) - ddf
-    # N-1 row diffs in N-row dataframe; Drop last row which has NaN
-    ddf.dropna(inplace=True)
-    return ddf
+    return df_diff(df, 1)
 
 
 def df_2nd_deriv(df):
     """ Get second derivative of columns in dataframe
-    Returns (copy of) DataFrame
+    Returns (new) DataFrame
+    """
+    return df_diff(df, 2)
+
+
+def df_diff(df, n=1):
+    """ n'th order row differences of columns in dataframe; One diff on underlying array
+    Index is first N-n rows
+    Returns (new) DataFrame
+    """
+    assert (type(df) == pd.DataFrame)
+    ddf = np.diff(df.to_numpy(dtype=np.float64), n=n, axis=0)
+    return pd.DataFrame(ddf, index=df.index[:len(ddf)], columns=df.columns, copy=False)
+
+
+def df_savgol_deriv(df, window=9, order=4, deriv=1):
+    """ Savitzky-Golay smoothed derivative of columns in dataframe (azcalc.savgol_deriv)
+    Same index as df
+    Returns (new) DataFrame
+    """
+    assert (type(df) == pd.DataFrame)
+    vals = azcalc.savgol_deriv(df.to_numpy(dtype=np.float64), window, order, deriv=deriv)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns, copy=False)
+
+
+def df_melt_deriv(df, window=7, order=4):
+    """ Smoothed -dF/dT of (melt curve) columns in dataframe; Index is temperature
+    Returns (new) DataFrame
+    """
+    assert (type(df) == pd.DataFrame)
+    vals = azcalc.melt_neg_deriv(df.to_numpy(dtype=np.float64), df.index.to_numpy(dtype=np.float64),
+                                 window, order)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns, copy=False)
+
+
+def df_baseline_fit(df, start=0, stop=None, order=1, auto=False, gap=6, min_rows=5):
+    """ Baseline correct columns in dataframe by subtracting fitted polynomial
+    Fit over rows start to stop (or auto per column); See azcalc.baseline_correct
+    Returns (new) DataFrame
+    """
+    assert (type(df) == pd.DataFrame)
+    vals = azcalc.baseline_correct(df.to_numpy(dtype=np.float64), start=start, stop=stop, order=order,
+                                   auto=auto, gap=gap, min_rows=min_rows)
+    return pd.DataFrame(vals, index=df.index, columns=df.columns, copy=False)
+
+
+def df_baseline_first(df):
+    """ Baseline correct columns in dataframe by shifting first row to zero
+    Returns (new) DataFrame
+    """
+    assert (type(df) == pd.DataFrame)
+    vals = df.to_numpy(dtype=np.float64)
+    return pd.DataFrame(vals - vals[0], index=df.index, columns=df.columns, copy=False)
+
+
+def df_append_rows(df, ndf):
+    """ Append rows of ndf to df
+    Returns (new) DataFrame
     """
     assert (type(df) == pd.DataFrame)
-    df1 = df_1st_deriv(df)
-    df2 = df_1st_deriv(df1)
-    return df2
+    return pd.concat([df, ndf], axis=0)
 
 
 def df_get_minmax(df, mindif=None):
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# 10/17/26; Sigmoid (logistic) model fits of amplification curves
+#
+# 4PL: f(x) = y0 + fmax / (1 + exp(-(x - x0) / b))
+# 5PL: f(x) = y0 + fmax / (1 + exp(-(x - x0) / b)) ** g
+#
+# All curves of a chunk are fit together; Levenberg-Marquardt where each
+# iteration is a few array ops over (rows, cols), with per-col damping and
+# convergence. Chunks of columns are spread over a process pool. Flat (no
+# amplification) curves aren't fit; They get status FIT_FLAT and NaN params.
+#
+
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import azipa_calc as azcalc
+
+
+# Models; Parameter names, in order
+FIT_MODELS = {
+    '4PL': ['y0', 'fmax', 'x0', 'b'],
+    '5PL': ['y0', 'fmax', 'x0', 'b', 'g'],
+}
+
+# Per-col fit status
+FIT_OK = 0
+FIT_FLAT = 1
+FIT_FAIL = 2
+FIT_STATUS_NAMES = {FIT_OK: 'ok', FIT_FLAT: 'flat', FIT_FAIL: 'fail'}
+
+# Limits for slope scale (b) and asymmetry (g); Keep steps away from nonsense
+FIT_B_MIN = 0.05
+FIT_G_RANGE = (0.05, 20.0)
+
+# Fits with slope scale over this fraction of the x span are drift, not amplification
+FIT_SHALLOW_FRAC = 0.125
+
+
+class FitResult:
+    """ Fits of (rows, cols) curves to one model; Arrays, one entry per col
+
+    params = (cols, nparam) array; NaN for cols not fit (flat before fitting)
+    """
+    def __init__(self, model, ncol):
+        self.model = model
+        nparam = len(FIT_MODELS[model])
+        self.params = np.full((ncol, nparam), np.nan)
+        self.rmse = np.full(ncol, np.nan)
+        self.r2 = np.full(ncol, np.nan)
+        self.niter = np.zeros(ncol, dtype=np.int64)
+        self.status = np.full(ncol, FIT_FLAT, dtype=np.int64)
+        self.seconds = 0.0
+
+
+    def num_cols(self):
+        return len(self.status)
+
+
+    def param_names(self):
+        return FIT_MODELS[self.model]
+
+
+    def param(self, name):
+        return self.params[:, self.param_names().index(name)]
+
+
+    def status_names(self):
+        return [FIT_STATUS_NAMES[s] for s in self.status.tolist()]
+
+
+    def plateau(self):
+        """ Fitted upper asymptote (y0 + fmax)
+        """
+        return self.param('y0') + self.param('fmax')
+
+
+    def cq_sdm(self, default=100):
+        """ Second derivative maximum of fitted curves (x units); default if not ok
+
+        Closed form for 4PL; 5PL is searched on a fine grid then refined
+        """
+        x0 = self.param('x0')
+        b = self.param('b')
+        if self.model == '4PL':
+            cq = x0 - b * np.log(2.0 + np.sqrt(3.0))
+        else:
+            # In units of b around x0; Asymmetry shifts the maximum
+            u = np.linspace(-15.0, 15.0, 3001)[:, None]
+            dd2 = np.gradient(np.gradient(logistic_core(u, self.param('g')), u[:, 0], axis=0), u[:, 0], axis=0)
+            pos = azcalc.peak_pos(dd2)
+            cq = x0 + b * np.interp(pos, np.arange(len(u)), u[:, 0])
+        return np.where(self.status == FIT_OK, cq, default)
+
+
+    def col_dict(self, col):
+        """ Dict of params and metrics for col (int position)
+        """
+        dic = dict(zip(self.param_names(), self.params[col].tolist()))
+        dic.update({'model': self.model, 'rmse': float(self.rmse[col]), 'r2': float(self.r2[col]),
+                    'niter': int(self.niter[col]), 'status': FIT_STATUS_NAMES[int(self.status[col])]})
+        return dic
+
+
+def logistic_core(u, g=None):
+    """ 1 / (1 + exp(-u)) ** g; u = (x - x0) / b; g None = 1 (4PL)
+    """
+    with np.errstate(over='ignore'):
+        core = 1.0 / (1.0 + np.exp(-u))
+    return core if g is None else core ** g
+
+
+def model_eval(model, x, params):
+    """ Model values for (cols, nparam) params at x; Returns (rows, cols)
+    """
+    x = np.asarray(x, dtype=np.float64)[:, None]
+    p = params.T
+    g = p[4] if model == '5PL' else None
+    return p[0] + p[1] * logistic_core((x - p[2]) / p[3], g)
+
+
+def model_jacobian(model, x, params):
+    """ Model values (rows, cols) and jacobian (rows, cols, nparam)
+    """
+    x = np.asarray(x, dtype=np.float64)[:, None]
+    p = params.T
+    u = (x - p[2]) / p[3]
+    s = logistic_core(u)
+    # ds/du = s (1 - s)
+    dsdu = s * (1.0 - s)
+    if model == '5PL':
+        g = p[4]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sg = s ** g
+            core_du = g * sg / s * dsdu
+            core_dg = np.where(s > 0, sg * np.log(s), 0.0)
+        jac = [np.ones_like(u), sg, -p[1] * core_du / p[3], -p[1] * core_du * u / p[3], p[1] * core_dg]
+        fval = p[0] + p[1] * sg
+    else:
+        jac = [np.ones_like(u), s, -p[1] * dsdu / p[3], -p[1] * dsdu * u / p[3]]
+        fval = p[0] + p[1] * s
+    return fval, np.stack(jac, axis=-1)
+
+
+def flat_mask(vals, snr=10.0):
+    """ Bool mask of flat (non-amplifying) cols of (rows, cols) vals
+
+    Flat if value range is less than snr times noise (robust sd of first differences)
+    """
+    vals = np.asarray(vals, dtype=np.float64)
+    # All-NaN cols just come out flat
+    with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        span = np.nanmax(vals, axis=0) - np.nanmin(vals, axis=0)
+        noise = 1.4826 * np.nanmedian(np.abs(np.diff(vals, axis=0)), axis=0) / np.sqrt(2.0)
+    return ~(span > snr * noise) | (np.count_nonzero(~np.isnan(vals), axis=0) < 6)
+
+
+def initial_params(model, x, vals):
+    """ Vectorized starting params (cols, nparam) for (rows, cols) curves
+    """
+    x = np.asarray(x, dtype=np.float64)
+    nrow = len(x)
+    with np.errstate(invalid='ignore'):
+        y0 = np.nanmedian(vals[:min(3, nrow)], axis=0)
+        top = np.nanmedian(vals[max(nrow - 3, 0):], axis=0)
+        fmax = np.where(top > y0, top, np.nanmax(vals, axis=0)) - y0
+    # Midpoint where curves cross half way; Slope scale from steepest rise
+    half = azcalc.thresh_cross_pos(vals, y0 + 0.5 * fmax, default=np.nan)
+    x0 = np.interp(np.nan_to_num(half, nan=0.5 * (nrow - 1)), np.arange(nrow), x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.nanmax(np.diff(vals, axis=0) / np.diff(x)[:, None], axis=0)
+        b = np.where(slope > 0, fmax / (4.0 * slope), 1.0)
+    b = np.clip(np.nan_to_num(b, nan=1.0), FIT_B_MIN, max(x[-1] - x[0], 1.0))
+    params = [y0, fmax, x0, b]
+    if model == '5PL':
+        params.append(np.ones_like(y0))
+    return np.column_stack(params)
+
+
+def fit_curves_batch(model, x, vals, max_iter=100, tol=1e-6, flat_snr=10.0):
+    """ Levenberg-Marquardt fit of all (rows, cols) curves together (one process)
+
+    NaN values are left out. Returns FitResult; All cols are fit (see flat_mask()),
+    but ones whose fit shows no amplification (fmax under flat_snr * rmse, too
+    shallow, or Cq off the data) get status FIT_FLAT
+    """
+    x = np.asarray(x, dtype=np.float64)
+    vals = np.asarray(vals, dtype=np.float64)
+    ncol = vals.shape[1]
+    res = FitResult(model, ncol)
+    if ncol < 1:
+        return res
+    ok = ~np.isnan(vals)
+    yv = np.where(ok, vals, 0.0)
+    params = initial_params(model, x, vals)
+    nparam = params.shape[1]
+    lam = np.full(ncol, 1e-3)
+    fval = model_eval(model, x, params)
+    sse = np.sum(np.where(ok, yv - fval, 0.0) ** 2, axis=0)
+    active = np.isfinite(sse)
+    niter = np.zeros(ncol, dtype=np.int64)
+    eye = np.eye(nparam)
+    for _ in range(max_iter):
+        act = np.flatnonzero(active)
+        if len(act) < 1:
+            break
+        pa = params[act]
+        fa, jac = model_jacobian(model, x, pa)
+        if model == '5PL':
+            # Step in log(g); Asymmetry is better behaved on that scale
+            jac[:, :, 4] *= pa[:, 4]
+        resid = np.where(ok[:, act], yv[:, act] - fa, 0.0)
+        jac = np.where(ok[:, act, None], jac, 0.0)
+        if model == '5PL':
+            # g held at its limit while the fit pushes past it
+            grad = np.einsum('rc,rc->c', jac[:, :, 4], resid)
+            held = ((pa[:, 4] >= FIT_G_RANGE[1]) & (grad > 0)) | ((pa[:, 4] <= FIT_G_RANGE[0]) & (grad < 0))
+            jac[:, held, 4] = 0.0
+        jtj = np.einsum('rci,rcj->cij', jac, jac)
+        jtr = np.einsum('rci,rc->ci', jac, resid)
+        # Marquardt scaling; Damped diagonal
+        diag = np.einsum('cii->ci', jtj)
+        amat = jtj + lam[act, None, None] * (diag[:, :, None] * eye + 1e-12 * eye)
+        with np.errstate(invalid='ignore'):
+            try:
+                step = np.linalg.solve(amat, jtr[:, :, None])[:, :, 0]
+            except np.linalg.LinAlgError:
+                step = np.einsum('cij,cj->ci', np.linalg.pinv(amat), jtr)
+        trial = clamp_params(model, apply_step(model, pa, step))
+        ftrial = model_eval(model, x, trial)
+        sse_t = np.sum(np.where(ok[:, act], yv[:, act] - ftrial, 0.0) ** 2, axis=0)
+        better = np.isfinite(sse_t) & (sse_t <= sse[act])
+        niter[act] += 1
+        # Accepted steps; Converged when sse hardly changes
+        gain = np.where(better, sse[act] - sse_t, 0.0)
+        params[act[better]] = trial[better]
+        sse[act[better]] = sse_t[better]
+        lam[act] = np.where(better, lam[act] * 0.3, lam[act] * 10.0)
+        done = (better & (gain <= tol * (sse[act] + tol))) | (lam[act] > 1e10)
+        active[act[done]] = False
+    # Metrics
+    npts = ok.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ymean = np.sum(yv, axis=0) / npts
+        sst = np.sum(np.where(ok, yv - ymean, 0.0) ** 2, axis=0)
+        res.rmse = np.sqrt(sse / npts)
+        res.r2 = 1.0 - sse / sst
+    res.params = params
+    res.niter = niter
+    # No amplification seen (converged or not); Rise within noise, too shallow, or its Cq off the data
+    xspan = x[-1] - x[0]
+    res.status = np.full(ncol, FIT_OK)
+    with np.errstate(invalid='ignore'):
+        cq = res.cq_sdm(default=np.nan)
+        noamp = (params[:, 1] <= flat_snr * res.rmse) | (params[:, 3] > FIT_SHALLOW_FRAC * xspan)
+        noamp |= (cq < x[0]) | (cq > x[-1])
+    # Else fail if not converged (or nonsense)
+    bad = active | ~np.all(np.isfinite(params), axis=1)
+    res.status = np.where(noamp, FIT_FLAT, np.where(bad, FIT_FAIL, FIT_OK))
+    return res
+
+
+def apply_step(model, params, step):
+    """ Params after LM step; 5PL g step is in log(g)
+    """
+    new = params + step
+    if model == '5PL':
+        new[:, 4] = params[:, 4] * np.exp(np.clip(step[:, 4], -5.0, 5.0))
+    return new
+
+
+def clamp_params(model, params):
+    """ Keep slope scale (and 5PL asymmetry) in usable range; Returns params
+    """
+    params[:, 3] = np.maximum(params[:, 3], FIT_B_MIN)
+    if model == '5PL':
+        params[:, 4] = np.clip(params[:, 4], *FIT_G_RANGE)
+    return params
+
+
+def fit_chunk(model, x, vals, max_iter, flat_snr):
+    """ Process pool worker; Fit one chunk of cols
+    """
+    return fit_curves_batch(model, x, vals, max_iter=max_iter, flat_snr=flat_snr)
+
+
+def fit_curves(vals, x=None, model='4PL', nproc=None, max_iter=100, flat_snr=10.0, min_fmax=None,
+               chunk_cols=256):
+    """ Fit model to each col of (rows, cols) vals; Flat cols left out
+
+    x = curve x values (e.g. cycles); None = 0-based rows
+    nproc = worker processes; None = all cores, 1 = in-process. Chunks of
+        chunk_cols cols go to workers; Small jobs stay in-process
+    min_fmax = scalar or per-col minimum fitted rise; Smaller is FIT_FLAT
+
+    Returns FitResult
+    """
+    if model not in FIT_MODELS:
+        raise ValueError('Unknown fit model', model)
+    vals = np.asarray(vals, dtype=np.float64)
+    nrow, ncol = vals.shape
+    x = np.arange(nrow, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    res = FitResult(model, ncol)
+    t0 = time.perf_counter()
+    todo = np.flatnonzero(~flat_mask(vals, snr=flat_snr)) if nrow > 0 else np.zeros(0, dtype=np.int64)
+    chunks = [todo[i:i+chunk_cols] for i in range(0, len(todo), chunk_cols)]
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = min(nproc, len(chunks))
+    if nproc < 2:
+        outs = [fit_chunk(model, x, vals[:, c], max_iter, flat_snr) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=nproc) as pool:
+            outs = list(pool.map(fit_chunk, [model] * len(chunks), [x] * len(chunks),
+                                 [vals[:, c] for c in chunks], [max_iter] * len(chunks),
+                                 [flat_snr] * len(chunks)))
+    for cols, out in zip(chunks, outs):
+        res.params[cols] = out.params
+        res.rmse[cols] = out.rmse
+        res.r2[cols] = out.r2
+        res.niter[cols] = out.niter
+        res.status[cols] = out.status
+    if min_fmax is not None:
+        with np.errstate(invalid='ignore'):
+            low = res.param('fmax') < min_fmax
+        res.status[(res.status == FIT_OK) & low] = FIT_FLAT
+    res.seconds = time.perf_counter() - t0
+    return res
@@ -29,6 +29,7 @@ import wx.grid as gridlib
 import azipa_defs as azdef
 import azipa_df as azdf
 import azipa_util as azu
+import azipa_fit as azfit
 
 
 class AzwinMain(wx.Frame):
@@ -134,10 +135,7 @@ class AzwinMain(wx.Frame):
         spos = self.app.get_setting('MAIN_SPLIT_RTB_POS')
         config_splitter(self.splitterRTB, sashpos=spos)
         # Plate grid
-        csize = self.app.get_setting('PGRID_COL_SIZE')
-        self.plate.grid.SetDefaultColSize(csize, True)
-        rsize = self.app.get_setting('PGRID_ROW_SIZE')
-        self.plate.grid.SetDefaultRowSize(rsize, True)
+        self.plate.set_cell_sizes()
 
 
     def apply_win_colors(self):
@@ -159,6 +157,35 @@ class AzwinMain(wx.Frame):
         # Set data-set dependent dialogs to None
         self.chan_dialog = None
         self.thresh_dialog = None
+        # Polling timer for followed (still being written) data file
+        self.follow_timer = None
+
+
+    def set_follow_timer(self, msec=0):
+        """ Start (msec > 0) or stop timer polling followed data file
+        """
+        if self.follow_timer is not None:
+            self.follow_timer.Stop()
+        if msec > 0:
+            if self.follow_timer is None:
+                self.follow_timer = wx.Timer(self)
+                self.Bind(wx.EVT_TIMER, self.cb_follow_timer, self.follow_timer)
+            self.follow_timer.Start(msec)
+
+
+    def cb_follow_timer(self, event):
+        self.app.update_follow()
+
+
+    def extend_dset(self):
+        """ Dataset grew (followed file); Reset plot ranges then update
+        """
+        for panel in (self.curves, self.plots):
+            panel.panel_mp.set_dfkey(panel.get_dfkey())
+        # Channel min / max may have moved; Slider positions follow
+        if self.thresh_dialog is not None:
+            self.thresh_dialog.set_slider_params()
+        self.update_main()
 
 
     def reset_dset(self):
@@ -172,6 +199,8 @@ class AzwinMain(wx.Frame):
         if self.thresh_dialog is not None:
             self.thresh_dialog.Destroy()
         self.thresh_dialog = AzwinThresholds(self, self.app)
+        # Plate grid to dataset plate size
+        self.plate.set_geom(self.app.get_geom())
 
 
     def popup_preferences(self):
@@ -190,6 +219,35 @@ class AzwinMain(wx.Frame):
         self.thresh_dialog.Show()
         
 
+    def selection_changed(self, change):
+        """ Selection listener; Plate grid updates only changed wells
+        """
+        if len(change.wells_changed()):
+            self.plate.update_changed_cells(change)
+        self.update_main(plate=False)
+        if (self.chan_dialog is not None) and (len(change.chans_on) or len(change.chans_off)):
+            self.chan_dialog.set_checkbox_vals()
+
+
+    def thresh_changed(self, idx):
+        """ Channel idx threshold (and its Cq values) changed
+
+        Moves just that threshold line in plots showing it, and redoes
+        just the report rows using it; Curves and plate are unchanged
+        """
+        # Dialog sliders follow thresholds set elsewhere (e.g. optimizer)
+        if self.thresh_dialog is not None:
+            self.thresh_dialog.set_slider_params()
+        if idx not in self.app.get_active_channels():
+            return
+        th = self.app.get_field('LIS_CHAN_THRESH')[idx]
+        for panel in (self.curves, self.plots):
+            if panel.will_draw_thresh():
+                if not panel.panel_mp.set_thresh_line(idx, th):
+                    panel.draw_plot()
+        self.report.update_chan(idx)
+
+
     def update_main(self, reset=True, plate=True, plots=True, report=True):
         if DEBUG: print(">> update_main")
         if plate:
@@ -268,10 +326,20 @@ class AzwinPlotPanel(wx.Panel):
             dfkey = 'DF_BLCOR'     #   Baseline corrected
         elif event.GetString().upper().startswith('RAW'):
             dfkey = 'DF_RAW'        #   Raw
+        elif event.GetString().upper().startswith('COMP'):
+            dfkey = 'DF_COMP'       #   Crosstalk compensated raw
+        elif event.GetString().upper().startswith('NORM'):
+            dfkey = 'DF_NORM'       #   Passive reference normalized
         elif event.GetString().upper().startswith('1ST'):
             dfkey = 'DF_1ST_DERIV'  #   1st derivative
         elif event.GetString().upper().startswith('2ND'):
             dfkey = 'DF_2ND_DERIV'  #   2st derivative
+        elif event.GetString().upper().startswith('SMOOTHED 1ST'):
+            dfkey = 'DF_SG_1ST_DERIV'   #   Savitzky-Golay 1st derivative
+        elif event.GetString().upper().startswith('SMOOTHED 2ND'):
+            dfkey = 'DF_SG_2ND_DERIV'   #   Savitzky-Golay 2nd derivative
+        elif event.GetString().upper().startswith('MELT'):
+            dfkey = 'DF_MELT_DERIV'     #   Melt curve -dF/dT
         else:
             raise ValueError('Event', event.GetString(), 'unknown')
         # Set and draw
@@ -286,10 +354,20 @@ class AzwinPlotPanel(wx.Panel):
             choice = 'BASE'
         elif dfkey == 'DF_RAW':
             choice = 'RAW'
+        elif dfkey == 'DF_COMP':
+            choice = 'COMP'
+        elif dfkey == 'DF_NORM':
+            choice = 'NORM'
         elif dfkey == 'DF_1ST_DERIV':
             choice = '1ST'
         elif dfkey == 'DF_2ND_DERIV':
             choice = '2ND'
+        elif dfkey == 'DF_SG_1ST_DERIV':
+            choice = 'SMOOTHED 1ST'
+        elif dfkey == 'DF_SG_2ND_DERIV':
+            choice = 'SMOOTHED 2ND'
+        elif dfkey == 'DF_MELT_DERIV':
+            choice = 'MELT'
         if choice is None:
             raise ValueError('dfkey', dfkey, 'unknown')
         set_choice_label(self.cbox_plotdata, choice)
@@ -311,22 +389,13 @@ class AzwinPlotPanel(wx.Panel):
         assert(dfkey is not None)
         #print("+ draw_plot dfkey", dfkey)
 
-        # Get source dataframe
-        st_df = self.app.get_field(dfkey, None)
-        if st_df is None:
+        # Source dataframe is fetched per channel, for active cols only
+        if not self.app.have_dset():
             return
-        #print("+ draw_plot st_df", st_df.shape)
 
-        # Get active-col slice from source dataframe
-        cols = self.app.get_active_cols()
-        if len(cols) < 1:
+        # Any active cols? Source dataframes share column layout with dataset
+        if len(self.app.get_active_col_pos()) < 1:
             return
-        ac_df = azdf.df_col_slice(st_df, cols)
-        #print("===============================")
-        #print("ccc0", st_df.columns)
-        #print("ccc0", cols)
-        #print("ccc0", ac_df.columns)
-        #print("+ draw_plot ac_df", ac_df.shape)
 
         # Thresholds
         if self.will_draw_thresh():
@@ -337,17 +406,19 @@ class AzwinPlotPanel(wx.Panel):
 
         # Each active channel
         for idx in self.app.get_active_channels():
-            cols = self.app.get_chan_1index_cols(idx+1) 
-            if len(cols) < 1:
+            pos = self.app.get_active_col_pos(chans=[idx])
+            if len(pos) < 1:
                 continue
 
-            df = azdf.df_col_slice(ac_df, cols)
+            df = self.app.get_field_cols(dfkey, pos)
+            if df is None:
+                continue
             color = self.app.chan_1index_color(idx+1)
             if thvals is None:
                 th = None
             else:
                 th = thvals[idx]
-            self.panel_mp.df_plot(df, color, thresh=th)
+            self.panel_mp.df_plot(df, color, thresh=th, chidx=idx)
 
         self.panel_mp.refresh_plot()
         if DEBUG: print("<< draw_plot")
@@ -391,6 +462,8 @@ class AzwinMatplotlibPanel(wx.Panel):
         # MMM matplotlib stuff 
         self.mpl_figure = Figure()
         self.mpl_axes = self.mpl_figure.add_subplot(111)
+        # Threshold line artists by channel index; Moved in place on threshold change
+        self.thresh_lines = {}
         self.mpl_figurecanvas = FigureCanvas(self, -1, self.mpl_figure)
         self.sizer.Add(self.mpl_figurecanvas, 1, wx.GROW, azdef.SIZER_BORDER)
         # MMM feedback shams???
@@ -650,16 +723,30 @@ class AzwinMatplotlibPanel(wx.Panel):
 
     def clear_plot(self):
         self.mpl_axes.cla()
+        self.thresh_lines = {}
         self.refresh_plot()
 
 
+    def set_thresh_line(self, chidx, thresh):
+        """ Move existing threshold line for channel index; False if there isn't one
+        """
+        line = self.thresh_lines.get(chidx)
+        if line is None:
+            return False
+        line.set_ydata([thresh, thresh])
+        # Idle draw; Coalesces redraws while slider is dragged
+        self.mpl_figurecanvas.draw_idle()
+        return True
+
+
     def refresh_plot(self):
         self.mpl_figurecanvas.draw()
         self.Refresh()
 
 
-    def df_plot(self, df, color, clear=False, thresh=None):
+    def df_plot(self, df, color, clear=False, thresh=None, chidx=None):
         """ Plot dataframe with given color 
+        Threshold line is kept (by chidx, if given) for set_thresh_line()
 
         DataFrame plot output set to axis:
         https://stackoverflow.com/questions/45620789/pandas-dataframe-plot-resets-pyplot-current-figure
@@ -683,7 +770,9 @@ class AzwinMatplotlibPanel(wx.Panel):
         # Threshold?
         if self.show_thresh() and (thresh is not None):
             # As dotted horizontal line
-            self.mpl_axes.axhline(y=thresh, color=color, linestyle=':')
+            line = self.mpl_axes.axhline(y=thresh, color=color, linestyle=':')
+            if chidx is not None:
+                self.thresh_lines[chidx] = line
         if DEBUG: print("<< df_plot")
 
 
@@ -703,13 +792,14 @@ class AzwinMatplotlibPanel(wx.Panel):
 # ---------------------------------------------------------------------------
 # Plate grid window 
 class AzwinPlatePanel(wx.Panel):
-    """ Panel with 96 well plate grid
+    """ Panel with plate grid; 96 well by default, resized to dataset plate
     """
     def __init__(self, parent, app):
         super().__init__(parent, wx.ID_ANY, wx.DefaultPosition, wx.DefaultSize, wx.TAB_TRAVERSAL)
         self.parent = parent 
         self.app = app
         self.sizer = wx.BoxSizer(wx.VERTICAL)
+        self.geom = azu.PLATE96
         self.setup_button_panel()
         self.setup_grid()
         wrap_up_sizing(self, self.sizer)
@@ -775,29 +865,36 @@ class AzwinPlatePanel(wx.Panel):
         if event.GetString().upper().startswith('SEL'):
             self.set_select(True)
             return
+        sel = self.app.get_selection()
+        if sel is None:
+            return
         #   All = select all with any data, then set select on
         if event.GetString().upper().startswith('ALL'):
-            cells = self.app.get_anydata_cells()
             # Set label before GUI update
             self.set_select(True)
             set_choice_label(self.cbox_select, 'SEL')
-            self.app.mod_active_cells(alis=cells, dlis=None, guiup=True)
+            sel.select_all()
             return
         #   None = deselect all, then set select on 
         if event.GetString().upper().startswith('NO'):
-            cells = self.app.get_active_cells()
             self.set_select(True)
             set_choice_label(self.cbox_select, 'SEL')
-            self.app.mod_active_cells(alis=None, dlis=cells, guiup=True)
+            sel.select_none()
+            return
+        #   Invert = flip selection (of wells with data), then set select on
+        if event.GetString().upper().startswith('INV'):
+            self.set_select(True)
+            set_choice_label(self.cbox_select, 'SEL')
+            sel.invert()
             return
 
 
     def setup_grid(self):
         """ Set up grid stuff
         """
-        # Grid for '96 well plate' 
+        # Grid for plate; Starts as '96 well plate' 
         self.grid = wx.grid.Grid(self, wx.ID_ANY, wx.DefaultPosition, wx.DefaultSize, 0)
-        self.grid.CreateGrid(8, 12)
+        self.grid.CreateGrid(self.geom.nrow, self.geom.ncol)
         # Selection callback binding
         # XXX Sham; Turned this off ... sort of helps clean up grid select???
         #self.grid.Bind(gridlib.EVT_GRID_SELECT_CELL, self.cb_grid_sel_cell)
@@ -809,11 +906,8 @@ class AzwinPlatePanel(wx.Panel):
         self.grid.DisableDragGridSize()
         # Col and row labels
         self.grid.SetColLabelSize(20)
-        for c in range(12):
-            self.grid.SetColLabelValue(c, str(c+1))
         self.grid.SetRowLabelSize(40)
-        for r, v in enumerate(list('ABCDEFGH')):
-            self.grid.SetRowLabelValue(r, v)
+        self.set_grid_labels()
         # Cell Defaults
         self.grid.SetDefaultCellAlignment(wx.ALIGN_LEFT, wx.ALIGN_TOP)
         self.update_grid_cells(reset=True)
@@ -821,6 +915,46 @@ class AzwinPlatePanel(wx.Panel):
         self.sizer.Add(self.grid, 1, wx.EXPAND|azdef.SIZER_FLAG_NTOP, azdef.SIZER_BORDER)
 
 
+    def set_grid_labels(self):
+        for c, v in enumerate(self.geom.col_labels):
+            self.grid.SetColLabelValue(c, v)
+        for r, v in enumerate(self.geom.row_labels):
+            self.grid.SetRowLabelValue(r, v)
+
+
+    def set_geom(self, geom):
+        """ Resize grid to plate geometry (e.g. 384, 1536 well plates)
+        """
+        if (geom.nrow == self.geom.nrow) and (geom.ncol == self.geom.ncol):
+            return
+        self.grid.BeginBatch()
+        drow = geom.nrow - self.grid.GetNumberRows()
+        dcol = geom.ncol - self.grid.GetNumberCols()
+        if drow > 0:
+            self.grid.AppendRows(drow)
+        elif drow < 0:
+            self.grid.DeleteRows(geom.nrow, -drow)
+        if dcol > 0:
+            self.grid.AppendCols(dcol)
+        elif dcol < 0:
+            self.grid.DeleteCols(geom.ncol, -dcol)
+        self.geom = geom
+        self.set_grid_labels()
+        self.set_cell_sizes()
+        self.grid.EndBatch()
+        self.update_grid_cells(reset=True)
+        self.Layout()
+
+
+    def set_cell_sizes(self):
+        """ Grid cell sizes; Settings are for 96 wells, scaled so bigger plates keep about same footprint
+        """
+        csize = self.app.get_setting('PGRID_COL_SIZE') * 12 // self.geom.ncol
+        self.grid.SetDefaultColSize(max(csize, 12), True)
+        rsize = self.app.get_setting('PGRID_ROW_SIZE') * 8 // self.geom.nrow
+        self.grid.SetDefaultRowSize(max(rsize, 10), True)
+
+
     # XXX Sham, not calling this ... only cellrange
     def cb_grid_sel_cell(self, event):
         # Update for one cell; Cook up [(row,col)] list with tuple 
@@ -847,36 +981,22 @@ class AzwinPlatePanel(wx.Panel):
         # Nothing
         else:
             return
-        # Collect cells in range to update
+        # Toggle cells in range; If no dataset or not select mode, ignore
         #print("+ cb_grid_sel_cellrange rows cols", rows_start,rows_end,cols_start,cols_end)
-        cells = []
-        for row in range(rows_start, rows_end+1):
-            for col in range(cols_start, cols_end+1):
-                cells.append((row, col))
-        self.update_cell_select(cells)
+        if (not self.app.have_dset()) or (not self.get_select()):
+            return
+        self.app.get_selection().toggle_range(rows_start, cols_start, rows_end, cols_end)
 
 
     def update_cell_select(self, cells):
-        """Update well selection via list of cells
+        """Update well selection via list of cells; Toggles active / inactive
         """
         #print(">> update_cell_select", cells)
         # If no dataset or not select mode, ignore
         if (not self.app.have_dset()) or (not self.get_select()):
             return
-        # List of currently acive and any-data cells; If no data, can't select
-        actives = self.app.get_active_cells()
-        anydata = self.app.get_anydata_cells()
-        # Collect cells to add / delete
-        newadd = []
-        newdel = []
-        for cell in cells:
-            if cell in actives:
-                newdel.append(cell)
-            elif cell in anydata:
-                newadd.append(cell)
-        #print("+ update_cell_select newadd", newadd)
-        #print("+ update_cell_select newdel", newdel)
-        self.app.mod_active_cells(newadd, newdel, guiup=True)
+        sel = self.app.get_selection()
+        sel.toggle_mask(sel.cells_mask(cells))
 
 
     def update_grid_cells(self, reset=True):
@@ -885,25 +1005,45 @@ class AzwinPlatePanel(wx.Panel):
         none_color = self.app.get_setting('COLOR_GRID_WELL_NONE')
         ontxt_color = self.app.get_setting('COLOR_GRID_TXT_ON')
         offtxt_color = self.app.get_setting('COLOR_GRID_TXT_OFF')
+        geom = self.geom
         # If reset, set everything to none; clis=None
         if reset:
-            label_grid_cells(self.grid, clis=None, color=ontxt_color, show=False)
-            color_grid_cells(self.grid, none_color, clis=None)
+            label_grid_cells(self.grid, clis=None, color=ontxt_color, show=False, geom=geom)
+            color_grid_cells(self.grid, none_color, clis=None, geom=geom)
         # Background any-data cells set to off colors
         cells = self.app.get_anydata_cells()
         if len(cells) > 0:
-            label_grid_cells(self.grid, clis=cells, color=offtxt_color, show=True)
-            color_grid_cells(self.grid, off_color, clis=cells)
+            label_grid_cells(self.grid, clis=cells, color=offtxt_color, show=True, geom=geom)
+            color_grid_cells(self.grid, off_color, clis=cells, geom=geom)
         # Active cells 
         cells = self.app.get_active_cells()
         if len(cells) > 0:
-            label_grid_cells(self.grid, clis=cells, color=ontxt_color, show=True)
-            color_grid_cells(self.grid, on_color, clis=cells)
+            label_grid_cells(self.grid, clis=cells, color=ontxt_color, show=True, geom=geom)
+            color_grid_cells(self.grid, on_color, clis=cells, geom=geom)
     
         #print("+ update_grid_cells calling ClearSelection()")
         self.grid.ClearSelection()
 
 
+    def update_changed_cells(self, change):
+        """ Recolor only wells in selection change
+        """
+        sel = self.app.get_selection()
+        geom = self.geom
+        on_cells = sel.index_cells(change.wells_on)
+        off_cells = sel.index_cells(change.wells_off)
+        if on_cells:
+            label_grid_cells(self.grid, clis=on_cells, color=self.app.get_setting('COLOR_GRID_TXT_ON'),
+                             show=True, geom=geom)
+            color_grid_cells(self.grid, self.app.get_setting('COLOR_GRID_WELL_ON'), clis=on_cells, geom=geom)
+        if off_cells:
+            label_grid_cells(self.grid, clis=off_cells, color=self.app.get_setting('COLOR_GRID_TXT_OFF'),
+                             show=True, geom=geom)
+            color_grid_cells(self.grid, self.app.get_setting('COLOR_GRID_WELL_OFF'), clis=off_cells, geom=geom)
+        self.grid.ClearSelection()
+        self.grid.ForceRefresh()
+
+
 # ---------------------------------------------------------------------------
 # Report window 
 class AzwinReportPanel(wx.Panel):
@@ -917,6 +1057,10 @@ class AzwinReportPanel(wx.Panel):
         self.setup_button_panel()
         self.setup_report_space()
         wrap_up_sizing(self, self.sizer)
+        # Well report lines, kept for per-channel updates
+        self.well_lines = []
+        self.well_line_pos = None
+        self.well_line_minmax = None
         # init default
         self.set_rpkey('Well')
 
@@ -944,6 +1088,18 @@ class AzwinReportPanel(wx.Panel):
         self.report()
 
 
+    def set_report_choice(self, rpkey):
+        # Switch report (and choice box) to rpkey; Shown on next report
+        set_choice_label(self.cbox_reportdata, rpkey)
+        self.set_rpkey(rpkey)
+
+
+    def show_report(self, rpkey):
+        # Switch report (and choice box) to rpkey, then report
+        self.set_report_choice(rpkey)
+        self.report()
+
+
     def setup_report_space(self):
         """ Set up report text space
         """
@@ -966,57 +1122,125 @@ class AzwinReportPanel(wx.Panel):
             self.report_channels()
         elif self.rpkey.startswith('THRESH'):
             self.report_thresholds()
+        elif self.rpkey.startswith('SWEEP'):
+            self.report_sweep()
+        elif self.rpkey.startswith('OPT'):
+            self.report_thresh_opt()
+        elif self.rpkey.startswith('FIT'):
+            self.report_fits()
+        elif self.rpkey.startswith('MELT'):
+            self.report_melt()
+        elif self.rpkey.startswith('QUANT'):
+            self.report_quant()
+        elif self.rpkey.startswith('STD'):
+            self.report_std_curve()
         else:
             raise ValueError('Bogus report key', self.rpkey)
 
 
+    def update_chan(self, idx):
+        """ Channel idx threshold / Cq values changed; Redo only what uses them
+        """
+        if self.rpkey.startswith('WELL'):
+            self.update_well_rows(idx)
+        elif self.rpkey.startswith('THRESH'):
+            self.report_thresholds()
+        elif self.rpkey.startswith('QUANT'):
+            self.report_quant()
+        elif self.rpkey.startswith('STD'):
+            self.report_std_curve()
+
+
     def report_wells(self):
         # Local vars for dataframe and collections of Cq values
         df = self.app.get_field('DF_BLCOR')
-        cqtdic = self.app.get_field('DIC_COL_CQT')
-        cq2dic = self.app.get_field('DIC_COL_CQ2ND')
         # Collect lines of text 
         lines = []
-        line = "Well Channel CqTh Cq2d Min Max".replace(' ', '\t')
+        line = "Well Channel CqTh Cq2d Eff EffR2 EffWin Min Max".replace(' ', '\t')
         lines.append(line)
-        # Each active columns
-        cols = self.app.get_active_cols()
-        for col in sorted(cols):
-            well = azu.col_to_well(col)
-            cidx = str(azu.col_to_chan_index(col) + 1)
-            cqt = '{:5.2f}'.format(cqtdic[col])
-            cq2 = '{:2d}'.format(cq2dic[col])
-            cmin = '{:5.2f}'.format(df[col].min())
-            cmax = '{:5.2f}'.format(df[col].max())
-            # Cook up line
-            words = [well, cidx, cqt, cq2, cmin, cmax]
-            line = '\t'.join(words)
-            lines.append(line)
+        # Each active column, in plate well order then channel; Metadata arrays, no label parsing
+        pos = self.app.get_active_col_pos()
+        meta = self.app.dset.get_col_meta() if len(pos) else None
+        if meta is not None:
+            pos = pos[np.lexsort((meta['chan'][pos], meta['plate'][pos]))]
+            vals = df.to_numpy()[:, pos]
+            mins = vals.min(axis=0)
+            maxs = vals.max(axis=0)
+        for j, p in enumerate(pos):
+            lines.append(self.well_row(meta, p, mins[j], maxs[j]))
+        # Keep lines with their cols (and mins, maxs) for per-channel updates
+        self.well_lines = lines
+        self.well_line_pos = pos
+        self.well_line_minmax = (mins, maxs) if meta is not None else None
         # New lines and show
         story = '\n'.join(lines)
         self.report_text(story)
 
 
+    def well_row(self, meta, p, cmin, cmax):
+        """ Well report line for (dataset) col position p
+        """
+        cqtdic = self.app.get_field('DIC_COL_CQT')
+        cq2dic = self.app.get_field('DIC_COL_CQ2ND')
+        col = meta['label'][p]
+        well = self.app.dset.wells[meta['well'][p]]
+        cidx = str(meta['chan'][p] + 1)
+        cqt = '{:5.2f}'.format(cqtdic[col])
+        cq2 = '{:5.2f}'.format(cq2dic[col])
+        # Efficiency, fit R^2 and log-linear window; '-' if no window (or melt data)
+        eff = self.app.get_field('DIC_COL_EFF').get(col, np.nan)
+        if np.isnan(eff):
+            effs = ['-'] * 3
+        else:
+            first, last = self.app.get_field('DIC_COL_EFFWIN')[col]
+            effs = ['{:4.2f}'.format(eff), '{:5.3f}'.format(self.app.get_field('DIC_COL_EFFR2')[col]),
+                    '{}-{}'.format(first, last)]
+        # Cook up line
+        words = [well, cidx, cqt, cq2] + effs + ['{:5.2f}'.format(cmin), '{:5.2f}'.format(cmax)]
+        return '\t'.join(words)
+
+
+    def update_well_rows(self, idx):
+        """ Redo well report lines for channel idx only
+        """
+        if self.well_line_minmax is None:
+            return
+        meta = self.app.dset.get_col_meta()
+        mins, maxs = self.well_line_minmax
+        for j in np.flatnonzero(meta['chan'][self.well_line_pos] == idx):
+            # Line 0 is header
+            self.well_lines[j+1] = self.well_row(meta, self.well_line_pos[j], mins[j], maxs[j])
+        self.report_text('\n'.join(self.well_lines))
+
+
     def report_channels(self):
         # Collect lines of text 
         lines = []
-        line = "Channel Wells Name".replace(' ', '\t')
+        line = "Channel Wells Name NormRef".replace(' ', '\t')
         lines.append(line)
         # Only if have data
         if self.app.have_dset():
-            acols = self.app.get_active_cols()
             dset = self.app.dset
+            # Active cols per channel
+            pos = self.app.get_active_col_pos()
+            counts = np.bincount(dset.get_col_meta()['chan'][pos], minlength=dset.num_channels())
+            refs = dset.norm_ref_list()
+            ref_chans = dset.ref_chan_list()
             # Each active channel
-            chanlis = self.app.get_field('ACTIVE_CHANNEL_SET')
-            for i in sorted(chanlis):
+            for i in self.app.get_active_channels():
                 cidx = str(i + 1)
                 name = dset.ch_name_list()[i]
                 # Active channels 
-                chcols = self.app.get_chan_1index_cols(i+1) 
-                num = len([x for x in acols if x in chcols])
-                wells = '{:2d}'.format(num)
+                wells = '{:2d}'.format(counts[i])
+                # Passive reference normalized by (or is); 1-based
+                if refs[i] >= 0:
+                    norm = str(refs[i] + 1)
+                elif i in ref_chans:
+                    norm = 'ref'
+                else:
+                    norm = '-'
                 # Cook up line
-                words = [cidx, wells, name]
+                words = [cidx, wells, name, norm]
                 line = '\t'.join(words)
                 lines.append(line)
         # New lines and show
@@ -1036,8 +1260,7 @@ class AzwinReportPanel(wx.Panel):
             maxvals = self.app.get_field('LIS_CHAN_MAXS')
             dset = self.app.dset
             # Each active channel
-            chanlis = self.app.get_field('ACTIVE_CHANNEL_SET')
-            for i in sorted(chanlis):
+            for i in self.app.get_active_channels():
                 cidx = str(i + 1)
                 thresh = '{:6.1f}'.format(thvals[i])
                 minv = '{:6.1f}'.format(minvals[i])
@@ -1051,6 +1274,168 @@ class AzwinReportPanel(wx.Panel):
         self.report_text(story)
 
 
+    def report_sweep(self):
+        # Threshold sweep summary; Per active channel and threshold, Cq stats over active wells
+        lines = []
+        line = "Channel Thresh Crossed CqMean CqSd CqMin CqMax".replace(' ', '\t')
+        lines.append(line)
+        if self.app.have_dset():
+            sweeps = self.app.get_thresh_sweep()
+            sel = self.app.get_selection()
+            meta = self.app.dset.get_col_meta()
+            for i in self.app.get_active_channels():
+                if i not in sweeps:
+                    continue
+                threshs, cqm = sweeps[i]
+                # Active cols among this channel's cols
+                act = sel.col_mask(meta)[self.app.dset.get_col_pos(chans=[i])]
+                cqs = cqm[:, act]
+                crossed = cqs != 100
+                ncross = crossed.sum(axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    cqn = np.where(crossed, cqs, np.nan)
+                    stats = [np.nanmean(cqn, axis=1), np.nanstd(cqn, axis=1),
+                             np.nanmin(cqn, axis=1), np.nanmax(cqn, axis=1)] if cqn.shape[1] else None
+                for k, th in enumerate(threshs):
+                    words = [str(i + 1), '{:6.3f}'.format(th), '{:d}'.format(ncross[k])]
+                    if (stats is None) or (ncross[k] < 1):
+                        words += ['-'] * 4
+                    else:
+                        words += ['{:5.2f}'.format(v[k]) for v in stats]
+                    lines.append('\t'.join(words))
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
+    def report_thresh_opt(self):
+        # Threshold optimizer objective curves; Per active channel and candidate, best marked
+        lines = []
+        line = "Channel Thresh Objective Determined Best".replace(' ', '\t')
+        lines.append(line)
+        if self.app.have_dset():
+            opts = self.app.get_field('DIC_CHAN_THRESH_OPT')
+            if not opts:
+                lines.append("No threshold optimization; Tools > Optimize thresholds (needs plate layout)")
+                opts = {}
+            for i in self.app.get_active_channels():
+                if i not in opts:
+                    continue
+                threshs, obj, ndet, best, oname = opts[i]
+                for k, th in enumerate(threshs):
+                    words = [str(i + 1), '{:.4g}'.format(th), nan_format('{:.4f}', obj[k]),
+                             '{:d}'.format(ndet[k]), oname if k == best else '']
+                    lines.append('\t'.join(words))
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
+    def report_fits(self):
+        # Sigmoid curve fits; Active cols, in plate well order then channel
+        lines = []
+        line = "Well Channel CqFit Plateau Slope RMSE R2 Status".replace(' ', '\t')
+        lines.append(line)
+        if self.app.have_dset():
+            fres = self.app.get_fit_result()
+            cqfdic = self.app.get_field('DIC_COL_CQFIT')
+            meta = self.app.dset.get_col_meta()
+            pos = self.app.get_active_col_pos()
+            pos = pos[np.lexsort((meta['chan'][pos], meta['plate'][pos]))]
+            plateau = fres.plateau()
+            slope = fres.param('b')
+            for p in pos:
+                words = [self.app.dset.wells[meta['well'][p]], str(meta['chan'][p] + 1),
+                         '{:5.2f}'.format(cqfdic[meta['label'][p]])]
+                if fres.status[p] == azfit.FIT_OK:
+                    words += ['{:6.3f}'.format(plateau[p]), '{:5.2f}'.format(slope[p]),
+                              '{:6.4f}'.format(fres.rmse[p]), '{:6.4f}'.format(fres.r2[p])]
+                else:
+                    words += ['-'] * 4
+                words.append(azfit.FIT_STATUS_NAMES[int(fres.status[p])])
+                lines.append('\t'.join(words))
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
+    def report_melt(self):
+        # Melt peaks; Active cols, in plate well order then channel
+        lines = []
+        words = ["Well", "Channel"]
+        if self.app.have_dset():
+            npeak = int(self.app.get_setting('MELT_NUM_PEAKS', 2))
+            for k in range(npeak):
+                words += ["Tm{}".format(k + 1), "Height{}".format(k + 1), "Width{}".format(k + 1)]
+        lines.append('\t'.join(words))
+        pkdic = self.app.get_field('DIC_COL_MELTPK') if self.app.have_dset() else None
+        if pkdic:
+            meta = self.app.dset.get_col_meta()
+            pos = self.app.get_active_col_pos()
+            pos = pos[np.lexsort((meta['chan'][pos], meta['plate'][pos]))]
+            for p in pos:
+                words = [self.app.dset.wells[meta['well'][p]], str(meta['chan'][p] + 1)]
+                for tm, height, width in pkdic[meta['label'][p]]:
+                    if np.isnan(tm):
+                        words += ['-'] * 3
+                    else:
+                        words += ['{:5.2f}'.format(tm), '{:7.2f}'.format(height), '{:4.2f}'.format(width)]
+                lines.append('\t'.join(words))
+        elif self.app.have_dset():
+            lines.append("Not melt curve data")
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
+    def report_quant(self):
+        # Relative quantification; Sample + target groups, reference targets last
+        lines = []
+        line = "Sample Target N Undet MeanCq SdCq dCq ddCq Fold FoldLo FoldHi".replace(' ', '\t')
+        lines.append(line)
+        qres = self.app.get_quant_result() if self.app.have_dset() else None
+        if qres is not None:
+            df = qres.to_df().sort_values('Ref', kind='stable')
+            for row in df.itertuples(index=False):
+                words = [str(row.Sample), str(row.Target), str(row.N), str(row.Undet)]
+                words += [nan_format('{:5.2f}', v) for v in (row.MeanCq, row.SdCq, row.dCq, row.ddCq)]
+                words += [nan_format('{:6.3f}', v) for v in (row.Fold, row.FoldLo, row.FoldHi)]
+                lines.append('\t'.join(words))
+            lines.append("Reference: {}; Calibrator: {}".format(', '.join(qres.refs) or 'None',
+                                                                qres.calibrator))
+        elif self.app.have_dset():
+            lines.append("No plate layout (File > Open > Plate)")
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
+    def report_std_curve(self):
+        # Standard curves, then mean back-calculated quantity per sample + target
+        lines = []
+        line = "Plate Target N Levels Slope Intercept R2 Eff% LOD".replace(' ', '\t')
+        lines.append(line)
+        curves = self.app.get_std_curves() if self.app.have_dset() else None
+        if curves is not None:
+            for row in curves.to_df().itertuples(index=False):
+                words = [row.Plate or '-', str(row.Target), str(row.N), str(row.Levels),
+                         nan_format('{:6.3f}', row.Slope), nan_format('{:6.2f}', row.Intercept),
+                         nan_format('{:6.4f}', row.R2), nan_format('{:5.1f}', row.EffPct),
+                         nan_format('{:.3g}', row.LOD)]
+                lines.append('\t'.join(words))
+            lines.append('')
+            lines.append("Sample\tTarget\tQuantity")
+            for i, samp in enumerate(curves.samples):
+                for j, targ in enumerate(curves.sample_targets):
+                    if not np.isnan(curves.sample_qty[i, j]):
+                        lines.append('\t'.join([str(samp), str(targ), '{:.4g}'.format(curves.sample_qty[i, j])]))
+        elif self.app.have_dset():
+            lines.append("No plate layout (File > Open > Plate)")
+        # New lines and show
+        story = '\n'.join(lines)
+        self.report_text(story)
+
+
 # ---------------------------------------------------------------------------
 # Menu 
 class AzwinMenu(wx.MenuBar):
@@ -1069,7 +1454,10 @@ class AzwinMenu(wx.MenuBar):
         self.menu_file_open = wx.Menu()
         self.menu_file.AppendSubMenu(self.menu_file_open, u"Open" )
         self.mentit_open_data = new_menu_item(self.menu_file_open, u"Data", self.cb_open_data)
+        self.mentit_open_batch = new_menu_item(self.menu_file_open, u"Data folder", self.cb_open_batch)
+        self.mentit_open_follow = new_menu_item(self.menu_file_open, u"Data (follow run)", self.cb_open_follow)
         self.mentit_open_plate = new_menu_item(self.menu_file_open, u"Plate", self.cb_open_plate)
+        self.mentit_open_xtalk = new_menu_item(self.menu_file_open, u"Crosstalk matrix", self.cb_open_xtalk)
         self.mentit_open_proj = new_menu_item(self.menu_file_open, u"Project", self.cb_open_proj)
         self.mentit_open_proj = new_menu_item(self.menu_file_open, u"Prefs", self.cb_open_prefs)
         # File submenu save
@@ -1078,6 +1466,11 @@ class AzwinMenu(wx.MenuBar):
         self.mentit_save_plate = new_menu_item(self.menu_file_save, u"Plate", self.cb_save_plate)
         self.mentit_save_proj = new_menu_item(self.menu_file_save, u"Project", self.cb_save_proj)
         self.mentit_save_plate = new_menu_item(self.menu_file_save, u"Prefs", self.cb_save_prefs)
+        self.mentit_save_sweep = new_menu_item(self.menu_file_save, u"Threshold sweep", self.cb_save_sweep)
+        self.mentit_save_fits = new_menu_item(self.menu_file_save, u"Curve fits", self.cb_save_fits)
+        self.mentit_save_quant = new_menu_item(self.menu_file_save, u"Quantification", self.cb_save_quant)
+        self.mentit_save_stdcurve = new_menu_item(self.menu_file_save, u"Standard curve", self.cb_save_stdcurve)
+        self.mentit_save_xtalk = new_menu_item(self.menu_file_save, u"Crosstalk matrix", self.cb_save_xtalk)
         # File submenu save as
         self.menu_file_saveas = wx.Menu()
         self.menu_file.AppendSubMenu(self.menu_file_saveas, u"Save as" )
@@ -1094,6 +1487,13 @@ class AzwinMenu(wx.MenuBar):
         self.mentit_simu = new_menu_item(self.menu_tools, "Simulation", self.cb_simu)
         self.mentit_prefs = new_menu_item(self.menu_tools, "Preferences", self.cb_prefs)
         self.mentit_resetlay = new_menu_item(self.menu_tools, "Reset layout", self.cb_resetlay)
+        self.mentit_nofollow = new_menu_item(self.menu_tools, "Stop following run", self.cb_nofollow)
+        self.mentit_sweep = new_menu_item(self.menu_tools, "Threshold sweep", self.cb_sweep)
+        self.mentit_threshopt = new_menu_item(self.menu_tools, "Optimize thresholds", self.cb_thresh_opt)
+        self.mentit_xtalk_est = new_menu_item(self.menu_tools, "Estimate crosstalk", self.cb_xtalk_est)
+        self.mentit_xtalk_off = new_menu_item(self.menu_tools, "No crosstalk compensation", self.cb_xtalk_off)
+        self.mentit_normref = new_menu_item(self.menu_tools, "Reference channel normalization", self.cb_normref)
+        self.mentit_fit = new_menu_item(self.menu_tools, "Fit curves", self.cb_fit)
         self.Append(self.menu_tools, "Tools")
 
 
@@ -1108,8 +1508,30 @@ class AzwinMenu(wx.MenuBar):
             self.app.handle_load_data(cfile)
 
 
+    def cb_open_batch(self, event):
+        cdir = dir_open_choose(self, ftype='data')
+        if cdir:
+            self.app.handle_load_batch(cdir)
+
+
+    def cb_open_follow(self, event):
+        cfile = file_open_choose(self, ftype='data', wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.handle_load_data(cfile, follow=True)
+
+
     def cb_open_plate(self, event):
-        not_yet(self, "open plate")
+        # Plate layout; Sample and target per well, for quantification
+        cfile = file_open_choose(self, ftype='plate layout', wildcard=azdef.FILE_CSV_WCARD)
+        if cfile and self.app.load_plate_layout(cfile, popup=True):
+            self.parent.report.show_report('QUANT')
+
+
+    def cb_open_xtalk(self, event):
+        # Instrument crosstalk matrix; Kept (setting) for later datasets
+        cfile = file_open_choose(self, ftype='crosstalk matrix', wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.load_crosstalk(cfile, popup=True)
 
 
     def cb_open_proj(self, event):
@@ -1134,6 +1556,100 @@ class AzwinMenu(wx.MenuBar):
         self.app.save_user_prefs(popup=True)
 
 
+    def cb_save_sweep(self, event):
+        if not self.app.have_dset():
+            self.app.popup_message("No data loaded, so no threshold sweep")
+            return
+        cfile = file_open_choose(self, ftype='sweep', save=True, wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.save_thresh_sweep(cfile, popup=True)
+
+
+    def cb_sweep(self, event):
+        # Fresh sweep (current data), shown in report window
+        if not self.app.have_dset():
+            self.app.popup_message("No data loaded, so no threshold sweep")
+            return
+        self.app.sweep_thresholds()
+        self.parent.report.show_report('SWEEP')
+
+
+    def cb_thresh_opt(self, event):
+        # Best thresholds set (sliders and plots follow), objective curves in report window
+        if self.app.get_field('QUANT_ENGINE') is None:
+            self.app.popup_message("No data and plate layout loaded, so no replicates or standards to optimize for")
+            return
+        self.app.optimize_thresholds()
+        self.parent.report.show_report('Optimize (thresholds)')
+
+
+    def cb_save_xtalk(self, event):
+        if self.app.get_field('XTALK') is None:
+            self.app.popup_message("No crosstalk matrix loaded or estimated")
+            return
+        cfile = file_open_choose(self, ftype='crosstalk matrix', save=True, wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.save_crosstalk(cfile, popup=True)
+
+
+    def cb_xtalk_est(self, event):
+        # Folder of single-dye calibration plates
+        cdir = dir_open_choose(self, ftype='calibration plate')
+        if cdir:
+            self.app.estimate_crosstalk(cdir, popup=True)
+
+
+    def cb_xtalk_off(self, event):
+        self.app.set_setting('COMP_MATRIX_FILE', '')
+        self.app.set_crosstalk(None, guiup=True)
+
+
+    def cb_normref(self, event):
+        # Passive reference (e.g. ROX) channel number; 0 = no normalization
+        val = popup_getval(self, "Reference channel", "Passive reference channel number (0 = none)",
+                           self.app.get_setting('NORM_REF_CHANNEL', 0), ckfunc=azu.re_int)
+        if val is not None:
+            self.app.set_norm_ref(val, guiup=True)
+
+
+    def cb_save_fits(self, event):
+        if not self.app.have_dset():
+            self.app.popup_message("No data loaded, so no curve fits")
+            return
+        cfile = file_open_choose(self, ftype='fits', save=True, wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.save_curve_fits(cfile, popup=True)
+
+
+    def cb_save_quant(self, event):
+        if self.app.get_quant_result() is None:
+            self.app.popup_message("No data and plate layout loaded, so no quantification")
+            return
+        cfile = file_open_choose(self, ftype='quantification', save=True, wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.save_quant(cfile, popup=True)
+
+
+    def cb_save_stdcurve(self, event):
+        if self.app.get_std_curves() is None:
+            self.app.popup_message("No data and plate layout loaded, so no standard curve")
+            return
+        cfile = file_open_choose(self, ftype='standard curve', save=True, wildcard=azdef.FILE_CSV_WCARD)
+        if cfile:
+            self.app.save_std_curve(cfile, popup=True)
+
+
+    def cb_fit(self, event):
+        # Fresh fits (current data), shown in report window
+        if not self.app.have_dset():
+            self.app.popup_message("No data loaded, so no curve fits")
+            return
+        with wx.BusyCursor():
+            fres = self.app.fit_curves()
+        self.parent.report.show_report('FITS')
+        self.app.set_status_text("Fit {} curves in {:.2f}s".format(fres.num_cols(), fres.seconds))
+
+
     def cb_saveas_proj(self, event):
         not_yet(self, "save project (as)")
 
@@ -1176,6 +1692,10 @@ class AzwinMenu(wx.MenuBar):
         self.app.apply_gui_settings()
 
 
+    def cb_nofollow(self, event):
+        self.app.set_follow(None)
+
+
 # ---------------------------------------------------------------------------
 # Channels dialog
 class AzwinChannels(wx.Dialog):
@@ -1196,10 +1716,8 @@ class AzwinChannels(wx.Dialog):
         self.panel = wx.Panel(self)
         self.sizer = wx.BoxSizer(wx.VERTICAL)
 
-        # Local vars pointing to global channel list and set
-        #   Modifying these, modifies main 
+        # Local var pointing to global channel list; Selection changes go via app selection
         self.clabs = self.app.get_field('LIS_CHAN_LABELS')
-        self.cset = self.app.get_field('ACTIVE_CHANNEL_SET')
 
         # Buttons and check boxes for each channel
         self.btn_all = new_button(self.panel, "All", self.cb_all, sizer=self.sizer)
@@ -1215,27 +1733,20 @@ class AzwinChannels(wx.Dialog):
 
 
     def set_checkbox_vals(self):
-        """ Update checkboxes based on channel set membership
+        """ Update checkboxes based on channel selection
         """
+        chans = self.app.get_selection().chans
         for idx, lab in enumerate(self.clabs):
-            if idx in self.cset:
-                val = True
-            else:
-                val = False
-            self.checks[lab].SetValue(val)
+            self.checks[lab].SetValue(bool(chans[idx]))
 
 
     def cb_all(self, event):
-        # All channels = set of all indices
-        self.cset |= set(range(len(self.clabs)))
-        self.set_checkbox_vals()
-        self.app.window_update()
+        # All channels; Selection listener updates window and checkboxes
+        self.app.get_selection().select_all_chans()
 
 
     def cb_none(self, event):
-        self.cset.clear()
-        self.set_checkbox_vals()
-        self.app.window_update()
+        self.app.get_selection().select_no_chans()
 
 
     def cb_check(self, event):
@@ -1245,11 +1756,7 @@ class AzwinChannels(wx.Dialog):
         # Channel label to index; e.g. 'Channel_2' >--> 1
         idx = int(lab.split('_')[1]) - 1
         val = event.GetEventObject().GetValue()
-        if val:
-            self.cset.add(idx)
-        else:
-            self.cset.remove(idx)
-        self.app.window_update()
+        self.app.get_selection().set_chan(idx, on=val)
 
 
 # ---------------------------------------------------------------------------
@@ -1338,9 +1845,8 @@ class AzwinThresholds(wx.Dialog):
 
 
     def set_chidx_thresh(self, idx, thresh):
-        self.thresh[idx] = float(thresh)
-        self.app.init_cqts()
-        self.app.window_update()
+        # Only this channel's Cq values and threshold-dependent views are updated
+        self.app.set_chan_thresh(idx, thresh, guiup=True)
 
 
 # ---------------------------------------------------------------------------
@@ -1741,28 +2247,32 @@ def val_to_slider(slider, val, vmin, vmax, invert=True, setpos=True):
     return p
 
 
-def color_grid_cells(grid, color, clis=None):
+def color_grid_cells(grid, color, clis=None, geom=None):
     """ Set color for list of grid cells (as row,col tuples)
-    If no list is given, set all
+    If no list is given, set all (geom plate; None = 96 well)
     """
+    if geom is None:
+        geom = azu.PLATE96
     if clis is None:
-        clis = azu.plate96_cell_list()
+        clis = geom.cell_list()
     for cell in clis:
         r,c = cell
         grid.SetCellBackgroundColour(r, c, color)
 
 
-def label_grid_cells(grid, clis=None, color=None, show=True):
+def label_grid_cells(grid, clis=None, color=None, show=True, geom=None):
     """ Set label for list of grid cells 
-    If no list is given, set all
+    If no list is given, set all (geom plate; None = 96 well)
     """
+    if geom is None:
+        geom = azu.PLATE96
     if clis is None:
-        clis = azu.plate96_cell_list()
+        clis = geom.cell_list()
     for cell in clis:
         r,c = cell
         # Show = text or not
         if show:
-            well = azu.cell_to_well(cell)
+            well = geom.cell_to_well(cell)
             grid.SetCellValue(r, c, well)
         else:
             grid.SetCellValue(r, c, '')
@@ -1779,6 +2289,12 @@ def wrap_up_sizing(obj, sizer):
     sizer.Fit(obj)
 
 
+def nan_format(fmt, val, nastr='-'):
+    """ Format number val, or nastr if NaN
+    """
+    return nastr if np.isnan(val) else fmt.format(val)
+
+
 def popup_message(parent, message):
     title = parent.app.get_field('PROG_NAME') + " message"
     dlg = wx.MessageDialog(parent, message, title, wx.OK | wx.ICON_INFORMATION)
@@ -1860,3 +2376,21 @@ def file_open_choose(parent, ftype=None, save=False, wildcard=azdef.FILE_DEF_WCA
     dlg.Destroy()
     return chosen 
 
+
+def dir_open_choose(parent, ftype=None):
+    """ Standardish directory chooser dialog
+
+    Returns directory name / None
+    """
+    if ftype:
+        message="Choose a " + ftype + " folder"
+    else:
+        message="Choose a folder"
+    defdir = parent.app.get_setting('DEF_FILE_PATH', '.')
+    dlg = wx.DirDialog(parent, message=message, defaultPath=defdir, style=wx.DD_DIR_MUST_EXIST)
+    chosen = None
+    if dlg.ShowModal() == wx.ID_OK:
+        chosen = dlg.GetPath()
+    # Important to kill dialog
+    dlg.Destroy()
+    return chosen
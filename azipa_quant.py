@@ -0,0 +1,573 @@
+#!/usr/bin/env python
+# 10/17/26; Relative (delta delta Cq) and standard curve quantification
+#
+# Plate layout maps wells (optionally per channel and plate) to a sample and a
+# target. Cqs of all mapped cols, from any number of plates, are one flat
+# entry array; Replicate groups (sample, target) are summed with bincount, so
+# means, sds, delta Cq (vs reference targets), delta delta Cq (vs calibrator
+# sample) and fold change are a few array ops over the (sample, target) grid.
+# Excluding / restoring wells only updates the sums of the groups involved.
+#
+# Wells with a (positive) layout Quantity are standards; Cq vs log10 quantity
+# lines for all targets (and plates) come from one set of bincount sums, then
+# every unknown is back-calculated at once.
+#
+# Threshold objectives (pooled replicate sd, standard curve R^2) take a Cq
+# matrix for many thresholds and do the same sums over (threshold, group).
+#
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import azipa_util as azu
+
+
+# Layout csv columns; Well, Sample, Target required. Channel is 1-based,
+# Quantity is for standards only (blank or 0 = not a standard)
+LAYOUT_COLS = ['Plate', 'Well', 'Channel', 'Sample', 'Target', 'Quantity']
+
+
+class PlateLayout:
+    """ Sample and target per well; Table with LAYOUT_COLS, plus 0-based Row, Col
+
+    Plate '' = any plate, Channel 0 = any channel (else 1-based),
+    Quantity NaN = not a standard
+    """
+    def __init__(self, df=None):
+        if df is None:
+            df = pd.DataFrame({c: [] for c in LAYOUT_COLS + ['Row', 'Col']})
+        self.df = df
+
+
+    def num_entries(self):
+        return len(self.df)
+
+
+    def sample_list(self):
+        # Samples in layout order
+        return pd.unique(self.df['Sample']).tolist()
+
+
+    def target_list(self):
+        return pd.unique(self.df['Target']).tolist()
+
+
+    def num_standards(self):
+        return int((self.df['Quantity'] > 0).sum())
+
+
+def plate_key(fname):
+    """ Plate name used in layouts for data file; Base name without extension
+    """
+    return os.path.splitext(os.path.basename(fname))[0]
+
+
+def layout_from_df(df):
+    """ PlateLayout from data frame with (case insensitive) LAYOUT_COLS
+    Raises ValueError if required columns are missing
+    """
+    names = {c.strip().lower(): c for c in df.columns}
+    missing = [c for c in ('Well', 'Sample', 'Target') if c.lower() not in names]
+    if missing:
+        raise ValueError("Layout missing column(s): {}".format(', '.join(missing)))
+    out = pd.DataFrame({c: df[names[c.lower()]] for c in LAYOUT_COLS if c.lower() in names})
+    # Blank rows (e.g. empty wells in plate sheet) dropped
+    out = out.dropna(subset=['Well', 'Sample', 'Target'])
+    for c in ('Well', 'Sample', 'Target'):
+        out[c] = out[c].astype(str).str.strip()
+    out['Well'] = out['Well'].str.upper()
+    rows, cols = azu.well_rowcol_arrays(out['Well'].tolist())
+    if np.any(rows < 0):
+        bad = out['Well'][rows < 0].tolist()
+        raise ValueError("Layout has bad well label(s): {}".format(', '.join(bad[:5])))
+    if 'Plate' in out:
+        out['Plate'] = out['Plate'].fillna('').astype(str).map(lambda s: plate_key(s) if s else '')
+    else:
+        out['Plate'] = ''
+    if 'Channel' in out:
+        out['Channel'] = pd.to_numeric(out['Channel'], errors='coerce').fillna(0).astype(np.int64)
+    else:
+        out['Channel'] = 0
+    if 'Quantity' in out:
+        qty = pd.to_numeric(out['Quantity'], errors='coerce').to_numpy(dtype=np.float64)
+        out['Quantity'] = np.where(qty > 0, qty, np.nan)
+    else:
+        out['Quantity'] = np.nan
+    out = out[LAYOUT_COLS].assign(Row=rows, Col=cols)
+    return PlateLayout(out.reset_index(drop=True))
+
+
+def layout_from_csv(fname):
+    """ PlateLayout from csv file; See layout_from_df
+    """
+    return layout_from_df(pd.read_csv(fname, comment='#', skipinitialspace=True))
+
+
+def label_frame(labels):
+    """ Data frame of Well, Row, Col, Channel (1-based) for col labels like 'A3_0'
+    """
+    parts = [lab.split('_', 1) for lab in labels]
+    wells = [p[0] for p in parts]
+    rows, cols = azu.well_rowcol_arrays(wells)
+    chans = np.array([int(p[1]) + 1 for p in parts], dtype=np.int64)
+    return pd.DataFrame({'Well': wells, 'Row': rows, 'Col': cols, 'Channel': chans})
+
+
+def layout_match(layout, plates):
+    """ Match layout to data cols of plates
+
+    plates = list of (plate name, col labels); Labels like 'A3_0'
+    Wells match by plate cell, so 'A03' in layout is 'A3' in data
+    Where several layout rows fit a col, the most specific (plate, then channel) wins
+
+    Returns data frame; One row per matched col with 'src' = index into
+    concatenated col labels of all plates, plus LAYOUT_COLS, Row, Col and
+    pcode (index of plate in plates)
+    """
+    frames = []
+    nsrc = 0
+    # Plates mostly share col layout; Labels parsed once per layout
+    parsed = {}
+    pnames = [plate_key(p) if p else '' for p, _ in plates]
+    for pcode, (_, labels) in enumerate(plates):
+        key = tuple(labels)
+        if key not in parsed:
+            parsed[key] = label_frame(key)
+        frames.append(parsed[key].assign(src=np.arange(nsrc, nsrc + len(key)), pcode=pcode))
+        nsrc += len(key)
+    if not frames:
+        return pd.DataFrame(columns=['src'] + LAYOUT_COLS + ['Row', 'Col', 'pcode'])
+    cols = pd.concat(frames, ignore_index=True)
+    # Plates compared as int codes; Layout -1 = any plate, -2 = plate not loaded
+    codes = {}
+    for pcode, pname in enumerate(pnames):
+        codes.setdefault(pname, pcode)
+    lcode = np.array([-1 if p == '' else codes.get(p, -2) for p in layout.df['Plate']], dtype=np.int64)
+    lay = layout.df[['Row', 'Col', 'Channel', 'Sample', 'Target', 'Quantity']].assign(lcode=lcode)
+    both = cols.merge(lay.rename(columns={'Channel': 'LChannel'}), on=['Row', 'Col'], how='inner')
+    bpc = both['pcode'].to_numpy()
+    blc = both['lcode'].to_numpy()
+    bch = both['LChannel'].to_numpy()
+    # Same plate name may be on several plates (same file name, other dirs)
+    pname_code = np.array([codes[p] for p in pnames], dtype=np.int64)
+    fits = ((blc == -1) | (blc == pname_code[bpc])) & ((bch == 0) | (bch == both['Channel'].to_numpy()))
+    both = both[fits]
+    # Specific rows first, then one row per col
+    both = both.assign(spec=2 * (both['lcode'] >= 0) + (both['LChannel'] != 0))
+    both = both.sort_values(['src', 'spec'], ascending=[True, False], kind='stable')
+    both = both.drop_duplicates('src')
+    both = both.assign(Plate=np.asarray(pnames, dtype=object)[both['pcode'].to_numpy()])
+    return both[['src'] + LAYOUT_COLS + ['Row', 'Col', 'pcode']].reset_index(drop=True)
+
+
+class QuantEngine:
+    """ Replicate group statistics and delta delta Cq for layout-matched cols
+
+    Entries (one per matched col) have plate, well, channel, sample, target,
+    src (index into caller's col array) and Cq. Cqs at or over default (or
+    NaN) are undetermined; They count in groups as undetermined only.
+    Standards (layout Quantity) are left out of replicate groups
+    """
+    def __init__(self, entries, refs=(), calibrator=None, eff=2.0, default=100):
+        self.entries = entries
+        self.src = entries['src'].to_numpy(dtype=np.int64)
+        self.wells = entries['Well'].to_numpy(dtype=object)
+        self.cells = cell_keys(entries['Row'].to_numpy(dtype=np.int64), entries['Col'].to_numpy(dtype=np.int64))
+        self.plates = entries['Plate'].to_numpy(dtype=object)
+        self.quantity = entries['Quantity'].to_numpy(dtype=np.float64)
+        self.std = self.quantity > 0
+        # Sample and target codes; Names kept in layout (first seen) order
+        scode, self.samples = pd.factorize(entries['Sample'].where(~self.std))
+        self.tcode, self.targets = pd.factorize(entries['Target'])
+        self.samples = self.samples.tolist()
+        self.targets = self.targets.tolist()
+        self.ntarget = len(self.targets)
+        self.ngroup = len(self.samples) * self.ntarget
+        # Standards (sample code -1) not in any group
+        self.group = np.where(scode < 0, -1, scode.astype(np.int64) * self.ntarget + self.tcode)
+        self.refs = [t for t in self.targets if t in set(refs)]
+        if calibrator not in self.samples:
+            calibrator = self.samples[0] if self.samples else None
+        self.calibrator = calibrator
+        self.eff = float(eff)
+        self.default = default
+        self.excluded = np.zeros(len(self.src), dtype=bool)
+        self.cqs = np.full(len(self.src), np.nan)
+        # Per group n, undetermined, sum and sum of squares (of Cq - shift)
+        self.sums = np.zeros((4, self.ngroup))
+        self.shift = 0.0
+        self.result = None
+        self.curves = None
+
+
+    def num_entries(self):
+        return len(self.src)
+
+
+    def set_cqs(self, cqs):
+        """ Set Cqs of all entries (array over caller's cols, indexed by src); Full regroup
+        """
+        self.cqs = np.asarray(cqs, dtype=np.float64)[self.src]
+        det = self.determined()
+        # Sums taken around typical Cq; Keeps sd from sums of squares accurate
+        self.shift = float(np.median(self.cqs[det])) if det.any() else 0.0
+        self.sums = self.group_sums(np.flatnonzero(~self.excluded))
+        self.result = None
+        self.curves = None
+
+
+    def determined(self):
+        return ~np.isnan(self.cqs) & (self.cqs < self.default)
+
+
+    def group_sums(self, idx):
+        """ (4, groups) array of n, undetermined, sum, sum of squares for entries idx
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        idx = idx[self.group[idx] >= 0]
+        grp = self.group[idx]
+        cqs = self.cqs[idx]
+        det = ~np.isnan(cqs) & (cqs < self.default)
+        dev = np.where(det, cqs - self.shift, 0.0)
+        return np.vstack([np.bincount(grp, weights=det, minlength=self.ngroup),
+                          np.bincount(grp, weights=~det, minlength=self.ngroup),
+                          np.bincount(grp, weights=dev, minlength=self.ngroup),
+                          np.bincount(grp, weights=dev * dev, minlength=self.ngroup)])
+
+
+    def set_excluded(self, mask, exclude=True):
+        """ Exclude (or restore) entries in bool mask; Only group sums of changed entries updated
+        Returns number of entries changed
+        """
+        idx = np.flatnonzero(np.asarray(mask, dtype=bool) & (self.excluded != exclude))
+        if len(idx) < 1:
+            return 0
+        self.excluded[idx] = exclude
+        delta = self.group_sums(idx)
+        if exclude:
+            self.sums -= delta
+        else:
+            self.sums += delta
+        self.result = None
+        self.curves = None
+        return len(idx)
+
+
+    def cell_mask(self, clis, plate=None):
+        """ Bool mask of entries for (row, col) cells; plate None = any plate
+        """
+        rc = np.array(list(clis), dtype=np.int64).reshape(-1, 2)
+        mask = np.isin(self.cells, cell_keys(rc[:, 0], rc[:, 1]))
+        if plate is not None:
+            mask &= self.plates == plate_key(plate)
+        return mask
+
+
+    def get_result(self):
+        """ QuantResult for current Cqs and exclusions; Made if needed
+        """
+        if self.result is None:
+            self.result = QuantResult(self)
+        return self.result
+
+
+    def get_std_curves(self, per_plate=False, lod_frac=0.95):
+        """ StdCurveResult for current Cqs and exclusions; Made if needed (or args differ)
+        """
+        if (self.curves is None) or (self.curves.args != (per_plate, lod_frac)):
+            self.curves = StdCurveResult(self, per_plate=per_plate, lod_frac=lod_frac)
+        return self.curves
+
+
+class QuantResult:
+    """ Replicate group statistics and relative quantities; (samples, targets) arrays
+
+    dcq = target mean Cq - mean of reference target means (same sample)
+    ddcq = dcq - dcq of calibrator sample; fold = eff ** -ddcq
+    Errors are standard errors of group means, propagated in quadrature;
+    fold_lo / fold_hi are fold at ddcq +/- its error
+    """
+    def __init__(self, eng):
+        shape = (len(eng.samples), eng.ntarget)
+        self.samples = eng.samples
+        self.targets = eng.targets
+        self.refs = eng.refs
+        self.calibrator = eng.calibrator
+        n, self.nundet, s1, s2 = [a.reshape(shape) for a in eng.sums]
+        # Exclusions subtract sums; Round off stays tiny but keep counts integer
+        self.n = np.rint(n).astype(np.int64)
+        self.nundet = np.rint(self.nundet).astype(np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(self.n > 0, s1 / self.n + eng.shift, np.nan)
+            var = np.where(self.n > 1, (s2 - s1 * s1 / self.n) / (self.n - 1), np.nan)
+            self.sd = np.sqrt(np.maximum(var, 0.0))
+            self.sem = self.sd / np.sqrt(self.n)
+        self.dcq = np.full(shape, np.nan)
+        self.dcq_se = np.full(shape, np.nan)
+        self.ddcq = np.full(shape, np.nan)
+        self.ddcq_se = np.full(shape, np.nan)
+        if self.refs and self.samples:
+            ridx = [self.targets.index(t) for t in self.refs]
+            # Mean of reference Cqs = geometric mean of their quantities
+            ref = self.mean[:, ridx].mean(axis=1)
+            ref_se = np.sqrt((self.sem[:, ridx] ** 2).sum(axis=1)) / len(ridx)
+            self.dcq = self.mean - ref[:, None]
+            self.dcq_se = np.sqrt(self.sem ** 2 + ref_se[:, None] ** 2)
+            self.dcq[:, ridx] = np.nan
+            self.dcq_se[:, ridx] = np.nan
+            cidx = self.samples.index(self.calibrator)
+            self.ddcq = self.dcq - self.dcq[cidx]
+            self.ddcq_se = np.sqrt(self.dcq_se ** 2 + self.dcq_se[cidx] ** 2)
+            # Calibrator vs itself is exact, so only its own error
+            self.ddcq_se[cidx] = self.dcq_se[cidx]
+        self.fold = eng.eff ** -self.ddcq
+        self.fold_lo = eng.eff ** -(self.ddcq + self.ddcq_se)
+        self.fold_hi = eng.eff ** -(self.ddcq - self.ddcq_se)
+
+
+    def to_df(self):
+        """ Long data frame; One row per (sample, target) group with any entries
+        """
+        ns, nt = self.n.shape
+        df = pd.DataFrame({
+            'Sample': np.repeat(np.asarray(self.samples, dtype=object), nt),
+            'Target': np.tile(np.asarray(self.targets, dtype=object), ns),
+            'Ref': np.tile(np.isin(self.targets, self.refs), ns),
+            'N': self.n.ravel(), 'Undet': self.nundet.ravel(),
+            'MeanCq': self.mean.ravel(), 'SdCq': self.sd.ravel(), 'SemCq': self.sem.ravel(),
+            'dCq': self.dcq.ravel(), 'dCqSe': self.dcq_se.ravel(),
+            'ddCq': self.ddcq.ravel(), 'ddCqSe': self.ddcq_se.ravel(),
+            'Fold': self.fold.ravel(), 'FoldLo': self.fold_lo.ravel(), 'FoldHi': self.fold_hi.ravel()},
+            copy=False)
+        return df[(df['N'] + df['Undet']) > 0].reset_index(drop=True)
+
+
+class StdCurveResult:
+    """ Standard curves (Cq vs log10 quantity) and back-calculated quantities
+
+    One curve per target (per plate + target if per_plate); Arrays over
+    curves: n (standards fit), nlevel (distinct quantities), slope,
+    intercept (Cq at quantity 1), r2, eff (amplification per cycle,
+    10 ** (-1 / slope); 2 = 100%) and lod. LOD = lowest standard quantity
+    where it and all higher levels are detected in >= lod_frac of replicates.
+    Per entry; key = curve index, qty = quantity (NaN if undetermined or no
+    curve). sample_qty = mean of replicate quantities, (samples, targets) like QuantResult
+    """
+    def __init__(self, eng, per_plate=False, lod_frac=0.95):
+        self.args = (per_plate, lod_frac)
+        ntarget = eng.ntarget
+        # Curve key per entry
+        if per_plate:
+            pcodes, pnames = pd.factorize(eng.plates)
+            key = pcodes * ntarget + eng.tcode
+            ncurve = len(pnames) * ntarget
+            self.plates = np.repeat(np.asarray(pnames, dtype=object), ntarget)
+        else:
+            key = eng.tcode.astype(np.int64)
+            ncurve = ntarget
+            self.plates = np.full(ncurve, '', dtype=object)
+        self.targets = np.tile(np.asarray(eng.targets, dtype=object), ncurve // max(ntarget, 1))
+        self.key = key
+        det = eng.determined()
+        use = eng.std & ~eng.excluded
+        fit = use & det
+        # Line sums; Cq taken around shift, as for replicate groups
+        k = key[fit]
+        x = np.log10(eng.quantity[fit])
+        y = eng.cqs[fit] - eng.shift
+        n, sx, sy, sxx, sxy, syy = [np.bincount(k, weights=w, minlength=ncurve)
+                                    for w in (np.ones(len(k)), x, y, x * x, x * y, y * y)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vxx = sxx - sx * sx / n
+            vxy = sxy - sx * sy / n
+            vyy = syy - sy * sy / n
+            ok = (n > 2) & (vxx > 1e-12)
+            self.slope = np.where(ok, vxy / vxx, np.nan)
+            self.intercept = (sy - self.slope * sx) / n + eng.shift
+            self.r2 = np.where(ok & (vyy > 0), vxy * vxy / (vxx * vyy), np.nan)
+            self.eff = 10.0 ** (-1.0 / self.slope)
+        self.n = np.rint(n).astype(np.int64)
+        self.nlevel, self.lod = std_levels_lod(key[use], eng.quantity[use], det[use], ncurve, lod_frac)
+        # Back-calculate all entries at once
+        ekey = np.where(det, key, 0)
+        with np.errstate(invalid='ignore', over='ignore'):
+            self.qty = np.where(det, 10.0 ** ((eng.cqs - self.intercept[ekey]) / self.slope[ekey]), np.nan)
+        # Replicate means of unknowns; Same groups as delta delta Cq
+        grp = (eng.group >= 0) & ~eng.excluded & ~np.isnan(self.qty)
+        qn = np.bincount(eng.group[grp], minlength=eng.ngroup)
+        qs = np.bincount(eng.group[grp], weights=self.qty[grp], minlength=eng.ngroup)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.sample_qty = (qs / qn).reshape(len(eng.samples), ntarget)
+        self.samples = eng.samples
+        self.sample_targets = eng.targets
+
+
+    def num_curves(self):
+        return len(self.slope)
+
+
+    def to_df(self):
+        """ Data frame of curves with any standards; One row per target (or plate + target)
+        """
+        df = pd.DataFrame({'Plate': self.plates, 'Target': self.targets, 'N': self.n,
+                           'Levels': self.nlevel, 'Slope': self.slope, 'Intercept': self.intercept,
+                           'R2': self.r2, 'Eff': self.eff, 'EffPct': 100.0 * (self.eff - 1.0),
+                           'LOD': self.lod}, copy=False)
+        return df[df['Levels'] > 0].reset_index(drop=True)
+
+
+def std_levels_lod(key, qty, det, ncurve, lod_frac=0.95):
+    """ Number of standard levels and LOD per curve; (nlevel, lod) arrays
+
+    key = curve index, qty = quantity, det = detected; One entry per standard well
+    """
+    nlevel = np.zeros(ncurve, dtype=np.int64)
+    lod = np.full(ncurve, np.nan)
+    if len(key) < 1:
+        return nlevel, lod
+    # Levels = distinct (curve, quantity); Sorted by curve, then quantity high to low
+    levels, lev = np.unique(np.column_stack([key, -qty]), axis=0, return_inverse=True)
+    lev = lev.ravel()
+    lkey = levels[:, 0].astype(np.int64)
+    lqty = -levels[:, 1]
+    rate = np.bincount(lev, weights=det) / np.bincount(lev)
+    nlevel += np.bincount(lkey, minlength=ncurve)
+    # Levels down to first one under lod_frac (within each curve) are reliably detected
+    bad = np.cumsum(rate < lod_frac)
+    first = np.r_[0, np.flatnonzero(np.diff(lkey)) + 1]
+    seg = np.repeat(np.arange(len(first)), np.diff(np.r_[first, len(lkey)]))
+    before = (bad - (rate < lod_frac))[first]
+    good = bad == before[seg]
+    np.fmin.at(lod, lkey[good], lqty[good])
+    return nlevel, lod
+
+
+def std_curve_entry_df(eng, curves):
+    """ Data frame of layout-matched cols with Cq, standard quantity, curve and back-calculated quantity
+    """
+    ckey = curves.key
+    df = eng.entries[['Plate', 'Well', 'Channel', 'Sample', 'Target', 'Quantity']].assign(
+        Cq=np.where(eng.determined(), eng.cqs, np.nan), Excluded=eng.excluded,
+        Slope=curves.slope[ckey], Intercept=curves.intercept[ckey], QtyCalc=curves.qty)
+    return df.rename(columns={'Quantity': 'QtyStd'})
+
+
+def entry_cq_matrix(eng, src, cqm):
+    """ Cq matrix columns (caller's cols src) for engine entries; Excluded entries left out
+
+    Returns (entry index array, (nthresh, entries) Cq matrix)
+    """
+    src = np.asarray(src, dtype=np.int64)
+    emap = np.full(max(int(eng.src.max(initial=-1)), int(src.max(initial=-1))) + 1, -1, dtype=np.int64)
+    emap[src] = np.arange(len(src))
+    idx = np.flatnonzero((emap[eng.src] >= 0) & ~eng.excluded)
+    return idx, np.asarray(cqm, dtype=np.float64)[:, emap[eng.src[idx]]]
+
+
+def flat_group_sums(cqm, det, codes, ncode, weights_list):
+    # bincount over (threshold, code) pairs for each weight (nthresh, n) array; Returns (nthresh, ncode) arrays
+    nth = cqm.shape[0]
+    k = (np.arange(nth)[:, None] * ncode + codes[None, :])[det]
+    return [np.bincount(k, weights=w[det], minlength=nth * ncode).reshape(nth, ncode) for w in weights_list]
+
+
+def replicate_sd_objective(eng, src, cqm):
+    """ Pooled replicate Cq sd for each threshold; (objective, determined count) arrays
+
+    cqm = (thresholds, cols) Cq matrix for caller's cols src (e.g. one channel)
+    Pooled over (sample, target) groups with 2+ determined replicates
+    """
+    idx, cq = entry_cq_matrix(eng, src, cqm)
+    keep = eng.group[idx] >= 0
+    idx = idx[keep]
+    cq = cq[:, keep]
+    codes, gcode = np.unique(eng.group[idx], return_inverse=True)
+    det = ~np.isnan(cq) & (cq < eng.default)
+    ndet = det.sum(axis=1)
+    if len(codes) < 1:
+        return np.full(cq.shape[0], np.nan), ndet
+    n, s1 = flat_group_sums(cq, det, gcode, len(codes), [np.ones_like(cq), cq])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s1 / n
+    # Second pass around group means; No cancellation from sums of squares
+    dev = cq - np.take_along_axis(mean, np.broadcast_to(gcode, cq.shape), axis=1)
+    ss = flat_group_sums(cq, det, gcode, len(codes), [dev * dev])[0]
+    dof = np.where(n > 1, n - 1, 0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled = np.sqrt(np.where(n > 1, ss, 0.0).sum(axis=1) / dof)
+    return np.where(dof > 0, pooled, np.nan), ndet
+
+
+def std_curve_r2_objective(eng, src, cqm, per_plate=False):
+    """ Mean standard curve R^2 (over curves) for each threshold; (objective, determined count)
+
+    cqm = (thresholds, cols) Cq matrix for caller's cols src; Only standards used
+    """
+    idx, cq = entry_cq_matrix(eng, src, cqm)
+    keep = eng.std[idx]
+    idx = idx[keep]
+    cq = cq[:, keep]
+    if per_plate:
+        key = pd.factorize(eng.plates[idx])[0] * eng.ntarget + eng.tcode[idx]
+    else:
+        key = eng.tcode[idx]
+    codes, kcode = np.unique(key, return_inverse=True)
+    det = ~np.isnan(cq) & (cq < eng.default)
+    ndet = det.sum(axis=1)
+    if len(codes) < 1:
+        return np.full(cq.shape[0], np.nan), ndet
+    x = np.broadcast_to(np.log10(eng.quantity[idx]), cq.shape)
+    n, sx, sy = flat_group_sums(cq, det, kcode, len(codes), [np.ones_like(cq), x, cq])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx = sx / n
+        my = sy / n
+    full = np.broadcast_to(kcode, cq.shape)
+    dx = x - np.take_along_axis(mx, full, axis=1)
+    dy = cq - np.take_along_axis(my, full, axis=1)
+    vxx, vxy, vyy = flat_group_sums(cq, det, kcode, len(codes), [dx * dx, dx * dy, dy * dy])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r2 = np.where((n > 2) & (vxx > 1e-12) & (vyy > 0), vxy * vxy / (vxx * vyy), np.nan)
+        ncurve = (~np.isnan(r2)).sum(axis=1)
+        obj = np.where(ncurve > 0, np.nansum(r2, axis=1) / ncurve, np.nan)
+    return obj, ndet
+
+
+def best_thresh_index(objective, ndet, maximize=False, min_frac=0.9):
+    """ Index of best objective among thresholds where at least min_frac of the most
+    determined Cqs (over all thresholds) are determined; -1 if none usable
+
+    Keeps the search from thresholds so high that few (consistent) curves cross
+    """
+    objective = np.asarray(objective, dtype=np.float64)
+    ok = ~np.isnan(objective) & (ndet >= min_frac * np.max(ndet, initial=0))
+    if not ok.any():
+        return -1
+    vals = np.where(ok, objective, -np.inf if maximize else np.inf)
+    return int(np.argmax(vals) if maximize else np.argmin(vals))
+
+
+def cell_keys(rows, cols):
+    # Single int per (row, col) plate cell
+    return rows * 100000 + cols
+
+
+def quant_engine(layout, plates, refs=(), calibrator=None, eff=2.0, default=100):
+    """ QuantEngine for layout and plates; List of (plate name, col labels, Cq array)
+    Cq arrays are aligned with col labels
+    """
+    entries = layout_match(layout, [(p, labels) for p, labels, _ in plates])
+    eng = QuantEngine(entries, refs=refs, calibrator=calibrator, eff=eff, default=default)
+    cqs = [np.asarray(c, dtype=np.float64) for _, _, c in plates]
+    eng.set_cqs(np.concatenate(cqs) if cqs else np.zeros(0))
+    return eng
+
+
+def ref_target_list(refs):
+    """ Reference target list from comma separated string (or list)
+    """
+    if isinstance(refs, str):
+        refs = refs.split(',')
+    return [r.strip() for r in refs if r.strip()]
+
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# 10/17/26; Well / channel selection as boolean masks
+#
+# Selection is kept as numpy bool masks over plate wells (linear index, see
+# azu.PlateGeom) and channels. Range, row, column, invert etc. are each one
+# array operation. Listeners get a SelectionChange with what was added and
+# removed, so they can update only what changed.
+#
+
+import numpy as np
+
+
+class SelectionChange:
+    """ Diff of one selection update; Int arrays of plate well and channel indices
+    """
+    def __init__(self, wells_on=None, wells_off=None, chans_on=None, chans_off=None):
+        empty = np.zeros(0, dtype=np.int64)
+        self.wells_on = empty if wells_on is None else wells_on
+        self.wells_off = empty if wells_off is None else wells_off
+        self.chans_on = empty if chans_on is None else chans_on
+        self.chans_off = empty if chans_off is None else chans_off
+
+
+    def __repr__(self):
+        return "SelectionChange(wells +{} -{}, chans +{} -{})".format(
+            len(self.wells_on), len(self.wells_off), len(self.chans_on), len(self.chans_off))
+
+
+    def is_empty(self):
+        return not (len(self.wells_on) or len(self.wells_off)
+                    or len(self.chans_on) or len(self.chans_off))
+
+
+    def wells_changed(self):
+        return np.concatenate([self.wells_on, self.wells_off])
+
+
+class PlateSelection:
+    """ Active wells and channels for a plate dataset
+
+    anydata = wells with any data; Only these can be active
+    wells = active wells, chans = active channels; Bool masks
+    """
+    def __init__(self, geom, nchan=0, anydata=None):
+        self.geom = geom
+        nwell = geom.num_wells()
+        if anydata is None:
+            anydata = np.ones(nwell, dtype=bool)
+        self.anydata = np.asarray(anydata, dtype=bool)
+        self.wells = self.anydata.copy()
+        self.chans = np.ones(nchan, dtype=bool)
+        self.listeners = []
+
+
+    # ------------------------------------------------
+    # Change notification
+    def add_listener(self, func):
+        """ Call func(change) after each (non-empty) selection change
+        """
+        if func not in self.listeners:
+            self.listeners.append(func)
+
+
+    def remove_listener(self, func):
+        if func in self.listeners:
+            self.listeners.remove(func)
+
+
+    def notify(self, change):
+        for func in list(self.listeners):
+            func(change)
+
+
+    # ------------------------------------------------
+    # Core updates; Everything else goes through these
+    def set_well_mask(self, mask, notify=True):
+        """ Set active wells to mask (limited to wells with data)
+
+        Returns SelectionChange
+        """
+        new = np.asarray(mask, dtype=bool) & self.anydata
+        diff = new != self.wells
+        change = SelectionChange(wells_on=np.flatnonzero(diff & new),
+                                 wells_off=np.flatnonzero(diff & self.wells))
+        self.wells = new
+        if notify and not change.is_empty():
+            self.notify(change)
+        return change
+
+
+    def set_chan_mask(self, mask, notify=True):
+        """ Set active channels to mask; Returns SelectionChange
+        """
+        new = np.asarray(mask, dtype=bool)
+        diff = new != self.chans
+        change = SelectionChange(chans_on=np.flatnonzero(diff & new),
+                                 chans_off=np.flatnonzero(diff & self.chans))
+        self.chans = new
+        if notify and not change.is_empty():
+            self.notify(change)
+        return change
+
+
+    # ------------------------------------------------
+    # Well selections
+    def region_mask(self, rows=None, cols=None):
+        """ Plate well mask for rows x cols; Each is slice, int list / array or None = all
+        """
+        grid = np.zeros((self.geom.nrow, self.geom.ncol), dtype=bool)
+        rsel = slice(None) if rows is None else rows
+        csel = slice(None) if cols is None else cols
+        if isinstance(rsel, slice) or isinstance(csel, slice):
+            grid[rsel, csel] = True
+        else:
+            grid[np.ix_(np.asarray(rsel), np.asarray(csel))] = True
+        return grid.ravel()
+
+
+    def cells_mask(self, clis):
+        """ Plate well mask for list of (row, col) cells; Cells off plate ignored
+        """
+        mask = np.zeros(self.geom.num_wells() + 1, dtype=bool)
+        if len(clis):
+            mask[self.geom.cells_to_index_array(clis)] = True
+        return mask[:-1]
+
+
+    def select_all(self, notify=True):
+        return self.set_well_mask(self.anydata, notify=notify)
+
+
+    def select_none(self, notify=True):
+        return self.set_well_mask(np.zeros_like(self.wells), notify=notify)
+
+
+    def invert(self, notify=True):
+        return self.set_well_mask(~self.wells, notify=notify)
+
+
+    def add_mask(self, mask, notify=True):
+        return self.set_well_mask(self.wells | mask, notify=notify)
+
+
+    def remove_mask(self, mask, notify=True):
+        return self.set_well_mask(self.wells & ~mask, notify=notify)
+
+
+    def toggle_mask(self, mask, notify=True):
+        return self.set_well_mask(self.wells ^ mask, notify=notify)
+
+
+    def toggle_range(self, row0, col0, row1, col1, notify=True):
+        """ Toggle wells in (inclusive) cell range; e.g. grid drag
+        """
+        rows = slice(max(row0, 0), min(row1, self.geom.nrow - 1) + 1)
+        cols = slice(max(col0, 0), min(col1, self.geom.ncol - 1) + 1)
+        return self.toggle_mask(self.region_mask(rows, cols), notify=notify)
+
+
+    def select_rows(self, rows, notify=True):
+        return self.add_mask(self.region_mask(rows=rows), notify=notify)
+
+
+    def select_cols(self, cols, notify=True):
+        return self.add_mask(self.region_mask(cols=cols), notify=notify)
+
+
+    def mod_cells(self, alis=None, dlis=None, notify=True):
+        """ Add cells in alis, remove cells in dlis; Returns SelectionChange
+        """
+        mask = self.wells.copy()
+        if alis is not None:
+            mask |= self.cells_mask(alis)
+        if dlis is not None:
+            mask &= ~self.cells_mask(dlis)
+        return self.set_well_mask(mask, notify=notify)
+
+
+    # ------------------------------------------------
+    # Channel selections
+    def set_chans(self, chans, notify=True):
+        """ Set active channels to collection of (0-based) indices
+        """
+        mask = np.zeros_like(self.chans)
+        mask[list(chans)] = True
+        return self.set_chan_mask(mask, notify=notify)
+
+
+    def set_chan(self, idx, on=True, notify=True):
+        mask = self.chans.copy()
+        mask[idx] = on
+        return self.set_chan_mask(mask, notify=notify)
+
+
+    def select_all_chans(self, notify=True):
+        return self.set_chan_mask(np.ones_like(self.chans), notify=notify)
+
+
+    def select_no_chans(self, notify=True):
+        return self.set_chan_mask(np.zeros_like(self.chans), notify=notify)
+
+
+    # ------------------------------------------------
+    # Access
+    def num_active_wells(self):
+        return int(np.count_nonzero(self.wells))
+
+
+    def index_cells(self, idx):
+        """ List of (row, col) cells for array of plate well indices
+        """
+        rows, cols = np.divmod(np.asarray(idx, dtype=np.int64), self.geom.ncol)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+
+    def active_cells(self):
+        return self.index_cells(np.flatnonzero(self.wells))
+
+
+    def anydata_cells(self):
+        return self.index_cells(np.flatnonzero(self.anydata))
+
+
+    def nodata_cells(self):
+        return self.index_cells(np.flatnonzero(~self.anydata))
+
+
+    def active_chans(self):
+        return np.flatnonzero(self.chans).tolist()
+
+
+    def col_mask(self, col_meta, chans=None):
+        """ Bool mask over dataset columns (see PlateDataSet.get_col_meta) that are active
+
+        chans = optional channel collection to restrict to
+        """
+        # Extra False entry for columns not on plate (index -1)
+        wells = np.append(self.wells, False)
+        cmask = self.chans
+        if chans is not None:
+            cmask = np.zeros_like(self.chans)
+            cmask[list(chans)] = True
+            cmask &= self.chans
+        return wells[col_meta['plate']] & cmask[col_meta['chan']]
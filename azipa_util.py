@@ -13,6 +13,8 @@
 import json
 import re
 
+import numpy as np
+
 
 # ------------------------------------------------
 # json IO
@@ -76,17 +78,180 @@ def re_color(s):
         return s
 
 
+# ------------------------------------------------
+# Plate geometry
+#
+# Generic well label; Row letters then column number, 'B3', 'AF48'
+WELL_PATTERN = re.compile('^([A-Za-z]+)(\\d+)$')
+
+
+def well_to_rowcol(well):
+    """ Generic (any plate size) well label to 0-based (row, col)
+    e.g. 'B3' >--> (1,2), 'AA1' >--> (26,0); None if not a well label
+    """
+    match = WELL_PATTERN.match(str(well))
+    if not match:
+        return None
+    row = 0
+    for ch in match.group(1).upper():
+        row = row * 26 + (ord(ch) - ord('A') + 1)
+    return row - 1, int(match.group(2)) - 1
+
+
+def well_rowcol_arrays(wlis):
+    """ Int arrays (rows, cols) for list of well labels; -1 if not a well label
+    """
+    rows = np.full(len(wlis), -1, dtype=np.int64)
+    cols = np.full(len(wlis), -1, dtype=np.int64)
+    for i, well in enumerate(wlis):
+        rc = well_to_rowcol(well)
+        if rc is not None:
+            rows[i], cols[i] = rc
+    return rows, cols
+
+
+# Standard plate sizes; Wells >--> (rows, cols)
+PLATE_SIZES = {6: (2, 3), 12: (3, 4), 24: (4, 6), 48: (6, 8),
+               96: (8, 12), 384: (16, 24), 1536: (32, 48)}
+
+
+class PlateGeom:
+    """ Plate geometry; Rows x cols grid with arithmetic conversions between
+    well label ('B3'), cell (1,2) and linear (row-major) index 14
+
+    Instances are shared (see plate_geom()), so treat as read-only
+    """
+    def __init__(self, nrow=8, ncol=12):
+        self.nrow = nrow
+        self.ncol = ncol
+        self.row_labels = plate_row_label_list(nrow)
+        self.col_labels = [str(c+1) for c in range(ncol)]
+
+
+    def __repr__(self):
+        return "PlateGeom({}, {})".format(self.nrow, self.ncol)
+
+
+    def num_wells(self):
+        return self.nrow * self.ncol
+
+
+    def has_cell(self, cell):
+        r, c = cell
+        return (0 <= r < self.nrow) and (0 <= c < self.ncol)
+
+
+    def cell_to_index(self, cell):
+        return cell[0] * self.ncol + cell[1]
+
+
+    def index_to_cell(self, idx):
+        return divmod(idx, self.ncol)
+
+
+    def cell_to_well(self, cell):
+        """ (1,2) >--> 'B3'; KeyError if not on plate
+        """
+        if not self.has_cell(cell):
+            raise KeyError(cell)
+        return self.row_labels[cell[0]] + self.col_labels[cell[1]]
+
+
+    def well_to_cell(self, well):
+        """ 'B3' >--> (1,2); KeyError if not a well on plate
+        """
+        cell = well_to_rowcol(well)
+        if (cell is None) or (not self.has_cell(cell)):
+            raise KeyError(well)
+        return cell
+
+
+    def well_to_index(self, well):
+        return self.cell_to_index(self.well_to_cell(well))
+
+
+    def index_to_well(self, idx):
+        return self.cell_to_well(self.index_to_cell(idx))
+
+
+    def cell_list(self):
+        return [(r, c) for r in range(self.nrow) for c in range(self.ncol)]
+
+
+    def well_list(self):
+        return [r + c for r in self.row_labels for c in self.col_labels]
+
+
+    def cells_to_index_array(self, clis):
+        """ Int array of linear indices for cells; -1 for cells not on plate
+        """
+        rc = np.array(list(clis), dtype=np.int64).reshape(-1, 2)
+        ok = (rc[:, 0] >= 0) & (rc[:, 0] < self.nrow) & (rc[:, 1] >= 0) & (rc[:, 1] < self.ncol)
+        return np.where(ok, rc[:, 0] * self.ncol + rc[:, 1], -1)
+
+
+    def wells_to_index_array(self, wlis):
+        """ Int array of linear indices for well labels; -1 if not a well on plate
+        """
+        rows, cols = well_rowcol_arrays(wlis)
+        ok = (rows >= 0) & (rows < self.nrow) & (cols >= 0) & (cols < self.ncol)
+        return np.where(ok, rows * self.ncol + cols, -1)
+
+
+# Shared geometry instances, keyed by (rows, cols)
+_PLATE_GEOMS = {}
+
+
+def plate_geom(nwell=96, nrow=None, ncol=None):
+    """ Shared PlateGeom for standard well count, or explicit rows x cols
+    """
+    if (nrow is None) or (ncol is None):
+        nrow, ncol = PLATE_SIZES[nwell]
+    key = (nrow, ncol)
+    if key not in _PLATE_GEOMS:
+        _PLATE_GEOMS[key] = PlateGeom(nrow, ncol)
+    return _PLATE_GEOMS[key]
+
+
+def plate_geom_for_wells(wlis):
+    """ Smallest standard plate holding all (parsable) well labels; Else just big enough grid
+    """
+    rows, cols = well_rowcol_arrays(wlis)
+    ok = rows >= 0
+    if not ok.any():
+        return plate_geom(96)
+    nrow = int(rows[ok].max()) + 1
+    ncol = int(cols[ok].max()) + 1
+    for nwell in sorted(PLATE_SIZES):
+        prow, pcol = PLATE_SIZES[nwell]
+        if (nrow <= prow) and (ncol <= pcol):
+            return plate_geom(nwell)
+    return plate_geom(nrow=nrow, ncol=ncol)
+
+
+def plate_row_label_list(nrow):
+    """ Row labels A..Z then AA, AB ...
+    """
+    labs = []
+    for r in range(nrow):
+        lab = ''
+        r += 1
+        while r > 0:
+            r, m = divmod(r - 1, 26)
+            lab = chr(ord('A') + m) + lab
+        labs.append(lab)
+    return labs
+
+
 # ------------------------------------------------
 # Label utils
 #
 # Well, cell, dataset (dataframe) column interconversions
 #
-# General 96 well-to-cell mapping dicts
+# General 96 well-to-cell mapping dicts (kept for 96-well callers; See PlateGeom)
 #   Well to Cell maps 'B3' >--> (1,2)
-W2CMAP = {}
-for i, r in enumerate(list('ABCDEFGH')):
-    for c in range(12):
-        W2CMAP[r + str(c+1)] = (i, c)
+PLATE96 = plate_geom(96)
+W2CMAP = {w: PLATE96.well_to_cell(w) for w in PLATE96.well_list()}
 
 #   Cell to Well maps (1,2) >--> 'B3'
 C2WMAP = {v: k for k, v in W2CMAP.items()}
@@ -156,38 +321,48 @@ def col_to_well_list(clis):
     return list( set([c.split('_')[0] for c in clis]) )
 
 
-def col_to_cell_list(clis):
-    return well_to_cell_list(col_to_well_list(clis))
+def col_to_cell_list(clis, geom=None):
+    return well_to_cell_list(col_to_well_list(clis), geom=geom)
 
 
 def col_to_well(col):
     return col.split('_')[0]
 
 
-def col_to_cell(col):
-    return well_to_cell(col_to_well(col))
+def col_to_cell(col, geom=None):
+    return well_to_cell(col_to_well(col), geom=geom)
 
 
 def col_to_chan_index(col):
     return int(col.split('_')[1])
 
 
-def cell_to_well_list(clis):
+def cell_to_well_list(clis, geom=None):
     """ Convert list of cell to well; (1,3) >--> 'B4'
+    geom = PlateGeom; None = 96 well plate
     """
-    return [C2WMAP[c] for c in clis]
+    if geom is None:
+        return [C2WMAP[c] for c in clis]
+    return [geom.cell_to_well(c) for c in clis]
 
 
-def well_to_cell_list(wlis):
+def well_to_cell_list(wlis, geom=None):
     """ Convert list of well to cell; 'B4' >--> (1,3)
+    geom = PlateGeom; None = 96 well plate
     """
-    return [W2CMAP[w] for w in wlis]
+    if geom is None:
+        return [W2CMAP[w] for w in wlis]
+    return [geom.well_to_cell(w) for w in wlis]
 
 
-def cell_to_well(cell):
-    return C2WMAP[cell]
+def cell_to_well(cell, geom=None):
+    if geom is None:
+        return C2WMAP[cell]
+    return geom.cell_to_well(cell)
 
 
-def well_to_cell(well):
-    return W2CMAP[well]
+def well_to_cell(well, geom=None):
+    if geom is None:
+        return W2CMAP[well]
+    return geom.well_to_cell(well)
 
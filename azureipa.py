@@ -29,8 +29,18 @@ except ImportError:
     print(" ... Sorry, can't run without it ...")
     sys.exit()
 
+import numpy as np
+
 import azipa_gui as azgui
 import azipa_df as azdf
+import azipa_calc as azcalc
+import azipa_fit as azfit
+import azipa_quant as azquant
+import azipa_comp as azcomp
+import azipa_derive as azderive
+import azipa_select as azsel
+import azipa_cache as azcache
+import azipa_batch as azbatch
 import azipa_util as azu
 import azipa_defs as azdef
 
@@ -55,6 +65,7 @@ class AzureIpaApp:
         """ Initialize run-time fields
         """
         self.fields = {}
+        self.derived = azderive.DerivedCache()
         self.fields['PROG_TITLE'] = PROG_TITLE
         self.fields['PROG_NAME'] = PROG_NAME
         self.fields['VERSION_S'] = VERSION_S
@@ -112,8 +123,12 @@ class AzureIpaApp:
     def window_init_dset(self, setdefs=True):
         self.window.reset_dset()
         if setdefs:
-            # Set window default dataframes
-            self.window.curves.set_dfkey('DF_BLCOR')
+            # Set window default dataframes; Melt data shows -dF/dT and Tm report
+            if self.dset.is_melt():
+                self.window.curves.set_dfkey('DF_MELT_DERIV')
+                self.window.report.set_report_choice('MELT')
+            else:
+                self.window.curves.set_dfkey('DF_BLCOR')
             self.window.plots.set_dfkey('DF_RAW')
 
 
@@ -136,11 +151,35 @@ class AzureIpaApp:
 
 
     def get_field(self, key, default=None):
+        # Derived data frames come from lazy cache
+        if self.derived.has_key(key):
+            return self.derived.get(key, default)
         return self.fields.get(key, default)
 
 
     def set_field(self, key, value):
-        self.fields[key] = value
+        if self.derived.has_key(key):
+            self.derived.set_value(key, value)
+        else:
+            self.fields[key] = value
+
+
+    def get_field_cols(self, key, pos):
+        """ Field data frame, only columns at int positions pos (None if no field)
+        Derived frames not yet computed are made for just those cols (cached per subset)
+        """
+        if self.derived.has_key(key):
+            return self.derived.get_cols(key, pos)
+        df = self.fields.get(key)
+        return None if df is None else df.iloc[:, pos]
+
+
+    def get_geom(self):
+        """ Plate geometry of dataset; 96 well plate if no data
+        """
+        if self.dset is None:
+            return azu.PLATE96
+        return self.dset.get_geom()
 
 
     def get_chan_1index_cols(self, chidx):
@@ -226,26 +265,85 @@ class AzureIpaApp:
 
     # ------------------------
     # High level processing functions
-    def handle_load_data(self, fname):
+    def handle_load_data(self, fname, follow=False):
         """ Handle loading data file
+        If follow, file is still being written (run in progress); Poll for new rows
         """
         filename = os.path.basename(fname)
         filepath = os.path.dirname(fname)
         try:
-            dset = azdf.platedataset_from_azcsv(fname)
+            follower = None
+            if follow:
+                # No cache for file that's changing; Follower reads complete rows only
+                follower = azdf.azcsv_follow(fname)
+                dset = follower.dset
+            else:
+                dset = azcache.platedataset_load(fname, cachedir=self.get_setting('CACHE_DIR'),
+                                                 max_mb=self.get_setting('CACHE_MAX_MB', 500))
             # Save dir
             self.set_setting('DEF_FILE_PATH', filepath)
             # Set things up
             self.set_dset(dset)
+            self.set_follow(follower)
             # GUI updates
             self.window_init_dset()
             self.update_status()
             self.window_update()
-        except:
-            popmsg = "Failed to loaded data from {}".format(filename)
+        except Exception as e:
+            popmsg = "Failed to loaded data from {}\n{}: {}".format(filename, type(e).__name__, e)
             self.popup_message(popmsg)
 
 
+    def handle_load_batch(self, path):
+        """ Handle loading directory (or glob) of data files across process pool
+        First loaded dataset becomes current; All are kept in field
+        """
+        bload = azbatch.batch_load(path, cachedir=self.get_setting('CACHE_DIR'),
+                                   max_mb=self.get_setting('CACHE_MAX_MB', 500))
+        self.set_field('DIC_BATCH_DSETS', bload.dsets)
+        self.set_field('DIC_BATCH_BLCOR', {})
+        if bload.dsets:
+            self.set_setting('DEF_FILE_PATH', path if os.path.isdir(path) else os.path.dirname(path))
+            self.set_dset(next(iter(bload.dsets.values())))
+            self.set_follow(None)
+            self.window_init_dset()
+            self.update_status()
+            self.window_update()
+        self.popup_message('\n'.join(bload.summary()))
+        return bload
+
+
+    def set_follow(self, follower=None):
+        """ Start polling follower (AzcsvFollower) for new rows; None = stop
+        """
+        self.set_field('FOLLOWER', follower)
+        msec = self.get_setting('FOLLOW_POLL_MS', 2000) if follower else 0
+        self.window.set_follow_timer(msec)
+
+
+    def update_follow(self):
+        """ Poll followed file; Extend dataset and derived fields with new rows
+
+        Returns number of new rows
+        """
+        follower = self.get_field('FOLLOWER')
+        if (follower is None) or (follower.dset is not self.dset):
+            return 0
+        nold = self.dset.num_rows()
+        try:
+            nnew = follower.poll()
+        except (OSError, ValueError) as e:
+            self.set_follow(None)
+            self.popup_message("Stopped following {}\n{}: {}".format(
+                               os.path.basename(self.dset.fname), type(e).__name__, e))
+            return 0
+        if nnew > 0:
+            self.extend_dset(nold)
+            self.update_status()
+            self.window.extend_dset()
+        return nnew
+
+
     def update_status(self):
         if self.dset is None:
             message = "Nothing loaded ..."
@@ -262,79 +360,158 @@ class AzureIpaApp:
         """
         if DEBUG: print(">> set_dset", type(dset))
         self.dset = dset
+        # Quant entries are per dataset; Rebuilt once selection is set up
+        self.set_field('QUANT_ENGINE', None)
         if dset is not None:
+            # Derived dfs (baseline corrected, derivatives) are computed on first use
+            self.init_derived()
+            self.init_comp()
+            self.init_norm()
             # Save attributes into run-time fields
             self.set_field('DF_RAW', dset.df)
             if DEBUG: print("+ df", dset.df.shape)
             self.set_field('DSET_CHANNELS', dset.channel_list())
             self.set_field('DSET_NUM_CHAN', dset.num_channels())
-            # First and second derivative dfs
-            dfd1 = azdf.df_1st_deriv(dset.df)
-            dfd2 = azdf.df_2nd_deriv(dset.df)
-            self.set_field('DF_1ST_DERIV', dfd1)
-            self.set_field('DF_2ND_DERIV', dfd2)
             # Init various dataset-based things...
             self.init_baselines()
             self.init_minmaxthresh()
             self.init_cq2nds()
             self.init_cqts()
+            self.init_effs()
+            self.init_fits()
+            self.init_melt()
 
-        # Set up channel and cell working collections
+        # Set up channel labels and well / channel selection
         self.init_channel_sets()
-        self.init_cell_sets()
+        self.init_selection()
+        self.init_quant()
         if DEBUG: print("<< set_dset")
 
 
+    def extend_dset(self, nold):
+        """ Update working vars for rows appended to dataset, from row nold on
+        Only new rows are processed; Thresholds are kept as they are
+        """
+        # New raw data drops derived dfs; Recomputed (one array op each) when used
+        self.set_field('DF_RAW', self.dset.df)
+        bcdf = self.get_field('DF_BLCOR')
+        self.init_cq2nds()
+        self.init_effs()
+        # Curve fits are stale; Redone on request
+        self.init_fits()
+        self.init_melt()
+        if not self.baseline_fixed_at(nold):
+            # Baseline fit (or normalization) moved with new rows, so old rows changed too; Redo all (batched)
+            # Lists updated in place; Threshold dialog holds them
+            min_vals, max_vals = self.get_chan_minmax(bcdf)
+            self.get_field('LIS_CHAN_MINS')[:] = min_vals
+            self.get_field('LIS_CHAN_MAXS')[:] = max_vals
+            self.init_cqts()
+            return
+        self.extend_minmax(bcdf.iloc[nold:])
+        self.extend_cqts(bcdf, nold)
+        self.set_field('DIC_CHAN_CROSSIDX', None)
+        self.set_field('DIC_CHAN_SWEEP', None)
+        self.set_field('DIC_CHAN_THRESH_OPT', None)
+
+
+    def extend_minmax(self, bctail):
+        """ Update per-channel min, max lists (in place) with new rows
+        """
+        min_vals = self.get_field('LIS_CHAN_MINS')
+        max_vals = self.get_field('LIS_CHAN_MAXS')
+        vals = bctail.to_numpy()
+        for i in range(self.dset.num_channels()):
+            dvals = vals[:, self.dset.get_col_pos(chans=[i])]
+            min_vals[i] = min(min_vals[i], dvals.min())
+            max_vals[i] = max(max_vals[i], dvals.max())
+
+
+    def extend_cqts(self, bcdf, nold, default=100):
+        """ Update threshold Cq dict for new rows (from nold on)
+        Only columns that haven't crossed yet can change
+        """
+        cqs = self.get_field('DIC_COL_CQT')
+        col_th = np.asarray(self.get_field('LIS_CHAN_THRESH'))[self.dset.get_col_meta()['chan']]
+        vals = bcdf.to_numpy()
+        cols = bcdf.columns
+        # Not yet crossed, and first value not above (those never get Cq)
+        old = np.array([cqs[c] for c in cols], dtype=np.float64)
+        todo = np.flatnonzero((old == default) & ~(vals[0] > col_th))
+        if len(todo) < 1:
+            return
+        # Segment from last old row on; Crossing at its row 0 isn't new
+        pos = azcalc.thresh_cross_pos(vals[nold-1:, todo], col_th[todo], default=np.nan)
+        for j, v in zip(todo, pos):
+            if not np.isnan(v):
+                cqs[cols[j]] = v + nold - 1
+        self.update_quant_cqs()
+
+
     def init_channel_sets(self):
-        """ Collect and save channel set and label list
+        """ Collect and save channel label list
         """
         clabs = []
-        cset = set()
         if self.dset is not None:
             for c in range(self.dset.num_channels()):
                 clabs.append(azu.channel_1index_label(c+1))
-                cset.add(c)
-        # Save channel list, set
         self.set_field('LIS_CHAN_LABELS', clabs)
-        self.set_field('ACTIVE_CHANNEL_SET', cset)
 
 
-    def init_cell_sets(self):
-        """ Collect and save cell sets
+    def init_selection(self):
+        """ New well / channel selection (all with data active) for dataset
         """
-        cset = set()
+        geom = self.get_geom()
+        anydata = np.zeros(geom.num_wells(), dtype=bool)
+        nchan = 0
         if self.dset is not None:
-            # Index 0 yields all columns, then tranlate cols to cells, to set
-            cset = set(azu.col_to_cell_list(self.get_chan_1index_cols(0)))
-        self.set_field('ACTIVE_CELL_SET', cset)
-        # Any data = copy of current set
-        self.set_field('ANYDATA_CELL_SET', set(cset))
-        # No data = all-96-cells minus any-data
-        self.set_field('NODATA_CELL_SET', set(azu.plate96_cell_list()) - cset)
+            # Plate wells of all columns with well labels
+            plate = self.dset.get_col_meta()['plate']
+            anydata[plate[plate >= 0]] = True
+            nchan = self.dset.num_channels()
+        sel = azsel.PlateSelection(geom, nchan=nchan, anydata=anydata)
+        sel.add_listener(self.cb_selection_change)
+        self.set_field('SELECTION', sel)
+
+
+    def cb_selection_change(self, change):
+        # Selection listener; Quant and window update only what changed
+        self.quant_selection_changed(change)
+        if self.window is not None:
+            self.window.selection_changed(change)
+
+
+    def get_selection(self):
+        """ Current PlateSelection (None before any dataset)
+        """
+        return self.get_field('SELECTION')
 
 
     def get_active_wells(self):
         """ List of active wells; A1, G4
         """
-        return azu.cell_to_well_list(self.get_active_cells())
+        return azu.cell_to_well_list(self.get_active_cells(), geom=self.get_geom())
 
 
     def get_active_cells(self):
         """ List of active cells; (0,0), (5,3)
         """
-        return list(self.get_field('ACTIVE_CELL_SET', []))
+        sel = self.get_selection()
+        return [] if sel is None else sel.active_cells()
 
 
     def get_anydata_cells(self):
-        """ List of no-data cells; (0,0), (5,3)
+        """ List of any-data cells; (0,0), (5,3)
         """
-        return list(self.get_field('ANYDATA_CELL_SET', []))
+        sel = self.get_selection()
+        return [] if sel is None else sel.anydata_cells()
 
 
     def get_active_channels(self):
         """ List of active channel indexes
         """
-        return list(self.get_field('ACTIVE_CHANNEL_SET', []))
+        sel = self.get_selection()
+        return [] if sel is None else sel.active_chans()
 
 
     def get_active_cols(self):
@@ -342,63 +519,285 @@ class AzureIpaApp:
         """
         cols = []
         if self.dset is not None:
-            a_channels = self.get_field('ACTIVE_CHANNEL_SET')
-            a_cells = self.get_field('ACTIVE_CELL_SET')
-            # Get all columns with index 0
-            allcols = self.dset.get_chan_1index_cols(0)
-            #print("+ get_active_cols", allcols)
-            for col in allcols:
-                # Get channel index and cell from col
-                cidx = azu.col_to_chan_index(col)
-                cell = azu.col_to_cell(col)
-                # Keep if index and cell in active sets
-                if (cidx in a_channels) and (cell in a_cells):
-                    cols.append(col)
+            labels = self.dset.get_col_meta()['label']
+            cols = labels[self.get_active_col_pos()].tolist()
         return cols
 
 
+    def get_active_col_pos(self, chans=None):
+        """ Int array of (dataframe) column positions for active channels + cells
+        chans = optional channel (0-based) subset of active channels
+        """
+        sel = self.get_selection()
+        if (self.dset is None) or (sel is None):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(sel.col_mask(self.dset.get_col_meta(), chans=chans))
+
+
     def mod_active_cells(self, alis=None, dlis=None, guiup=False):
-        """ Modify the active cell set
+        """ Modify the active cell selection
         Add cells in alis
         Delete cells in dlis
+        If guiup, listeners (window) are notified
 
         return the number of changes made
         """
-        nmod = 0
-        # Local var pointing to set
-        aset = self.get_field('ACTIVE_CELL_SET', [])
-        # Adding anything?
-        if alis is not None:
-            for cell in alis:
-                if cell not in aset:
-                    aset.add(cell)
-                    nmod += 1
-        # Deleting?
-        if dlis is not None:
-            for cell in dlis:
-                if cell in aset:
-                    aset.remove(cell)
-                    nmod += 1
-        # If any mods and updating gui
-        if (nmod > 0) and guiup:
+        sel = self.get_selection()
+        if sel is None:
+            return 0
+        change = sel.mod_cells(alis, dlis, notify=guiup)
+        return len(change.wells_changed())
+
+
+    def init_derived(self):
+        """ Register lazily computed (and cached) data frames derived from DF_RAW
+        Chain is DF_RAW > DF_COMP (crosstalk compensated) > DF_NORM (passive reference
+        normalized); Everything else works off DF_NORM
+        """
+        der = self.derived
+        der.clear()
+        der.max_mb = self.get_setting('DERIVED_MAX_MB', 200)
+        der.set_root('DF_RAW', None)
+        # Compensation mixes channels of a well, so not column-wise; One matrix multiply
+        der.set_root('COMP_GROUPS', [])
+        meta = self.dset.get_col_meta()
+        nwell = len(self.dset.wells)
+        der.register('DF_COMP', lambda df, groups: azcomp.df_compensate(df, meta, nwell, groups),
+                     deps=('DF_RAW', 'COMP_GROUPS'))
+        # Reference col position per col (-1 = none); Also needs other channels' cols
+        der.set_root('NORM_REFPOS', np.full(len(meta['chan']), -1, dtype=np.int64))
+        der.register('DF_NORM', lambda df, refpos: azcomp.df_normalize(df, refpos, meta['chan']),
+                     deps=('DF_COMP', 'NORM_REFPOS'))
+        # DF_BLCOR registered by init_baselines()
+        der.register('DF_1ST_DERIV', azdf.df_1st_deriv, deps=('DF_NORM',), colwise=True)
+        der.register('DF_2ND_DERIV', azdf.df_2nd_deriv, deps=('DF_NORM',), colwise=True)
+        # Savitzky-Golay smoothed derivatives
+        win, order = self.get_sdm_params()
+        der.register('DF_SG_1ST_DERIV', lambda df: azdf.df_savgol_deriv(df, win, order, deriv=1),
+                     deps=('DF_NORM',), colwise=True)
+        der.register('DF_SG_2ND_DERIV', lambda df: azdf.df_savgol_deriv(df, win, order, deriv=2),
+                     deps=('DF_NORM',), colwise=True)
+        # Melt curve -dF/dT
+        mwin = int(self.get_setting('MELT_SG_WINDOW', 7))
+        morder = int(self.get_setting('MELT_SG_ORDER', 4))
+        der.register('DF_MELT_DERIV', lambda df: azdf.df_melt_deriv(df, mwin, morder),
+                     deps=('DF_NORM',), colwise=True)
+
+
+    def init_comp(self):
+        """ Set crosstalk compensation groups (root COMP_GROUPS) for dataset channels
+        Matrix (field XTALK) is per instrument, so kept across datasets; Loaded from
+        COMP_MATRIX_FILE if not set yet
+        """
+        xtalk = self.get_field('XTALK')
+        fname = self.get_setting('COMP_MATRIX_FILE', '')
+        if (xtalk is None) and fname:
+            try:
+                xtalk = azcomp.crosstalk_from_csv(os.path.expanduser(fname))
+            except (OSError, ValueError) as e:
+                print("Crosstalk matrix load failed for {}: {}".format(fname, e))
+            self.set_field('XTALK', xtalk)
+        self.set_field('COMP_GROUPS', azcomp.comp_groups(self.dset.channel_list(), xtalk))
+
+
+    def set_crosstalk(self, xtalk, guiup=False):
+        """ Set crosstalk matrix (azcomp.CrosstalkMatrix; None = no compensation)
+        Only derived frames downstream of DF_COMP are dropped; Dataset fields are redone
+        """
+        self.set_field('XTALK', xtalk)
+        if self.dset is None:
+            return
+        self.set_field('COMP_GROUPS', azcomp.comp_groups(self.dset.channel_list(), xtalk))
+        self.signal_changed()
+        if guiup and (self.window is not None):
+            self.window_init_dset(setdefs=False)
+            self.window_update()
+
+
+    def init_norm(self):
+        """ Mark passive reference channel (NORM_REF_CHANNEL instrument channel number,
+        0 = none) in dataset channel metadata; Other channels of the same step are
+        divided by it. Sets root NORM_REFPOS for DF_NORM
+        """
+        refs = azcomp.norm_ref_list(self.dset.channel_list(), int(self.get_setting('NORM_REF_CHANNEL', 0)))
+        self.dset.set_norm_refs(refs)
+        self.set_field('NORM_REFPOS', self.dset.get_norm_ref_pos())
+
+
+    def set_norm_ref(self, ref_num, guiup=False):
+        """ Set passive reference channel (instrument channel number; 0 = no normalization)
+        Only derived frames downstream of DF_NORM are dropped (compensated data is kept);
+        Dataset fields are redone
+        """
+        self.set_setting('NORM_REF_CHANNEL', int(ref_num))
+        if self.dset is None:
+            return
+        self.init_norm()
+        self.signal_changed()
+        if guiup and (self.window is not None):
+            self.window_init_dset(setdefs=False)
             self.window_update()
-        return nmod
+
+
+    def signal_changed(self):
+        """ Corrected signal (DF_COMP, DF_NORM) changed; Redo dataset fields made from it
+        """
+        self.init_minmaxthresh()
+        self.init_cq2nds()
+        self.init_cqts()
+        self.init_effs()
+        self.init_fits()
+        self.init_melt()
+
+
+    def load_crosstalk(self, fname, popup=True):
+        """ Load crosstalk matrix csv (see azcomp.crosstalk_from_df) and compensate with it
+        File is kept as COMP_MATRIX_FILE setting. If popup is true, feedback via GUI popup
+        """
+        ok = False
+        try:
+            xtalk = azcomp.crosstalk_from_csv(fname)
+            self.set_setting('COMP_MATRIX_FILE', fname)
+            self.set_crosstalk(xtalk, guiup=popup)
+            ok = True
+        except (OSError, ValueError) as e:
+            message = "Failed to load crosstalk matrix from {}\n{}: {}".format(fname, type(e).__name__, e)
+        if ok:
+            ngroup = len(self.get_field('COMP_GROUPS', []))
+            message = "Loaded {} channel crosstalk matrix from {}\n{} channel group(s) compensated".format(
+                      xtalk.num_channels(), fname, ngroup)
+        if popup:
+            self.popup_message(message)
+        return ok
+
+
+    def estimate_crosstalk(self, path, popup=True):
+        """ Estimate crosstalk matrix from single-dye calibration plates; All data
+        files in directory (or glob) path, one dye each (channel with most signal)
+        Baseline window rows from BASELINE_START, BASELINE_STOP
+        Matrix is used right away, but only kept (COMP_MATRIX_FILE) once saved
+        If popup is true, feedback via GUI popup
+        """
+        bload = azbatch.batch_load(path, cachedir=self.get_setting('CACHE_DIR'),
+                                   max_mb=self.get_setting('CACHE_MAX_MB', 500))
+        plates = [(dset.channel_list(), dset.arr, None) for dset in bload.dsets.values()]
+        xtalk = None
+        if plates:
+            blpar = self.get_baseline_params()
+            try:
+                xtalk = azcomp.estimate_crosstalk(plates, start=blpar['start'], stop=blpar['stop'])
+            except ValueError as e:
+                message = "Failed to estimate crosstalk from {}\n{}: {}".format(path, type(e).__name__, e)
+        else:
+            message = "No calibration plates loaded from {}".format(path)
+        if xtalk is not None:
+            self.set_crosstalk(xtalk, guiup=popup)
+            message = "Estimated {} channel crosstalk matrix from {} plate(s)\n{}".format(
+                      xtalk.num_channels(), len(plates), xtalk.to_df().to_string(float_format='{:.4f}'.format))
+        if popup:
+            self.popup_message(message)
+        return xtalk
+
+
+    def save_crosstalk(self, fname, popup=True):
+        """ Save crosstalk matrix as csv; Becomes COMP_MATRIX_FILE setting
+        If popup is true, feedback via GUI popup
+        """
+        ok = False
+        xtalk = self.get_field('XTALK')
+        if xtalk is not None:
+            try:
+                xtalk.to_df().to_csv(fname, float_format='%.6g')
+                self.set_setting('COMP_MATRIX_FILE', fname)
+                ok = True
+            except OSError:
+                ok = False
+        if popup:
+            if ok:
+                message = "Saved crosstalk matrix to {}".format(fname)
+            else:
+                message = "Failed to save crosstalk matrix to {}".format(fname)
+            self.popup_message(message)
+        return ok
+
+
+    def get_sdm_params(self):
+        """ Savitzky-Golay (window, polynomial order) for smoothed derivatives / Cq2d
+        """
+        return (int(self.get_setting('SDM_SG_WINDOW', 9)), int(self.get_setting('SDM_SG_ORDER', 4)))
+
+
+    def get_baseline_params(self):
+        """ Baseline correction settings; Dict with method ('fit' or 'first') and
+        fit order, start, stop (rows), auto, gap, min_rows
+        """
+        return {
+            'method': self.get_setting('BASELINE_METHOD', 'fit'),
+            'order': int(self.get_setting('BASELINE_ORDER', 1)),
+            'start': int(self.get_setting('BASELINE_START', 2)),
+            'stop': int(self.get_setting('BASELINE_STOP', 15)),
+            'auto': bool(self.get_setting('BASELINE_AUTO', True)),
+            'gap': int(self.get_setting('BASELINE_AUTO_GAP', 6)),
+            'min_rows': int(self.get_setting('BASELINE_MIN_ROWS', 5)),
+        }
+
+
+    def get_baseline_func(self):
+        """ Baseline correction (data frame to data frame) per current settings
+        Fitted baselines (all wells at once) or shift to first element
+        """
+        bpars = self.get_baseline_params()
+        if bpars['method'] == 'first':
+            return azdf.df_baseline_first
+        # Auto window ends where each curve takes off
+        stop = None if bpars['auto'] else bpars['stop']
+        def func(df):
+            return azdf.df_baseline_fit(df, start=bpars['start'], stop=stop, order=bpars['order'],
+                                        auto=bpars['auto'], gap=bpars['gap'], min_rows=bpars['min_rows'])
+        return func
 
 
     def init_baselines(self):
+        """ Register baseline corrected df (DF_BLCOR) per current settings; Computed on first use
+        """
         if DEBUG: print(">> init_baselines")
-        if self.dset is not None:
-            #print("+ init_baselines not None")
-            # TODO; Simple shift to first element
-            df = self.dset.df
-            bcdf = df - df.iloc[0].values.squeeze()
-            self.set_field('DF_BLCOR', bcdf)
+        self.derived.register('DF_BLCOR', self.get_baseline_func(), deps=('DF_NORM',), colwise=True)
         if DEBUG: print("<< init_baselines")
 
 
+    def baseline_fixed_at(self, nrow):
+        """ True if baseline corrected values of the first nrow rows don't change as rows
+        are appended; Never with reference normalization (its level and usable wells
+        come from all rows)
+        """
+        refpos = self.get_field('NORM_REFPOS')
+        if (refpos is not None) and (refpos >= 0).any():
+            return False
+        bpars = self.get_baseline_params()
+        if bpars['method'] == 'first':
+            return True
+        if bpars['auto']:
+            return False
+        return (nrow >= bpars['stop']) and (nrow - bpars['min_rows'] >= bpars['start'])
+
+
+    def get_chan_minmax(self, df):
+        """ Per-channel lists of min and max values in df (dataset cols)
+        """
+        vals = df.to_numpy()
+        min_vals = []
+        max_vals = []
+        for i in range(self.dset.num_channels()):
+            dvals = vals[:, self.dset.get_col_pos(chans=[i])]
+            min_vals.append(dvals.min())
+            max_vals.append(dvals.max())
+        return min_vals, max_vals
+
+
     def init_minmaxthresh(self):
-        """ Calculate and save default thresholds as fraction of max-min range
-        Save min, max, thresh for channel
+        """ Calculate and save default thresholds; Save min, max, thresh for channel
+        THRESH_METHOD 'auto' = from baseline noise and log-linear region (see
+        auto_chan_thresh), else (or for melt data) fraction DEF_THRESH_FRAC of max-min range
         """
         min_vals = []
         max_vals = []
@@ -406,78 +805,559 @@ class AzureIpaApp:
         if self.dset is not None:
             # Baseline corrected df
             df = self.get_field('DF_BLCOR')
-            # Fraction (of range) for default threholds
-            frac = self.get_setting('DEF_THRESH_FRAC', 0.5)
-            # Each channel
-            for i in range(self.dset.num_channels()):
-                cols = self.dset.get_chan_1index_cols(i+1)
-                dfs = azdf.df_col_slice(df, cols)
-                min_v = dfs.values.min()
-                max_v = dfs.values.max()
-                th_v = min_v + frac * (max_v - min_v)
-                min_vals.append(min_v)
-                max_vals.append(max_v)
-                th_vals.append(th_v)
+            min_vals, max_vals = self.get_chan_minmax(df)
+            # Melt curves have no amplification to find threshold from
+            if (self.get_setting('THRESH_METHOD', 'auto') == 'auto') and not self.dset.is_melt():
+                th_vals = self.auto_chan_thresh(df, min_vals, max_vals)
+            else:
+                # Fraction (of range) for default threholds
+                frac = self.get_setting('DEF_THRESH_FRAC', 0.5)
+                th_vals = [min_v + frac * (max_v - min_v) for min_v, max_v in zip(min_vals, max_vals)]
         # Keep lists in field collection
         self.set_field('LIS_CHAN_MINS', min_vals)
         self.set_field('LIS_CHAN_MAXS', max_vals)
         self.set_field('LIS_CHAN_THRESH', th_vals)
 
 
-    def init_cq2nds(self):
+    def auto_chan_thresh(self, df, min_vals, max_vals):
+        """ List of per-channel thresholds for baseline corrected df; See azcalc.auto_thresholds
+        Noise from baseline window rows; Floor is AUTO_THRESH_NOISE_MULT x noise.
+        Channels with no floor (e.g. no rows) fall back to DEF_THRESH_FRAC of range
+        """
+        threshs, _, _ = self.get_auto_thresholds(df.to_numpy())
+        frac = self.get_setting('DEF_THRESH_FRAC', 0.5)
+        return [float(th) if th > 0 else min_v + frac * (max_v - min_v)
+                for th, min_v, max_v in zip(threshs, min_vals, max_vals)]
+
+
+    def get_auto_thresholds(self, vals):
+        """ azcalc.auto_thresholds (thresholds, floors, ceilings) for baseline corrected values
+        """
+        win, order = self.get_sdm_params()
+        sdm = azcalc.sdm_cq(self.get_field('DF_NORM').to_numpy(dtype=np.float64), win, order)
+        blpar = self.get_baseline_params()
+        return azcalc.auto_thresholds(vals, self.dset.get_col_meta()['chan'], self.dset.num_channels(), sdm,
+                                      start=blpar['start'], stop=blpar['stop'],
+                                      mult=self.get_setting('AUTO_THRESH_NOISE_MULT', 10.0),
+                                      top_pct=self.get_setting('AUTO_THRESH_TOP_PCT', 10.0))
+
+
+    def init_cq2nds(self, default=100):
         """ Get per-col (well+channel) dict of 2'nd derivative max Cq numbers
+        Smoothed (Savitzky-Golay) second derivative, peak interpolated between
+        cycles, so values are fractional (index units)
         Sets dict field
         """
-        th_vals = {}
+        cqs = {}
         if self.dset is not None:
-            cqs = {}
-            df = self.get_field('DF_2ND_DERIV')
-            #print("+ init_cq2nd_sham", df.shape)
-            for col in df.columns:
-                v = df[col].idxmax()
-                cqs[col] = v
+            # Straight off (compensated, normalized) raw array; DF_SG_2ND_DERIV frame is only made if viewed
+            df = self.get_field('DF_NORM')
+            if len(df) > 0:
+                win, order = self.get_sdm_params()
+                pos = azcalc.sdm_cq(df.to_numpy(dtype=np.float64), win, order)
+                cq2s = azcalc.index_at_pos(df.index, pos)
+                cqs = dict(zip(df.columns, np.where(np.isnan(pos), default, cq2s).tolist()))
         self.set_field('DIC_COL_CQ2ND', cqs)
 
 
+    def init_effs(self):
+        """ Get per-col amplification efficiency from log-linear window (LinRegPCR style)
+        Window of EFF_WINDOW_ROWS rows in baseline corrected data, above noise
+        and ending by the (smoothed) second derivative max; See azcalc.loglin_efficiency
+        Sets dict fields DIC_COL_EFF (efficiency; 2 = doubling per cycle),
+        DIC_COL_EFFR2 (R^2) and DIC_COL_EFFWIN ((first, last) index of window)
+        NaN (and (None, None) window) where no window qualifies; Empty for melt data
+        """
+        effs = {}
+        r2s = {}
+        wins = {}
+        if (self.dset is not None) and not self.dset.is_melt():
+            df = self.get_field('DF_BLCOR')
+            raw = self.get_field('DF_NORM').to_numpy(dtype=np.float64)
+            win, order = self.get_sdm_params()
+            stop = np.floor(azcalc.sdm_cq(raw, win, order)) + 1
+            floor = self.get_setting('EFF_NOISE_MULT', 3.0) * azcalc.noise_sd(raw)
+            eff, r2, first, last = azcalc.loglin_efficiency(df.to_numpy(), int(self.get_setting('EFF_WINDOW_ROWS', 5)),
+                                                            stop=stop, floor=floor,
+                                                            min_r2=self.get_setting('EFF_MIN_R2', 0.98))
+            index = df.index.tolist()
+            effs = dict(zip(df.columns, eff.tolist()))
+            r2s = dict(zip(df.columns, r2.tolist()))
+            wins = {c: (index[i], index[j]) if i >= 0 else (None, None)
+                    for c, i, j in zip(df.columns, first.tolist(), last.tolist())}
+        self.set_field('DIC_COL_EFF', effs)
+        self.set_field('DIC_COL_EFFR2', r2s)
+        self.set_field('DIC_COL_EFFWIN', wins)
+
+
+    def set_chan_thresh(self, idx, thresh, guiup=False):
+        """ Set threshold for (0-based) channel idx, then update only its Cq values
+        """
+        self.get_field('LIS_CHAN_THRESH')[idx] = float(thresh)
+        self.update_chan_cqts(idx)
+        if guiup and (self.window is not None):
+            self.window.thresh_changed(idx)
+
+
+    def update_chan_cqts(self, idx, default=100):
+        """ Recompute threshold Cq dict entries for columns of (0-based) channel idx
+        """
+        if self.dset is None:
+            return
+        cqs = self.get_field('DIC_COL_CQT')
+        th = self.get_field('LIS_CHAN_THRESH')[idx]
+        cqv = self.get_chan_cross_index(idx).query(th, default=default)
+        labels = self.dset.get_col_meta()['label']
+        cqs.update(zip(labels[self.dset.get_col_pos(chans=[idx])].tolist(), cqv.tolist()))
+        self.update_quant_cqs()
+
+
+    def get_chan_cross_index(self, idx):
+        """ Threshold crossing index (azcalc.ThreshCrossIndex) for channel, from DF_BLCOR
+        Built on first use; Dropped (see init_cqts) when DF_BLCOR changes
+        """
+        indices = self.get_field('DIC_CHAN_CROSSIDX')
+        if indices is None:
+            indices = {}
+            self.set_field('DIC_CHAN_CROSSIDX', indices)
+        if idx not in indices:
+            df = self.get_field('DF_BLCOR')
+            indices[idx] = azcalc.ThreshCrossIndex(df.to_numpy()[:, self.dset.get_col_pos(chans=[idx])])
+        return indices[idx]
+
+
+    def sweep_thresholds(self, chans=None, threshs=None, default=100):
+        """ Threshold sensitivity sweep on baseline corrected data
+
+        chans = channel (0-based) indices; None = all
+        threshs = dict of channel >--> threshold vector; Channels not in it get
+            SWEEP_NUM_THRESH thresholds spanning the channel min - max range
+
+        Returns (and saves as field) dict of channel >--> (thresholds, Cq matrix)
+        Cq matrix is (thresholds x channel cols), cols as dset.get_col_pos(chans=[chan])
+        """
+        sweeps = {}
+        if self.dset is not None:
+            if chans is None:
+                chans = range(self.dset.num_channels())
+            if threshs is None:
+                threshs = {}
+            nth = self.get_setting('SWEEP_NUM_THRESH', 200)
+            vals = self.get_field('DF_BLCOR').to_numpy()
+            min_vals = self.get_field('LIS_CHAN_MINS')
+            max_vals = self.get_field('LIS_CHAN_MAXS')
+            for idx in chans:
+                ths = threshs.get(idx)
+                if ths is None:
+                    ths = np.linspace(min_vals[idx], max_vals[idx], nth)
+                ths = np.asarray(ths, dtype=np.float64)
+                cvals = vals[:, self.dset.get_col_pos(chans=[idx])]
+                sweeps[idx] = (ths, azcalc.thresh_sweep_cq(cvals, ths, default=default))
+        self.set_field('DIC_CHAN_SWEEP', sweeps)
+        return sweeps
+
+
+    def get_thresh_sweep(self):
+        """ Threshold sweep dict (see sweep_thresholds); Default sweep made if needed
+        """
+        sweeps = self.get_field('DIC_CHAN_SWEEP')
+        if sweeps is None:
+            sweeps = self.sweep_thresholds()
+        return sweeps
+
+
+    def optimize_thresholds(self, chans=None, objective=None, apply=True, guiup=True):
+        """ Search per-channel threshold giving most consistent Cqs; Needs plate layout
+
+        objective = 'replicate' (min pooled replicate Cq sd), 'stdcurve' (max mean standard
+            curve R^2) or 'auto' (stdcurve if layout has standards); None = THRESH_OPT_OBJECTIVE
+        Candidates are THRESH_OPT_NUM thresholds, log spaced from the channel noise floor
+        (see get_auto_thresholds) to 90th percentile of col maxima; All Cqs for a channel
+        in one batched pass (azcalc.thresh_sweep_cq). Only thresholds where at least
+        THRESH_OPT_MIN_FRAC of the most determined Cqs are determined can win
+        If apply, best thresholds are set (set_chan_thresh; sliders and plots if guiup)
+
+        Returns (and saves as field) dict of channel >--> (thresholds, objective,
+            determined counts, best index, objective name); Best index -1 = none usable
+        """
+        opts = {}
+        eng = self.get_field('QUANT_ENGINE')
+        if (self.dset is None) or (eng is None):
+            self.set_field('DIC_CHAN_THRESH_OPT', opts)
+            return opts
+        if objective is None:
+            objective = self.get_setting('THRESH_OPT_OBJECTIVE', 'auto')
+        if objective == 'auto':
+            objective = 'stdcurve' if eng.std.any() else 'replicate'
+        if chans is None:
+            chans = range(self.dset.num_channels())
+        nth = self.get_setting('THRESH_OPT_NUM', 100)
+        min_frac = self.get_setting('THRESH_OPT_MIN_FRAC', 0.9)
+        vals = self.get_field('DF_BLCOR').to_numpy()
+        _, floors, _ = self.get_auto_thresholds(vals)
+        max_vals = self.get_field('LIS_CHAN_MAXS')
+        for idx in chans:
+            pos = self.dset.get_col_pos(chans=[idx])
+            cvals = vals[:, pos]
+            hi = np.nanpercentile(np.nanmax(cvals, axis=0), 90) if len(pos) else np.nan
+            lo = floors[idx]
+            if not (lo > 0) or not (hi > lo):
+                lo, hi = max_vals[idx] * 1e-3, max_vals[idx]
+            if not (lo > 0) or not (hi > lo):
+                continue
+            ths = np.geomspace(lo, hi, nth)
+            cqm = azcalc.thresh_sweep_cq(cvals, ths, default=eng.default)
+            if objective == 'stdcurve':
+                obj, ndet = azquant.std_curve_r2_objective(eng, pos, cqm,
+                                                           per_plate=self.get_setting('STDCURVE_PER_PLATE', False))
+                best = azquant.best_thresh_index(obj, ndet, maximize=True, min_frac=min_frac)
+            else:
+                obj, ndet = azquant.replicate_sd_objective(eng, pos, cqm)
+                best = azquant.best_thresh_index(obj, ndet, maximize=False, min_frac=min_frac)
+            opts[idx] = (ths, obj, ndet, best, objective)
+        self.set_field('DIC_CHAN_THRESH_OPT', opts)
+        if apply:
+            for idx, (ths, _, _, best, _) in opts.items():
+                if best >= 0:
+                    self.set_chan_thresh(idx, ths[best], guiup=guiup)
+        return opts
+
+
+    def save_thresh_sweep(self, fname, popup=True):
+        """ Save threshold sweep Cq matrix as csv; Rows channel + threshold, cols wells
+        If popup is true, feedback via GUI popup
+        """
+        ok = False
+        if self.dset is not None:
+            df = azdf.thresh_sweep_df(self.dset, self.get_thresh_sweep())
+            try:
+                df.to_csv(fname, float_format='%.4f', na_rep='NaN')
+                ok = True
+            except OSError:
+                ok = False
+        if popup:
+            if ok:
+                message = "Saved threshold sweep to {}".format(fname)
+            else:
+                message = "Failed to save threshold sweep to {}".format(fname)
+            self.popup_message(message)
+        return ok
+
+
+    def init_fits(self):
+        """ Clear curve fit fields; Fits are only made on request (fit_curves)
+        """
+        self.set_field('FIT_RESULT', None)
+        self.set_field('DIC_COL_CQFIT', {})
+        self.set_field('DIC_COL_FITPAR', {})
+
+
+    def fit_curves(self, model=None, default=100):
+        """ Fit sigmoid model (FIT_MODEL setting if None) to raw data of all cols
+
+        Sets fields FIT_RESULT (azfit.FitResult, cols in dataset order), plus
+        per-col dicts DIC_COL_CQFIT (second derivative max of fit; default
+        if flat or failed) and DIC_COL_FITPAR (params and fit metrics)
+
+        Returns FitResult
+        """
+        if self.dset is None:
+            self.init_fits()
+            return None
+        if model is None:
+            model = self.get_setting('FIT_MODEL', '4PL')
+        nproc = int(self.get_setting('FIT_NPROC', 0)) or None
+        df = self.get_field('DF_NORM')
+        # Rise too small for channel (vs. its range) counts as flat
+        spans = np.asarray(self.get_field('LIS_CHAN_MAXS')) - np.asarray(self.get_field('LIS_CHAN_MINS'))
+        min_fmax = self.get_setting('FIT_MIN_FRAC', 0.05) * spans[self.dset.get_col_meta()['chan']]
+        fres = azfit.fit_curves(df.to_numpy(dtype=np.float64), df.index.to_numpy(dtype=np.float64),
+                                model=model, nproc=nproc, max_iter=int(self.get_setting('FIT_MAX_ITER', 100)),
+                                flat_snr=self.get_setting('FIT_FLAT_SNR', 10.0), min_fmax=min_fmax)
+        cols = df.columns
+        self.set_field('FIT_RESULT', fres)
+        self.set_field('DIC_COL_CQFIT', dict(zip(cols, fres.cq_sdm(default=default).tolist())))
+        self.set_field('DIC_COL_FITPAR', {c: fres.col_dict(j) for j, c in enumerate(cols)})
+        return fres
+
+
+    def get_fit_result(self):
+        """ Curve fits (see fit_curves); Made if needed
+        """
+        fres = self.get_field('FIT_RESULT')
+        if fres is None:
+            fres = self.fit_curves()
+        return fres
+
+
+    def save_curve_fits(self, fname, popup=True):
+        """ Save curve fit params and metrics as csv; One row per col (well + channel)
+        If popup is true, feedback via GUI popup
+        """
+        ok = False
+        if self.dset is not None:
+            df = azdf.curve_fit_df(self.dset, self.get_fit_result(), self.get_field('DIC_COL_CQFIT'))
+            try:
+                df.to_csv(fname, float_format='%.5g', na_rep='NaN')
+                ok = True
+            except OSError:
+                ok = False
+        if popup:
+            if ok:
+                message = "Saved curve fits to {}".format(fname)
+            else:
+                message = "Failed to save curve fits to {}".format(fname)
+            self.popup_message(message)
+        return ok
+
+
+    def init_melt(self):
+        """ Melt (Tm) peaks of all cols, for melt curve datasets; Else cleared
+        Sets per-col dicts DIC_COL_TM (primary Tm; NaN if no peak) and
+        DIC_COL_MELTPK (list of (tm, height, width) per peak, primary first)
+        """
+        tms = {}
+        peaks = {}
+        if (self.dset is not None) and self.dset.is_melt():
+            df = self.get_field('DF_MELT_DERIV')
+            dvals = df.to_numpy()
+            temps = df.index.to_numpy(dtype=np.float64)
+            npeak = int(self.get_setting('MELT_NUM_PEAKS', 2))
+            # (peaks, tm / height / width, cols); Each channel on its own (height scale)
+            parr = np.full((npeak, 3, dvals.shape[1]), np.nan)
+            for i in range(self.dset.num_channels()):
+                pos = self.dset.get_col_pos(chans=[i])
+                pks = azcalc.melt_peaks(dvals[:, pos], temps, npeak=npeak,
+                                        min_sep=self.get_setting('MELT_PEAK_MIN_SEP', 2.0),
+                                        min_frac=self.get_setting('MELT_PEAK_MIN_FRAC', 0.1))
+                parr[:, :, pos] = np.array([np.vstack(pk) for pk in pks])
+            tms = dict(zip(df.columns, parr[0, 0].tolist()))
+            peaks = {c: [tuple(pk) for pk in parr[:, :, j].tolist()] for j, c in enumerate(df.columns)}
+        self.set_field('DIC_COL_TM', tms)
+        self.set_field('DIC_COL_MELTPK', peaks)
+
+
+    def load_plate_layout(self, fname, popup=True):
+        """ Load plate layout (sample, target per well) csv for relative quantification
+        See azquant.layout_from_csv; If popup is true, feedback via GUI popup
+        """
+        ok = False
+        try:
+            layout = azquant.layout_from_csv(fname)
+            self.set_field('QUANT_LAYOUT', layout)
+            self.init_quant()
+            ok = True
+        except (OSError, ValueError) as e:
+            message = "Failed to load plate layout from {}\n{}: {}".format(fname, type(e).__name__, e)
+        if ok:
+            eng = self.get_field('QUANT_ENGINE')
+            nmatch = 0 if eng is None else eng.num_entries()
+            message = "Loaded plate layout from {}\n{} rows ({} standards); {} samples, {} targets; {} data cols matched".format(
+                      fname, layout.num_entries(), layout.num_standards(), len(layout.sample_list()),
+                      len(layout.target_list()), nmatch)
+        if popup:
+            self.popup_message(message)
+        return ok
+
+
+    def init_quant(self):
+        """ Set up relative quantification (delta delta Cq) for plate layout and dataset
+        Sets field QUANT_ENGINE (azquant.QuantEngine; None if no layout or data)
+        Settings give reference targets, calibrator sample and amplification efficiency
+        Wells not in selection are excluded if QUANT_USE_SELECTION
+        """
+        eng = None
+        layout = self.get_field('QUANT_LAYOUT')
+        if (layout is not None) and (self.dset is not None):
+            eng = azquant.quant_engine(layout, self.get_quant_plates(),
+                                       refs=azquant.ref_target_list(self.get_setting('QUANT_REF_TARGETS', '')),
+                                       calibrator=self.get_setting('QUANT_CALIBRATOR', ''),
+                                       eff=self.get_setting('QUANT_EFF', 2.0))
+            sel = self.get_selection()
+            if (sel is not None) and self.get_setting('QUANT_USE_SELECTION', True):
+                eng.set_excluded(self.quant_cell_mask(eng, sel.index_cells(np.flatnonzero(sel.anydata & ~sel.wells))))
+        self.set_field('QUANT_ENGINE', eng)
+
+
+    def get_quant_plates(self):
+        """ Quant engine plates; List of (file name, col labels, Cq array)
+        Current dataset first (engine src below its col count), then the other
+        plates of the batch it was loaded with (see handle_load_batch), if any
+        """
+        plates = [(self.dset.fname, self.dset.get_col_meta()['label'], self.get_cqt_array())]
+        dsets = list((self.get_field('DIC_BATCH_DSETS') or {}).values())
+        if any(dset is self.dset for dset in dsets):
+            for dset in dsets:
+                if dset is not self.dset:
+                    plates.append((dset.fname, dset.get_col_meta()['label'], self.get_batch_cqt_array(dset)))
+        return plates
+
+
+    def quant_cell_mask(self, eng, clis):
+        """ Quant engine entry mask for (row, col) cells of current dataset only
+        """
+        return eng.cell_mask(clis) & (eng.src < len(self.dset.get_col_meta()['label']))
+
+
+    def get_batch_blcor(self, dset):
+        """ Baseline corrected values of batch-loaded dataset, in its column order
+        Same crosstalk compensation, reference normalization and baseline settings as
+        current dataset; Kept (field DIC_BATCH_BLCOR) until those change
+        """
+        xtalk = self.get_field('XTALK')
+        ref_num = int(self.get_setting('NORM_REF_CHANNEL', 0))
+        key = (xtalk, ref_num, tuple(sorted(self.get_baseline_params().items())))
+        cache = self.get_field('DIC_BATCH_BLCOR')
+        if cache is None:
+            cache = {}
+            self.set_field('DIC_BATCH_BLCOR', cache)
+        if (dset.fname in cache) and (cache[dset.fname][0] == key):
+            return cache[dset.fname][1]
+        meta = dset.get_col_meta()
+        groups = azcomp.comp_groups(dset.channel_list(), xtalk)
+        df = azcomp.df_compensate(dset.df, meta, len(dset.wells), groups)
+        dset.set_norm_refs(azcomp.norm_ref_list(dset.channel_list(), ref_num))
+        df = azcomp.df_normalize(df, dset.get_norm_ref_pos(), meta['chan'])
+        vals = self.get_baseline_func()(df).to_numpy(dtype=np.float64)
+        cache[dset.fname] = (key, vals)
+        return vals
+
+
+    def get_batch_cqt_array(self, dset, default=100):
+        """ Threshold Cqs of batch-loaded dataset, in its column order
+        Channels use the current dataset's threshold for the same channel label, so
+        plates are compared at one threshold; Others DEF_THRESH_FRAC of their range
+        """
+        vals = self.get_batch_blcor(dset)
+        chan = dset.get_col_meta()['chan']
+        thresh = dict(zip(self.dset.channel_list(), self.get_field('LIS_CHAN_THRESH')))
+        frac = self.get_setting('DEF_THRESH_FRAC', 0.5)
+        th_vals = []
+        for i, name in enumerate(dset.channel_list()):
+            cvals = vals[:, chan == i]
+            if name in thresh:
+                th_vals.append(thresh[name])
+            elif cvals.size:
+                th_vals.append(np.nanmin(cvals) + frac * (np.nanmax(cvals) - np.nanmin(cvals)))
+            else:
+                th_vals.append(np.nan)
+        return azcalc.thresh_cross_pos(vals, np.asarray(th_vals, dtype=np.float64)[chan], default=default)
+
+
+    def get_cqt_array(self):
+        """ Threshold Cqs as array, in dataset column order
+        """
+        cqs = self.get_field('DIC_COL_CQT')
+        labels = self.dset.get_col_meta()['label']
+        return np.array([cqs[c] for c in labels], dtype=np.float64)
+
+
+    def update_quant_cqs(self):
+        # Threshold Cqs changed; Regroup (one bincount pass)
+        eng = self.get_field('QUANT_ENGINE')
+        if eng is not None:
+            eng.set_cqs(np.concatenate([cqs for _, _, cqs in self.get_quant_plates()]))
+
+
+    def quant_selection_changed(self, change):
+        """ Selection listener part; Wells turned off / on are excluded / restored
+        Only sums of the replicate groups involved are updated
+        """
+        eng = self.get_field('QUANT_ENGINE')
+        if (eng is None) or not self.get_setting('QUANT_USE_SELECTION', True):
+            return
+        sel = self.get_selection()
+        if len(change.wells_off):
+            eng.set_excluded(self.quant_cell_mask(eng, sel.index_cells(change.wells_off)))
+        if len(change.wells_on):
+            eng.set_excluded(self.quant_cell_mask(eng, sel.index_cells(change.wells_on)), exclude=False)
+
+
+    def get_quant_result(self):
+        """ Relative quantification result (azquant.QuantResult); None if no layout
+        """
+        eng = self.get_field('QUANT_ENGINE')
+        return None if eng is None else eng.get_result()
+
+
+    def get_std_curves(self):
+        """ Standard curves and back-calculated quantities (azquant.StdCurveResult)
+        None if no layout; Curves per target, or per plate + target if STDCURVE_PER_PLATE
+        """
+        eng = self.get_field('QUANT_ENGINE')
+        if eng is None:
+            return None
+        return eng.get_std_curves(per_plate=self.get_setting('STDCURVE_PER_PLATE', False),
+                                  lod_frac=self.get_setting('STDCURVE_LOD_FRAC', 0.95))
+
+
+    def save_std_curve(self, fname, popup=True):
+        """ Save back-calculated quantities as csv; One row per layout-matched col,
+        with the curve used for it
+        If popup is true, feedback via GUI popup
+        """
+        ok = False
+        curves = self.get_std_curves()
+        if curves is not None:
+            df = azquant.std_curve_entry_df(self.get_field('QUANT_ENGINE'), curves)
+            try:
+                df.to_csv(fname, index=False, float_format='%.5g', na_rep='NaN')
+                ok = True
+            except OSError:
+                ok = False
+        if popup:
+            if ok:
+                message = "Saved standard curve quantities to {}".format(fname)
+            else:
+                message = "Failed to save standard curve quantities to {}".format(fname)
+            self.popup_message(message)
+        return ok
+
+
+    def save_quant(self, fname, popup=True):
+        """ Save relative quantification table as csv; One row per sample + target
+        If popup is true, feedback via GUI popup
+        """
+        ok = False
+        qres = self.get_quant_result()
+        if qres is not None:
+            try:
+                qres.to_df().to_csv(fname, index=False, float_format='%.5g', na_rep='NaN')
+                ok = True
+            except OSError:
+                ok = False
+        if popup:
+            if ok:
+                message = "Saved quantification to {}".format(fname)
+            else:
+                message = "Failed to save quantification to {}".format(fname)
+            self.popup_message(message)
+        return ok
+
+
     def init_cqts(self, default=100):
         """ Get per-col dict of Cq values, using per-channel thresholds
         Sets dict field
         """
         if DEBUG: print(">> init_cqts")
+        # Baseline corrected data may be new; Crossing indices and sweep rebuilt on demand
+        self.set_field('DIC_CHAN_CROSSIDX', None)
+        self.set_field('DIC_CHAN_SWEEP', None)
+        self.set_field('DIC_CHAN_THRESH_OPT', None)
         cqs = {}
         if self.dset is not None:
             #print(">> init_cqts")
             thresh = self.get_field('LIS_CHAN_THRESH')
-            #print(type(thresh))
             df = self.get_field('DF_BLCOR')
-            #print("+ init_cqts", df.shape)
-            for col in df.columns:
-                chan = azu.col_to_chan_index(col)
-                th = thresh[chan]
-                # TODO; There's surely a pandas way to do this...
-                v = get_thresh_cross_pos(df[col].values, th, default=default)
-                #print("col, chan th v", col, chan, th, v)
-                cqs[col] = v
-                #print("col cq",col,v)
+            # Per-col thresholds from channel, then all cols at once
+            col_th = np.asarray(thresh)[self.dset.get_col_meta()['chan']]
+            cqv = azcalc.thresh_cross_pos(df.to_numpy(), col_th, default=default)
+            cqs = dict(zip(df.columns, cqv.tolist()))
         self.set_field('DIC_COL_CQT', cqs)
+        self.update_quant_cqs()
         if DEBUG: print("<< init_cqts")
 
 
-def get_thresh_cross_pos(dvals, th, default=None):
-    """ Get (X) position where dvals "curve" crosses (Y) threshold
-    Returns X, interpolated via bracketing values, or default if no cross
-    """
-    val = default
-    for i, _ in enumerate(dvals):
-        if dvals[i] > th:
-            if i > 0:
-                v1 = dvals[i-1]
-                v2 = dvals[i]
-                val = i + (th - v1) / (v2 - v1)
-            break
-    return val
-
-
 # Main loop = cook up GUI window, init then start loop
 if __name__ == "__main__":
     win_root = wx.App()